@@ -1,8 +1,23 @@
 import argparse
 import logging
+import os
 import sys
+import typing
 
+from preview_generator.batch import BUILDER_ALIASES
+from preview_generator.batch import PREVIEW_TYPES
+from preview_generator.batch import iter_input_files
+from preview_generator.batch import parse_builder_jobs
+from preview_generator.batch import parse_size
+from preview_generator.batch import run_batch
+from preview_generator.cache_gc import EVICTION_POLICIES
+from preview_generator.cache_gc import EVICTION_POLICY_LRU
+from preview_generator.cache_gc import collect_cache
+from preview_generator.cache_gc import parse_byte_size
+from preview_generator.cache_gc import parse_duration
 from preview_generator.exception import BuilderDependencyNotFound
+from preview_generator.fingerprint import CACHE_KEY_MODES
+from preview_generator.fingerprint import CACHE_KEY_PATH
 from preview_generator.infos import __version__
 from preview_generator.manager import PreviewManager
 from preview_generator.preview.builder_factory import get_builder_folder_name
@@ -23,10 +38,124 @@ def parse_args() -> argparse.Namespace:
     args = parser.parse_args()
     if not args.input_files and not args.check_dependencies:
         parser.print_usage(file=sys.stderr)
-        exit(1)
+        sys.exit(1)
     return args
 
 
+def parse_batch_args(argv: typing.List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="preview_generator batch",
+        description="Generates previews of many files using several processes",
+    )
+    parser.add_argument(
+        "inputs", nargs="*", help="Files or directories (walked recursively) to preview"
+    )
+    parser.add_argument(
+        "--file-list", help="File containing paths to preview, one per line ('-' for stdin)"
+    )
+    parser.add_argument("--cache-dir", required=True, help="Folder where previews are stored")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of processes, shared by all builders (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--builder-jobs",
+        action="append",
+        default=[],
+        metavar="BUILDER=N",
+        help="Max number of files processed at the same time by a builder, BUILDER being "
+        "a builder class name or one of: {}. Can be repeated.".format(
+            ", ".join(sorted(BUILDER_ALIASES))
+        ),
+    )
+    parser.add_argument(
+        "--sizes",
+        default="256",
+        help="Comma separated jpeg preview sizes, as WIDTHxHEIGHT or HEIGHT (default: 256)",
+    )
+    parser.add_argument(
+        "--types",
+        default="jpeg",
+        help="Comma separated preview types among: {} (default: jpeg)".format(
+            ", ".join(PREVIEW_TYPES)
+        ),
+    )
+    parser.add_argument("--force", action="store_true", help="Rebuild cached previews")
+    parser.add_argument("--cache-key-mode", choices=CACHE_KEY_MODES, default=CACHE_KEY_PATH)
+    parser.add_argument("-v", action="count", help="Verbosity (-v, -vv, or -vvv).", default=0)
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.file_list:
+        parser.print_usage(file=sys.stderr)
+        sys.exit(1)
+    preview_types = args.types.split(",")
+    for preview_type in preview_types:
+        if preview_type not in PREVIEW_TYPES:
+            parser.error("unknown preview type: {}".format(preview_type))
+    args.types = preview_types
+    args.sizes = [parse_size(size) for size in args.sizes.split(",")]
+    args.builder_jobs = parse_builder_jobs(args.builder_jobs)
+    return args
+
+
+def batch(argv: typing.List[str]) -> None:
+    args = parse_batch_args(argv)
+    logging.basicConfig(level=logging.ERROR - 10 * args.v)
+    stats = run_batch(
+        iter_input_files(args.inputs, args.file_list),
+        cache_dir=args.cache_dir,
+        jobs=args.jobs,
+        builder_jobs=args.builder_jobs,
+        sizes=args.sizes,
+        preview_types=args.types,
+        force=args.force,
+        cache_key_mode=args.cache_key_mode,
+    )
+    print(stats)
+    if stats.failed:
+        sys.exit(2)
+
+
+def parse_cache_gc_args(argv: typing.List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="preview_generator cache gc",
+        description="Evicts previews from a cache folder and removes orphan files",
+    )
+    parser.add_argument("--cache-dir", required=True, help="Folder where previews are stored")
+    parser.add_argument(
+        "--max-size", type=parse_byte_size, help="Byte budget of the cache, eg. 500M or 10G"
+    )
+    parser.add_argument(
+        "--max-age",
+        type=parse_duration,
+        help="Evict previews not accessed since this duration, eg. 12h or 30d",
+    )
+    parser.add_argument("--policy", choices=EVICTION_POLICIES, default=EVICTION_POLICY_LRU)
+    parser.add_argument(
+        "--max-deletions", type=int, help="Max number of previews evicted by this run"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Print statistics without removing anything"
+    )
+    parser.add_argument("-v", action="count", help="Verbosity (-v, -vv, or -vvv).", default=0)
+    return parser.parse_args(argv)
+
+
+def cache_gc(argv: typing.List[str]) -> None:
+    args = parse_cache_gc_args(argv)
+    logging.basicConfig(level=logging.ERROR - 10 * args.v)
+    stats = collect_cache(
+        args.cache_dir,
+        max_size=args.max_size,
+        max_age=args.max_age,
+        policy=args.policy,
+        max_deletions=args.max_deletions,
+        dry_run=args.dry_run,
+    )
+    print(stats)
+
+
 def check_dependencies() -> None:
     builder_folder = get_builder_folder_name()
     builder_modules = get_builder_modules(builder_folder)
@@ -47,6 +176,12 @@ def check_dependencies() -> None:
 
 
 def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        batch(sys.argv[2:])
+        return
+    if sys.argv[1:3] == ["cache", "gc"]:
+        cache_gc(sys.argv[3:])
+        return
     args = parse_args()
     logging.basicConfig(level=logging.ERROR - 10 * args.v)  # In logging, levels are 40, 30, 20, 10.
     if args.check_dependencies:
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Listing of archive files: zip, tar (compressed or not), gzip and, if py7zr is installed, 7z.
+
+An archive is parsed once into an ArchiveInfo, which is kept in memory (see archive_info_cache)
+so that the text, html and json previews of an archive are built from a single pass.
+Only the first ARCHIVE_MAX_FILES entries of an archive are kept, which bounds the memory used
+by archives with huge entry counts; totals are computed from all entries.
+Tar archives are read as a stream: members are listed without extracting them and without
+seeking, so compressed tarballs are decompressed only once.
+"""
+
+from datetime import datetime
+import os
+import struct
+import tarfile
+import typing
+import zipfile
+
+from preview_generator.exception import PreviewGeneratorException
+from preview_generator.fingerprint import FingerprintLRUCache
+
+py7zr_installed = True
+try:
+    import py7zr
+except ImportError:
+    py7zr_installed = False
+
+ARCHIVE_INFO_CACHE_MAX_SIZE = 32
+# INFO - max number of entries listed in archive previews, 0 means no limit
+ARCHIVE_MAX_FILES = int(os.getenv("PREVIEW_GENERATOR_ARCHIVE_MAX_ENTRIES", "10000"))
+GZIP_MAGIC = b"\x1f\x8b"
+SEVEN_ZIP_MAGIC = b"7z\xbc\xaf\x27\x1c"
+
+
+class UnsupportedArchive(PreviewGeneratorException):
+    pass
+
+
+class FileInfo(object):
+    FILE = "file"
+    DIR = "dir"
+    UNDEFINED = "undefined"
+
+    def __init__(self) -> None:
+        self.last_modification = None  # type: typing.Optional[datetime]
+        self.name = ""
+        self.type = FileInfo.UNDEFINED
+        self.size = 0
+        self.size__compressed = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "lastModification": self.last_modification,
+            "name": self.name,
+            "size": self.size,
+            "sizeCompressed": self.size__compressed,
+        }
+
+
+class ArchiveInfo(object):
+    def __init__(self, max_files: int = 0) -> None:
+        """
+        :param max_files: max number of entries kept in files, 0 means no limit
+        """
+        self.files = []  # type: typing.List[FileInfo]
+        self.size = 0
+        self.size__compressed = 0
+        self.last_modification = None  # type: typing.Optional[datetime]
+        self.max_files = max_files
+        self._file_nb = 0
+
+    @property
+    def compression_rate(self) -> float:
+        if not self.size__compressed:
+            return 0.0
+        return self.size / self.size__compressed
+
+    @property
+    def file_nb(self) -> int:
+        return self._file_nb
+
+    @property
+    def truncated(self) -> bool:
+        """
+        True if some entries of the archive are not in files
+        """
+        return self._file_nb > len(self.files)
+
+    def add_file(self, fileinfo: FileInfo) -> None:
+        self._file_nb += 1
+        if not self.max_files or len(self.files) < self.max_files:
+            self.files.append(fileinfo)
+        self.size += fileinfo.size
+        self.size__compressed += fileinfo.size__compressed
+        if fileinfo.last_modification and (
+            not self.last_modification or self.last_modification < fileinfo.last_modification
+        ):
+            self.last_modification = fileinfo.last_modification
+
+    def to_dict(self) -> dict:
+        return {
+            "fileNb": self.file_nb,
+            "files": [file.to_dict() for file in self.files],
+            "size": self.size,
+            "sizeCompressed": self.size__compressed,
+            "lastModification": self.last_modification,
+            "compressionRate": self.compression_rate,
+            "truncated": self.truncated,
+        }
+
+
+def get_archive_tree(archive_info: ArchiveInfo) -> dict:
+    """
+    Group listed entries of the archive by directory.
+    :return: root directory node. Directory nodes are {"name", "type", "children"}, children
+    being nodes indexed by name; file nodes are FileInfo.
+    """
+    root = {"name": "", "type": FileInfo.DIR, "children": {}}  # type: dict
+    for fileinfo in archive_info.files:
+        node = root
+        path_parts = [part for part in fileinfo.name.split("/") if part]
+        for directory_name in path_parts[:-1]:
+            children = node["children"]
+            if directory_name not in children or not isinstance(children[directory_name], dict):
+                children[directory_name] = {
+                    "name": directory_name,
+                    "type": FileInfo.DIR,
+                    "children": {},
+                }
+            node = children[directory_name]
+        if not path_parts:
+            continue
+        if fileinfo.type == FileInfo.DIR:
+            node["children"].setdefault(
+                path_parts[-1], {"name": path_parts[-1], "type": FileInfo.DIR, "children": {}}
+            )
+        else:
+            node["children"][path_parts[-1]] = fileinfo
+    return root
+
+
+def zipfile_to_infos(zip_file: zipfile.ZipFile, max_files: int = 0) -> ArchiveInfo:
+    archive_info = ArchiveInfo(max_files)
+    for ziplineinfo in zip_file.infolist():
+        fileinfo = FileInfo()
+        fileinfo.last_modification = datetime(*ziplineinfo.date_time)
+        fileinfo.name = ziplineinfo.filename
+        fileinfo.type = FileInfo.DIR if ziplineinfo.is_dir() else FileInfo.FILE
+        fileinfo.size = ziplineinfo.file_size
+        fileinfo.size__compressed = ziplineinfo.compress_size
+        archive_info.add_file(fileinfo)
+    return archive_info
+
+
+def iter_tar_members(tar_file: tarfile.TarFile) -> typing.Iterator[tarfile.TarInfo]:
+    """
+    Read the member headers of a tar file opened as a stream (eg. mode "r|*"), in order.
+    Unlike iterating over the tar file, members are not kept in it: memory does not depend
+    on the number of members.
+    """
+    # INFO - the first member is read when opening the tar file
+    tarinfo = tar_file.next()
+    while tarinfo is not None:
+        yield tarinfo
+        # INFO - skip the data of the member, after which fromtarfile set the offset
+        tar_file.fileobj.seek(tar_file.offset)
+        try:
+            tarinfo = tarfile.TarInfo.fromtarfile(tar_file)
+        except tarfile.HeaderError:
+            # INFO - end of archive blocks, or invalid data after the last member: like
+            # TarFile.next(), stop listing members
+            tarinfo = None
+
+
+def tarfile_to_infos(tar_file: tarfile.TarFile, max_files: int = 0) -> ArchiveInfo:
+    """
+    :param tar_file: tar file opened as a stream (eg. mode "r|*"), members are read in order
+    """
+    archive_info = ArchiveInfo(max_files)
+    for tarinfo in iter_tar_members(tar_file):
+        fileinfo = FileInfo()
+        fileinfo.last_modification = datetime.fromtimestamp(tarinfo.mtime)
+        fileinfo.name = tarinfo.name + "/" if tarinfo.isdir() else tarinfo.name
+        fileinfo.type = FileInfo.DIR if tarinfo.isdir() else FileInfo.FILE
+        # INFO - tar members are not compressed one by one
+        fileinfo.size = fileinfo.size__compressed = tarinfo.size
+        archive_info.add_file(fileinfo)
+    return archive_info
+
+
+def read_gzip_infos(stream: typing.IO[bytes], file_name: str) -> ArchiveInfo:
+    """
+    List the single file compressed in a gzip (not tar) file, without decompressing it
+    """
+    header = stream.read(10)
+    flags = header[3]
+    mtime = struct.unpack("<I", header[4:8])[0]
+    name = ""
+    if flags & 0x04:  # FEXTRA
+        extra_size = struct.unpack("<H", stream.read(2))[0]
+        stream.read(extra_size)
+    if flags & 0x08:  # FNAME
+        name_bytes = bytearray()
+        char = stream.read(1)
+        while char and char != b"\0":
+            name_bytes += char
+            char = stream.read(1)
+        name = name_bytes.decode("latin-1")
+    compressed_size = stream.seek(0, os.SEEK_END)
+    # INFO - the size of the original file (modulo 2^32) is at the end of the gzip file
+    stream.seek(-4, os.SEEK_END)
+    size = struct.unpack("<I", stream.read(4))[0]
+
+    fileinfo = FileInfo()
+    fileinfo.name = name or os.path.splitext(os.path.basename(file_name))[0]
+    fileinfo.type = FileInfo.FILE
+    fileinfo.last_modification = datetime.fromtimestamp(mtime) if mtime else None
+    fileinfo.size = size
+    fileinfo.size__compressed = compressed_size
+    archive_info = ArchiveInfo()
+    archive_info.add_file(fileinfo)
+    return archive_info
+
+
+def read_7z_infos(stream: typing.IO[bytes], max_files: int = 0) -> ArchiveInfo:
+    archive_info = ArchiveInfo(max_files)
+    with py7zr.SevenZipFile(stream, mode="r") as seven_zip_file:
+        for entry in seven_zip_file.list():
+            fileinfo = FileInfo()
+            fileinfo.last_modification = entry.creationtime
+            fileinfo.name = entry.filename
+            fileinfo.type = FileInfo.DIR if entry.is_directory else FileInfo.FILE
+            fileinfo.size = entry.uncompressed or 0
+            fileinfo.size__compressed = entry.compressed or 0
+            archive_info.add_file(fileinfo)
+    return archive_info
+
+
+def read_archive_info(
+    stream: typing.IO[bytes], file_name: str = "", max_files: int = ARCHIVE_MAX_FILES
+) -> ArchiveInfo:
+    """
+    Parse an archive, its format is detected from its content
+    :param stream: seekable binary stream of the archive
+    :param file_name: name of the archive, used for gzip files without original name
+    :param max_files: max number of entries kept in the result, 0 means no limit
+    """
+    head = stream.read(len(SEVEN_ZIP_MAGIC))
+    stream.seek(0)
+    if head == SEVEN_ZIP_MAGIC:
+        if not py7zr_installed:
+            raise UnsupportedArchive("7z archives require py7zr to be available")
+        return read_7z_infos(stream, max_files)
+    if zipfile.is_zipfile(stream):
+        stream.seek(0)
+        with zipfile.ZipFile(stream) as zip_file:
+            return zipfile_to_infos(zip_file, max_files)
+    stream.seek(0)
+    try:
+        # INFO - the first member is read when opening the tar file
+        tar_file = tarfile.open(fileobj=stream, mode="r|*")
+    except (tarfile.TarError, EOFError, OSError) as exc:
+        stream.seek(0)
+        if not head.startswith(GZIP_MAGIC):
+            raise UnsupportedArchive("Unsupported archive format") from exc
+        # INFO - eg. "file.txt.gz": a compressed file which is not a tar archive
+        return read_gzip_infos(stream, file_name)
+    with tar_file:
+        archive_info = tarfile_to_infos(tar_file, max_files)
+    # INFO - the whole archive is compressed at once, its compressed size is the file size
+    archive_info.size__compressed = stream.seek(0, os.SEEK_END)
+    return archive_info
+
+
+def read_archive_file_info(file_path: str) -> ArchiveInfo:
+    """
+    :return: parsed archive file
+    """
+    with open(file_path, "rb") as stream:
+        return read_archive_info(stream, file_path)
+
+
+# INFO - parsed archives are shared, do not modify them
+archive_info_cache = FingerprintLRUCache(
+    read_archive_file_info, ARCHIVE_INFO_CACHE_MAX_SIZE
+)  # type: FingerprintLRUCache[ArchiveInfo]
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from concurrent.futures import Executor
+import contextvars
+import functools
+import os
+import typing
+import weakref
+
+from preview_generator.fingerprint import CACHE_KEY_PATH
+from preview_generator.manager import PreviewManager
+from preview_generator.process import ProcessGroup
+from preview_generator.process import running_processes
+from preview_generator.utils import DocumentMetadata
+
+# INFO - default number of previews built at the same time by a builder type,
+# eg. at most DEFAULT_BUILDER_CONCURRENCY LibreOffice conversions
+DEFAULT_BUILDER_CONCURRENCY = os.cpu_count() or 1
+
+T = typing.TypeVar("T")
+
+
+class AsyncPreviewManager(object):
+    """
+    asyncio version of the PreviewManager.
+
+    - cached previews are returned without building anything,
+    - previews are built in an executor, so the event loop is never blocked by builders
+      or by file lock polling,
+    - concurrent requests of the same preview wait for the first one instead of
+      building it again,
+    - the number of previews built at the same time is bounded per builder type,
+    - cancelling a request kills the processes (libreoffice, pdftocairo, ffmpeg, …)
+      started to build the preview. Persistent LibreOffice workers, shared by all requests,
+      are not killed: the cancelled conversion runs to its end.
+    """
+
+    def __init__(
+        self,
+        cache_folder_path: str,
+        create_folder: bool = False,
+        cache_key_mode: str = CACHE_KEY_PATH,
+        builder_concurrency: typing.Optional[typing.Dict[str, int]] = None,
+        default_concurrency: int = DEFAULT_BUILDER_CONCURRENCY,
+        executor: typing.Optional[Executor] = None,
+    ) -> None:
+        """
+        :param cache_folder_path: path to the cache folder.
+        This is where previews will be stored
+        :param create_folder: if True, then create the cache folder
+        if it does not exist
+        :param cache_key_mode: see PreviewManager
+        :param builder_concurrency: max number of previews built at the same time, by builder
+        class name. eg: {"OfficePreviewBuilderLibreoffice": 2}
+        :param default_concurrency: max number of previews built at the same time for builders
+        not found in builder_concurrency
+        :param executor: executor running the builders, default is the event loop one
+        """
+        self.manager = PreviewManager(
+            cache_folder_path, create_folder=create_folder, cache_key_mode=cache_key_mode
+        )
+        self.builder_concurrency = builder_concurrency or {}
+        self.default_concurrency = default_concurrency
+        self._executor = executor
+        self._semaphores = {}  # type: typing.Dict[str, asyncio.Semaphore]
+        self._preview_locks = (
+            weakref.WeakValueDictionary()
+        )  # type: weakref.WeakValueDictionary[str, asyncio.Lock]
+
+    async def _run_in_executor(
+        self, func: typing.Callable[..., T], *args: typing.Any, **kwargs: typing.Any
+    ) -> T:
+        """
+        Run func in the executor. If the call is cancelled, processes started by func are killed.
+        """
+        process_group = ProcessGroup()
+        context = contextvars.copy_context()
+        context.run(running_processes.set, process_group)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._executor, functools.partial(context.run, func, *args, **kwargs)
+            )
+        except asyncio.CancelledError:
+            # INFO - killing processes waits for them to exit, do not block the event loop.
+            # The default executor is used as the given one may be busy with the builders
+            await asyncio.shield(loop.run_in_executor(None, process_group.kill))
+            raise
+
+    def _get_semaphore(self, builder_name: str) -> asyncio.Semaphore:
+        if builder_name not in self._semaphores:
+            self._semaphores[builder_name] = asyncio.Semaphore(
+                self.builder_concurrency.get(builder_name, self.default_concurrency)
+            )
+        return self._semaphores[builder_name]
+
+    def _get_builder_name(self, file_path: str, file_ext: str) -> str:
+        return self.manager.get_preview_context(file_path, file_ext).builder.__class__.__name__
+
+    async def _get_preview(
+        self,
+        get_preview: typing.Callable[..., str],
+        file_path: str,
+        file_ext: str,
+        force: bool,
+        dry_run: bool,
+        **kwargs: typing.Any
+    ) -> str:
+        get_preview_path = functools.partial(
+            get_preview, file_path=file_path, file_ext=file_ext, dry_run=True, **kwargs
+        )
+        preview_path = await self._run_in_executor(get_preview_path)
+        if dry_run or (not force and os.path.exists(preview_path)):
+            return preview_path
+
+        lock = self._preview_locks.get(preview_path)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._preview_locks[preview_path] = lock
+        async with lock:
+            # INFO - the preview may have been built while waiting for the lock
+            if not force and os.path.exists(preview_path):
+                return preview_path
+            builder_name = await self._run_in_executor(self._get_builder_name, file_path, file_ext)
+            async with self._get_semaphore(builder_name):
+                return await self._run_in_executor(
+                    get_preview, file_path=file_path, file_ext=file_ext, force=force, **kwargs
+                )
+
+    async def get_jpeg_preview(
+        self,
+        file_path: str,
+        page: int = -1,
+        width: int = None,
+        height: int = 256,
+        force: bool = False,
+        file_ext: str = "",
+        dry_run: bool = False,
+    ) -> str:
+        """
+        see PreviewManager.get_jpeg_preview
+        """
+        return await self._get_preview(
+            self.manager.get_jpeg_preview,
+            file_path=file_path,
+            file_ext=file_ext,
+            force=force,
+            dry_run=dry_run,
+            page=page,
+            width=width,
+            height=height,
+        )
+
+    async def get_jpeg_previews(
+        self,
+        file_path: str,
+        pages: typing.Optional[typing.Iterable[int]] = None,
+        width: int = None,
+        height: int = 256,
+        force: bool = False,
+        file_ext: str = "",
+        dry_run: bool = False,
+    ) -> typing.List[str]:
+        """
+        see PreviewManager.get_jpeg_previews
+        """
+        if pages is not None:
+            pages = list(pages)
+        get_previews = functools.partial(
+            self.manager.get_jpeg_previews,
+            file_path=file_path,
+            pages=pages,
+            width=width,
+            height=height,
+            file_ext=file_ext,
+        )
+        preview_paths = await self._run_in_executor(get_previews, dry_run=True)
+        if dry_run or (not force and all(os.path.exists(path) for path in preview_paths)):
+            return preview_paths
+        builder_name = await self._run_in_executor(self._get_builder_name, file_path, file_ext)
+        async with self._get_semaphore(builder_name):
+            return await self._run_in_executor(get_previews, force=force)
+
+    async def get_pdf_preview(
+        self,
+        file_path: str,
+        page: int = -1,
+        force: bool = False,
+        file_ext: str = "",
+        dry_run: bool = False,
+    ) -> str:
+        """
+        see PreviewManager.get_pdf_preview
+        """
+        return await self._get_preview(
+            self.manager.get_pdf_preview,
+            file_path=file_path,
+            file_ext=file_ext,
+            force=force,
+            dry_run=dry_run,
+            page=page,
+        )
+
+    async def get_text_preview(
+        self, file_path: str, force: bool = False, file_ext: str = "", dry_run: bool = False
+    ) -> str:
+        """
+        see PreviewManager.get_text_preview
+        """
+        return await self._get_preview(
+            self.manager.get_text_preview,
+            file_path=file_path,
+            file_ext=file_ext,
+            force=force,
+            dry_run=dry_run,
+        )
+
+    async def get_html_preview(
+        self, file_path: str, force: bool = False, file_ext: str = "", dry_run: bool = False
+    ) -> str:
+        """
+        see PreviewManager.get_html_preview
+        """
+        return await self._get_preview(
+            self.manager.get_html_preview,
+            file_path=file_path,
+            file_ext=file_ext,
+            force=force,
+            dry_run=dry_run,
+        )
+
+    async def get_json_preview(
+        self, file_path: str, force: bool = False, file_ext: str = "", dry_run: bool = False
+    ) -> str:
+        """
+        see PreviewManager.get_json_preview
+        """
+        return await self._get_preview(
+            self.manager.get_json_preview,
+            file_path=file_path,
+            file_ext=file_ext,
+            force=force,
+            dry_run=dry_run,
+        )
+
+    async def get_page_nb(self, file_path: str, file_ext: str = "") -> int:
+        """
+        see PreviewManager.get_page_nb
+        """
+        metadata = await self.get_document_metadata(file_path, file_ext)
+        return metadata.page_nb
+
+    async def get_document_metadata(self, file_path: str, file_ext: str = "") -> DocumentMetadata:
+        """
+        see PreviewManager.get_document_metadata
+        """
+        builder_name = await self._run_in_executor(self._get_builder_name, file_path, file_ext)
+        async with self._get_semaphore(builder_name):
+            return await self._run_in_executor(
+                self.manager.get_document_metadata, file_path, file_ext
+            )
+
+    async def get_mimetype(self, file_path: str, file_ext: str = "") -> str:
+        return await self._run_in_executor(self.manager.get_mimetype, file_path, file_ext)
+
+    async def has_pdf_preview(self, file_path: str, file_ext: str = "") -> bool:
+        return await self._run_in_executor(self.manager.has_pdf_preview, file_path, file_ext)
+
+    async def has_jpeg_preview(self, file_path: str, file_ext: str = "") -> bool:
+        return await self._run_in_executor(self.manager.has_jpeg_preview, file_path, file_ext)
+
+    async def has_text_preview(self, file_path: str, file_ext: str = "") -> bool:
+        return await self._run_in_executor(self.manager.has_text_preview, file_path, file_ext)
+
+    async def has_json_preview(self, file_path: str, file_ext: str = "") -> bool:
+        return await self._run_in_executor(self.manager.has_json_preview, file_path, file_ext)
+
+    async def has_html_preview(self, file_path: str, file_ext: str = "") -> bool:
+        return await self._run_in_executor(self.manager.has_html_preview, file_path, file_ext)
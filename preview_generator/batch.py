@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk generation of previews, used by the `preview_generator batch` command.
+
+Files are classified by builder as they are read, then queued by builder. All jobs run in
+a single process pool, the number of jobs of each builder running at the same time being
+limited so that the concurrency of heavy builders (eg. LibreOffice) can be limited
+independently of light ones.
+"""
+
+from collections import defaultdict
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+import itertools
+import logging
+import os
+import sys
+import time
+import typing
+
+from preview_generator.exception import PreviewGeneratorException
+from preview_generator.fingerprint import CACHE_KEY_PATH
+from preview_generator.manager import PreviewManager
+from preview_generator.utils import ImgDims
+from preview_generator.utils import LOGGER_NAME
+
+PREVIEW_TYPE_JPEG = "jpeg"
+PREVIEW_TYPE_PDF = "pdf"
+PREVIEW_TYPE_JSON = "json"
+PREVIEW_TYPE_TEXT = "text"
+PREVIEW_TYPE_HTML = "html"
+PREVIEW_TYPES = (
+    PREVIEW_TYPE_JPEG,
+    PREVIEW_TYPE_PDF,
+    PREVIEW_TYPE_JSON,
+    PREVIEW_TYPE_TEXT,
+    PREVIEW_TYPE_HTML,
+)
+# INFO - short names usable to set concurrency of common builders
+BUILDER_ALIASES = {
+    "libreoffice": "OfficePreviewBuilderLibreoffice",
+    "ffmpeg": "VideoPreviewBuilderFFMPEG",
+    "wand": "ImagePreviewBuilderWand",
+    "poppler": "PdfPreviewBuilderPopplerUtils",
+}
+UNSUPPORTED = "unsupported"
+CLASSIFY_CHUNK_SIZE = 64
+# INFO - max number of classified files waiting for a builder, this bounds the memory used
+# by the batch whatever the number of input files
+MAX_QUEUED_FILES_BY_BUILDER = 1024
+
+STATUS_BUILT = "built"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+_manager = None  # type: typing.Optional[PreviewManager]
+
+
+class BatchStats(object):
+    def __init__(self) -> None:
+        self.file_nb = 0
+        self.built = 0
+        self.skipped = 0
+        self.failed = 0
+        self.unsupported = 0
+        self.start_time = time.monotonic()
+        self.end_time = None  # type: typing.Optional[float]
+        self.file_nb_by_builder = defaultdict(int)  # type: typing.DefaultDict[str, int]
+
+    @property
+    def duration(self) -> float:
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    @property
+    def throughput(self) -> float:
+        """processed files per second"""
+        if not self.duration:
+            return 0.0
+        return self.file_nb / self.duration
+
+    def __str__(self) -> str:
+        lines = [
+            "files: {}".format(self.file_nb),
+            "built: {}".format(self.built),
+            "skipped (already in cache): {}".format(self.skipped),
+            "failed: {}".format(self.failed),
+            "unsupported: {}".format(self.unsupported),
+            "duration: {:.1f}s".format(self.duration),
+            "throughput: {:.2f} files/s".format(self.throughput),
+        ]
+        for builder_name, file_nb in sorted(self.file_nb_by_builder.items()):
+            lines.append("- {}: {} files".format(builder_name, file_nb))
+        return "\n".join(lines)
+
+
+def parse_size(size: str) -> ImgDims:
+    """
+    Parse a preview size given as "WIDTHxHEIGHT" or "HEIGHT"
+
+    >>> str(parse_size("512x256"))
+    '512x256'
+    >>> str(parse_size("256"))
+    '256x256'
+    """
+    if "x" in size:
+        width, height = size.split("x", maxsplit=1)
+        return ImgDims(width=int(width), height=int(height))
+    return ImgDims(width=int(size), height=int(size))
+
+
+def parse_builder_jobs(values: typing.List[str]) -> typing.Dict[str, int]:
+    """
+    Parse builder concurrency given as "BUILDER=N", BUILDER being a builder class name
+    or one of BUILDER_ALIASES
+
+    >>> parse_builder_jobs(["libreoffice=2", "ImagePreviewBuilderWand=8"])
+    {'OfficePreviewBuilderLibreoffice': 2, 'ImagePreviewBuilderWand': 8}
+    """
+    builder_jobs = {}  # type: typing.Dict[str, int]
+    for value in values:
+        builder_name, _, jobs = value.partition("=")
+        builder_name = BUILDER_ALIASES.get(builder_name, builder_name)
+        builder_jobs[builder_name] = int(jobs)
+    return builder_jobs
+
+
+def iter_input_files(
+    input_paths: typing.Iterable[str], file_list: typing.Optional[str] = None
+) -> typing.Iterator[str]:
+    """
+    Yield files given directly, found in given directories (recursively) and listed
+    in file_list (one path per line, "-" for stdin).
+    """
+    for input_path in input_paths:
+        if os.path.isdir(input_path):
+            for dir_path, _, file_names in os.walk(input_path):
+                for file_name in sorted(file_names):
+                    yield os.path.join(dir_path, file_name)
+        else:
+            yield input_path
+
+    if file_list:
+        list_handle = sys.stdin if file_list == "-" else open(file_list)
+        try:
+            for line in list_handle:
+                file_path = line.rstrip("\n")
+                if file_path:
+                    yield file_path
+        finally:
+            if list_handle is not sys.stdin:
+                list_handle.close()
+
+
+def _init_worker(cache_dir: str, cache_key_mode: str) -> None:
+    global _manager
+    _manager = PreviewManager(cache_dir, create_folder=True, cache_key_mode=cache_key_mode)
+
+
+def _get_manager() -> PreviewManager:
+    assert _manager, "worker is not initialized"
+    return _manager
+
+
+def classify_file(file_path: str) -> typing.Tuple[str, str]:
+    """
+    :return: (file path, name of the builder class to use, or UNSUPPORTED)
+    """
+    try:
+        builder = _get_manager().get_preview_context(file_path, "").builder
+    except Exception:
+        return file_path, UNSUPPORTED
+    return file_path, builder.__class__.__name__
+
+
+def classify_files(file_paths: typing.List[str]) -> typing.List[typing.Tuple[str, str]]:
+    """
+    :return: result of classify_file for each file
+    """
+    return [classify_file(file_path) for file_path in file_paths]
+
+
+def build_previews(
+    file_path: str, preview_types: typing.List[str], sizes: typing.List[ImgDims], force: bool
+) -> typing.Tuple[str, str, str]:
+    """
+    Build the requested previews of the file, skipping previews already in the cache.
+    :return: (file path, status, error message)
+    """
+    manager = _get_manager()
+    try:
+        builder = manager.get_preview_context(file_path, "").builder
+        requests = []  # type: typing.List[typing.Tuple[typing.Callable[..., str], dict]]
+        if PREVIEW_TYPE_JPEG in preview_types and builder.has_jpeg_preview():
+            for size in sizes:
+                requests.append(
+                    (manager.get_jpeg_preview, {"width": size.width, "height": size.height})
+                )
+        if PREVIEW_TYPE_PDF in preview_types and builder.has_pdf_preview():
+            requests.append((manager.get_pdf_preview, {}))
+        if PREVIEW_TYPE_JSON in preview_types and builder.has_json_preview():
+            requests.append((manager.get_json_preview, {}))
+        if PREVIEW_TYPE_TEXT in preview_types and builder.has_text_preview():
+            requests.append((manager.get_text_preview, {}))
+        if PREVIEW_TYPE_HTML in preview_types and builder.has_html_preview():
+            requests.append((manager.get_html_preview, {}))
+
+        missing_requests = [
+            (get_preview, kwargs)
+            for get_preview, kwargs in requests
+            if force or not os.path.exists(get_preview(file_path, dry_run=True, **kwargs))
+        ]
+        if not missing_requests:
+            return file_path, STATUS_SKIPPED, ""
+        for get_preview, kwargs in missing_requests:
+            get_preview(file_path, force=force, **kwargs)
+    except (PreviewGeneratorException, OSError, ValueError) as exc:
+        return file_path, STATUS_FAILED, str(exc)
+    except Exception as exc:
+        return file_path, STATUS_FAILED, "{}: {}".format(exc.__class__.__name__, exc)
+    return file_path, STATUS_BUILT, ""
+
+
+def run_batch(
+    file_paths: typing.Iterable[str],
+    cache_dir: str,
+    jobs: int,
+    builder_jobs: typing.Optional[typing.Dict[str, int]] = None,
+    sizes: typing.Optional[typing.List[ImgDims]] = None,
+    preview_types: typing.Sequence[str] = (PREVIEW_TYPE_JPEG,),
+    force: bool = False,
+    cache_key_mode: str = CACHE_KEY_PATH,
+) -> BatchStats:
+    """
+    Build previews of all given files in cache_dir.
+    :param jobs: number of processes, shared by all builders
+    :param builder_jobs: max number of files processed at the same time by builder class name,
+    default is jobs
+    :param sizes: sizes of jpeg previews, default is 256x256
+    :param preview_types: types of previews to build, see PREVIEW_TYPES
+    :param force: if True, rebuild previews already in the cache
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    builder_jobs = builder_jobs or {}
+    sizes = sizes or [ImgDims(width=256, height=256)]
+    preview_types = list(preview_types)
+    stats = BatchStats()
+    input_files = iter(file_paths)
+    file_path_chunks = iter(lambda: list(itertools.islice(input_files, CLASSIFY_CHUNK_SIZE)), [])
+    input_done = False
+
+    queued_files = defaultdict(deque)  # type: typing.DefaultDict[str, typing.Deque[str]]
+    running_job_nb = defaultdict(int)  # type: typing.DefaultDict[str, int]
+    # INFO - builder name of running build jobs, None for classification jobs
+    running_jobs: "typing.Dict[Future[typing.Any], typing.Optional[str]]" = {}
+
+    def can_classify() -> bool:
+        return not input_done and all(
+            len(builder_files) < MAX_QUEUED_FILES_BY_BUILDER
+            for builder_files in queued_files.values()
+        )
+
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(cache_dir, cache_key_mode)
+    ) as pool:
+        while True:
+            # INFO - jobs are only submitted when a process is free, so that all submitted
+            # jobs are running and builder limits are respected
+            for builder_name, builder_files in queued_files.items():
+                builder_job_nb = builder_jobs.get(builder_name, jobs)
+                while (
+                    builder_files
+                    and len(running_jobs) < jobs
+                    and running_job_nb[builder_name] < builder_job_nb
+                ):
+                    build_job = pool.submit(
+                        build_previews, builder_files.popleft(), preview_types, sizes, force
+                    )
+                    running_jobs[build_job] = builder_name
+                    running_job_nb[builder_name] += 1
+            while len(running_jobs) < jobs and can_classify():
+                chunk = next(file_path_chunks, None)
+                if chunk is None:
+                    input_done = True
+                    break
+                running_jobs[pool.submit(classify_files, chunk)] = None
+            if not running_jobs:
+                break
+
+            done, _ = wait(running_jobs.keys(), return_when=FIRST_COMPLETED)
+            for future in done:
+                job_builder_name = running_jobs.pop(future)
+                if job_builder_name is None:
+                    for file_path, file_builder_name in future.result():
+                        stats.file_nb += 1
+                        if file_builder_name == UNSUPPORTED:
+                            stats.unsupported += 1
+                        else:
+                            queued_files[file_builder_name].append(file_path)
+                            stats.file_nb_by_builder[file_builder_name] += 1
+                    continue
+                running_job_nb[job_builder_name] -= 1
+                file_path, status, error = future.result()
+                if status == STATUS_BUILT:
+                    stats.built += 1
+                elif status == STATUS_SKIPPED:
+                    stats.skipped += 1
+                else:
+                    stats.failed += 1
+                    logger.error("Preview of {} failed: {}".format(file_path, error))
+
+    stats.end_time = time.monotonic()
+    return stats
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Eviction of previews from the cache folder, used by the `preview_generator cache gc` command
+and by PreviewManager.collect_cache().
+
+Size and accesses of previews are kept in the cache index by the manager. Previews are evicted
+when older than a max age (time since last access) and, least valuable first, until the
+cache folder fits in a byte budget. Intermediate pdf files of documents are valued as
+their most valuable derived preview, as they are required to build new pages and sizes.
+Orphan flag and temporary conversion files are removed too. Lock files are kept: a process
+may be waiting for a lock file when it is removed, and would then lock a file other processes
+do not see anymore.
+"""
+
+from collections import defaultdict
+import contextlib
+import logging
+import os
+import re
+import time
+import typing
+
+from filelock import FileLock
+from filelock import Timeout
+
+from preview_generator.cache_index import CACHE_INDEX_FILE_NAME
+from preview_generator.cache_index import CacheIndex
+from preview_generator.cache_index import PreviewFileEntry
+from preview_generator.utils import LOCKFILE_EXTENSION
+from preview_generator.utils import LOGGER_NAME
+from preview_generator.utils import TEMPORARY_OUTPUT_MARKER
+
+EVICTION_POLICY_LRU = "lru"
+EVICTION_POLICY_LFU = "lfu"
+EVICTION_POLICIES = (EVICTION_POLICY_LRU, EVICTION_POLICY_LFU)
+
+# INFO - flag and temporary files are left by interrupted builds. They are removed
+# when they are not used anymore and older than this (in seconds)
+ORPHAN_FILE_MIN_AGE = 3600
+FLAG_FILE_SUFFIX = "_flag"
+# INFO - copy (or link) of the original document given to libreoffice/scribus, and
+# libreoffice output before renaming, eg. "<hash>.pdf.docx"
+TEMPORARY_FILE_SUFFIX_PATTERN = re.compile(r"^\.pdf\.")
+# INFO - previews being written, before their atomic rename, see utils.atomic_output_path
+TEMPORARY_OUTPUT_SUFFIX_PATTERN = re.compile(
+    r"\.[0-9a-f]{{32}}{}(\.|$)".format(re.escape(TEMPORARY_OUTPUT_MARKER))
+)
+PREVIEW_FILE_NAME_PATTERN = re.compile(r"^(?P<hash>[0-9a-f]{32})(?P<suffix>.*)$")
+# INFO - suffix of the full pdf of a document, and of the pdf of its first pages, see
+# document_generic.get_partial_pdf_name
+INTERMEDIATE_PDF_SUFFIX_PATTERN = re.compile(r"(-first\d+pages)?\.pdf$")
+
+BYTE_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+class GcStats(object):
+    def __init__(self) -> None:
+        self.file_nb = 0
+        self.size = 0
+        self.removed_nb = 0
+        self.removed_size = 0
+        self.orphan_nb = 0
+        self.locked_nb = 0
+
+    def __str__(self) -> str:
+        return "\n".join(
+            [
+                "preview files: {} ({} bytes)".format(self.file_nb, self.size),
+                "removed: {} ({} bytes)".format(self.removed_nb, self.removed_size),
+                "orphan files removed: {}".format(self.orphan_nb),
+                "skipped (preview being built): {}".format(self.locked_nb),
+            ]
+        )
+
+
+def parse_byte_size(value: str) -> int:
+    """
+    Parse a size in bytes, with an optional K, M, G or T (binary) unit
+
+    >>> parse_byte_size("10G")
+    10737418240
+    >>> parse_byte_size("512")
+    512
+    """
+    value = value.strip().upper().rstrip("B").rstrip("I")
+    unit = value[-1] if value and value[-1] in BYTE_SIZE_UNITS else ""
+    number = value[: len(value) - len(unit)]
+    return int(float(number) * BYTE_SIZE_UNITS[unit])
+
+
+def parse_duration(value: str) -> float:
+    """
+    Parse a duration in seconds, with an optional s, m, h, d or w unit
+
+    >>> parse_duration("30d")
+    2592000.0
+    >>> parse_duration("90")
+    90.0
+    """
+    value = value.strip()
+    unit = value[-1] if value and value[-1] in DURATION_UNITS else ""
+    number = value[: len(value) - len(unit)]
+    return float(number) * DURATION_UNITS[unit]
+
+
+def is_intermediate_pdf(file_name: str, preview_hash: str) -> bool:
+    """
+    Full pdf of a document, or pdf of its first pages, used to build its jpeg previews
+    """
+    return file_name.startswith(preview_hash) and bool(
+        INTERMEDIATE_PDF_SUFFIX_PATTERN.match(file_name, len(preview_hash))
+    )
+
+
+def remove_preview_file(cache_path: str, file_name: str, preview_hash: str) -> bool:
+    """
+    Remove a preview file. Jpeg previews of documents are built from their intermediate pdf
+    under the lock of its conversion, so intermediate pdf files are only removed with this lock.
+    :return: False if the file is in use
+    """
+    file_path = os.path.join(cache_path, file_name)
+    file_lock = contextlib.nullcontext()  # type: typing.ContextManager[typing.Any]
+    if is_intermediate_pdf(file_name, preview_hash):
+        file_lock = FileLock(file_path + LOCKFILE_EXTENSION, timeout=0)
+    try:
+        with file_lock, contextlib.suppress(FileNotFoundError):
+            os.remove(file_path)
+    except Timeout:
+        return False
+    return True
+
+
+def collect_cache(
+    cache_path: str,
+    max_size: typing.Optional[int] = None,
+    max_age: typing.Optional[float] = None,
+    policy: str = EVICTION_POLICY_LRU,
+    max_deletions: typing.Optional[int] = None,
+    dry_run: bool = False,
+) -> GcStats:
+    """
+    Evict previews from the cache folder.
+    :param max_size: byte budget of the cache folder
+    :param max_age: previews not accessed since max_age seconds are evicted
+    :param policy: EVICTION_POLICY_LRU (least recently used previews are evicted first) or
+    EVICTION_POLICY_LFU (least frequently used)
+    :param max_deletions: max number of previews evicted by this call, allows to run the
+    collection incrementally
+    :param dry_run: only compute statistics, do not remove anything
+    """
+    if policy not in EVICTION_POLICIES:
+        raise ValueError(
+            "Invalid eviction policy: {}, expected one of {}".format(policy, EVICTION_POLICIES)
+        )
+    logger = logging.getLogger(LOGGER_NAME)
+    stats = GcStats()
+    cache_index = CacheIndex(cache_path)
+    now = time.time()
+
+    preview_files = {}  # type: typing.Dict[str, typing.Tuple[str, int, float]]
+    orphan_files = []  # type: typing.List[str]
+    for dir_entry in os.scandir(cache_path):
+        if dir_entry.name.startswith(CACHE_INDEX_FILE_NAME):
+            continue
+        match = PREVIEW_FILE_NAME_PATTERN.match(dir_entry.name)
+        if not match or dir_entry.is_dir(follow_symlinks=False):
+            continue
+        preview_hash, suffix = match.group("hash"), match.group("suffix")
+        if suffix.endswith(LOCKFILE_EXTENSION):
+            # INFO - "<hash>.lock" of the manager and "<hash>.pdf.lock" of document conversions
+            continue
+        stat_result = dir_entry.stat(follow_symlinks=False)
+        if (
+            suffix.endswith(FLAG_FILE_SUFFIX)
+            or TEMPORARY_FILE_SUFFIX_PATTERN.match(suffix)
+            or TEMPORARY_OUTPUT_SUFFIX_PATTERN.search(suffix)
+        ):
+            if now - stat_result.st_mtime > ORPHAN_FILE_MIN_AGE:
+                orphan_files.append(dir_entry.name)
+        else:
+            preview_files[dir_entry.name] = (
+                preview_hash,
+                stat_result.st_size,
+                stat_result.st_mtime,
+            )
+
+    # INFO - synchronize the index with the cache folder: files built without the index
+    # are added, with their modification time as last access
+    indexed_files = {entry[0]: entry for entry in cache_index.get_preview_files()}
+    new_entries = [
+        (file_name, preview_hash, size, mtime, 0)
+        for file_name, (preview_hash, size, mtime) in preview_files.items()
+        if file_name not in indexed_files
+    ]
+    if new_entries and not dry_run:
+        cache_index.add_preview_files(new_entries)
+    removed_files = [file_name for file_name in indexed_files if file_name not in preview_files]
+    if removed_files and not dry_run:
+        cache_index.remove_preview_files(removed_files)
+
+    entries = []  # type: typing.List[PreviewFileEntry]
+    for file_name, (preview_hash, size, mtime) in preview_files.items():
+        indexed_entry = indexed_files.get(file_name)
+        last_access, hits = (indexed_entry[3], indexed_entry[4]) if indexed_entry else (mtime, 0)
+        entries.append((file_name, preview_hash, size, last_access, hits))
+        stats.file_nb += 1
+        stats.size += size
+
+    last_access_by_hash = defaultdict(float)  # type: typing.DefaultDict[str, float]
+    hits_by_hash = defaultdict(int)  # type: typing.DefaultDict[str, int]
+    for _, preview_hash, _, last_access, hits in entries:
+        last_access_by_hash[preview_hash] = max(last_access_by_hash[preview_hash], last_access)
+        hits_by_hash[preview_hash] += hits
+
+    def get_last_access(entry: PreviewFileEntry) -> float:
+        file_name, preview_hash, _, last_access, _ = entry
+        if is_intermediate_pdf(file_name, preview_hash):
+            return last_access_by_hash[preview_hash]
+        return last_access
+
+    def get_hits(entry: PreviewFileEntry) -> int:
+        file_name, preview_hash, _, _, hits = entry
+        if is_intermediate_pdf(file_name, preview_hash):
+            return hits_by_hash[preview_hash]
+        return hits
+
+    evicted = []  # type: typing.List[PreviewFileEntry]
+    kept = entries
+    if max_age is not None:
+        evicted = [entry for entry in entries if now - get_last_access(entry) > max_age]
+        kept = [entry for entry in entries if now - get_last_access(entry) <= max_age]
+    if max_size is not None:
+        if policy == EVICTION_POLICY_LFU:
+            kept.sort(key=lambda entry: (get_hits(entry), get_last_access(entry)))
+        else:
+            kept.sort(key=get_last_access)
+        kept_size = sum(entry[2] for entry in kept)
+        for entry in kept:
+            if kept_size <= max_size:
+                break
+            evicted.append(entry)
+            kept_size -= entry[2]
+    if max_deletions is not None:
+        evicted = evicted[:max_deletions]
+
+    evicted_by_hash = defaultdict(list)  # type: typing.DefaultDict[str, typing.List[str]]
+    sizes = {}  # type: typing.Dict[str, int]
+    for file_name, preview_hash, size, _, _ in evicted:
+        evicted_by_hash[preview_hash].append(file_name)
+        sizes[file_name] = size
+
+    for preview_hash, file_names in evicted_by_hash.items():
+        if dry_run:
+            stats.removed_nb += len(file_names)
+            stats.removed_size += sum(sizes[file_name] for file_name in file_names)
+            continue
+        lock_path = os.path.join(cache_path, preview_hash + LOCKFILE_EXTENSION)
+        try:
+            # INFO - do not remove previews of a file being built
+            with FileLock(lock_path, timeout=0):
+                removed_names = []
+                for file_name in file_names:
+                    if not remove_preview_file(cache_path, file_name, preview_hash):
+                        stats.locked_nb += 1
+                        continue
+                    removed_names.append(file_name)
+                    stats.removed_nb += 1
+                    stats.removed_size += sizes[file_name]
+                cache_index.remove_preview_files(removed_names)
+        except Timeout:
+            stats.locked_nb += len(file_names)
+
+    for file_name in orphan_files:
+        stats.orphan_nb += 1
+        if not dry_run:
+            try:
+                os.remove(os.path.join(cache_path, file_name))
+            except FileNotFoundError:
+                pass
+
+    logger.info("Cache collection of {}:\n{}".format(cache_path, stats))
+    return stats
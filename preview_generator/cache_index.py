@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import typing
+
+from preview_generator.fingerprint import FileFingerprint
+from preview_generator.utils import DocumentMetadata
+from preview_generator.utils import LOCK_DEFAULT_TIMEOUT
+from preview_generator.utils import LOGGER_NAME
+
+CACHE_INDEX_FILE_NAME = "preview-generator-index.sqlite"
+
+# INFO - (file name, preview hash, size in bytes, last access timestamp, hit number)
+PreviewFileEntry = typing.Tuple[str, str, int, float, int]
+
+
+class CacheIndex(object):
+    """
+    Sidecar index stored in the cache folder. It keeps information computed from original
+    files (eg. page number of documents), so they are not computed again as long as the
+    fingerprint of the original file is unchanged. It also keeps size and accesses of
+    preview files, used to evict previews from the cache (see cache_gc).
+
+    The index is a cache: any error while reading or writing it is logged and ignored.
+    """
+
+    def __init__(self, cache_path: str) -> None:
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.index_path = os.path.join(cache_path, CACHE_INDEX_FILE_NAME)
+        # INFO - sqlite connections can't be shared between threads (nor forked processes)
+        self._local = threading.local()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.index_path, timeout=LOCK_DEFAULT_TIMEOUT, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            # INFO - no fsync on each commit, a crash may only lose the last accesses
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS document_metadata ("
+                "preview_hash TEXT PRIMARY KEY, "
+                "fingerprint TEXT NOT NULL, "
+                "page_nb INTEGER NOT NULL, "
+                "page_sizes TEXT NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS preview_file ("
+                "file_name TEXT PRIMARY KEY, "
+                "preview_hash TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "last_access REAL NOT NULL, "
+                "hits INTEGER NOT NULL)"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get_document_metadata(
+        self, preview_hash: str, fingerprint: FileFingerprint
+    ) -> typing.Optional[DocumentMetadata]:
+        """
+        :return: stored metadata, or None if not found or if the file changed since
+        """
+        try:
+            row = (
+                self._get_connection()
+                .execute(
+                    "SELECT fingerprint, page_nb, page_sizes FROM document_metadata "
+                    "WHERE preview_hash = ?",
+                    (preview_hash,),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error as exc:
+            self.logger.warning("Cache index {} is not readable: {}".format(self.index_path, exc))
+            return None
+
+        if not row or row[0] != json.dumps(fingerprint):
+            return None
+        page_sizes = [(width, height) for width, height in json.loads(row[2])]
+        return DocumentMetadata(page_nb=row[1], page_sizes=page_sizes)
+
+    def set_document_metadata(
+        self, preview_hash: str, fingerprint: FileFingerprint, metadata: DocumentMetadata
+    ) -> None:
+        try:
+            self._get_connection().execute(
+                "INSERT OR REPLACE INTO document_metadata "
+                "(preview_hash, fingerprint, page_nb, page_sizes) VALUES (?, ?, ?, ?)",
+                (
+                    preview_hash,
+                    json.dumps(fingerprint),
+                    metadata.page_nb,
+                    json.dumps(metadata.page_sizes),
+                ),
+            )
+        except sqlite3.Error as exc:
+            self.logger.warning("Cache index {} is not writable: {}".format(self.index_path, exc))
+
+    def record_access(self, preview_hash: str, file_paths: typing.Iterable[str]) -> None:
+        """
+        Record an access to preview files of the given hash (file just built or read from
+        the cache).
+        """
+        now = time.time()
+        entries = []
+        for file_path in file_paths:
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                continue
+            entries.append((os.path.basename(file_path), preview_hash, size, now))
+        if not entries:
+            return
+        try:
+            self._get_connection().executemany(
+                "INSERT INTO preview_file (file_name, preview_hash, size, last_access, hits) "
+                "VALUES (?, ?, ?, ?, 1) ON CONFLICT(file_name) DO UPDATE SET "
+                "size = excluded.size, last_access = excluded.last_access, hits = hits + 1",
+                entries,
+            )
+        except sqlite3.Error as exc:
+            self.logger.warning("Cache index {} is not writable: {}".format(self.index_path, exc))
+
+    def get_preview_files(self) -> typing.List[PreviewFileEntry]:
+        """
+        :return: all preview files known by the index
+        """
+        try:
+            return (
+                self._get_connection()
+                .execute(
+                    "SELECT file_name, preview_hash, size, last_access, hits FROM preview_file"
+                )
+                .fetchall()
+            )
+        except sqlite3.Error as exc:
+            self.logger.warning("Cache index {} is not readable: {}".format(self.index_path, exc))
+            return []
+
+    def add_preview_files(self, entries: typing.Iterable[PreviewFileEntry]) -> None:
+        """
+        Add preview files not known by the index (eg. built before the index existed).
+        Known files are left unchanged.
+        """
+        try:
+            self._get_connection().executemany(
+                "INSERT OR IGNORE INTO preview_file "
+                "(file_name, preview_hash, size, last_access, hits) VALUES (?, ?, ?, ?, ?)",
+                entries,
+            )
+        except sqlite3.Error as exc:
+            self.logger.warning("Cache index {} is not writable: {}".format(self.index_path, exc))
+
+    def remove_preview_files(self, file_names: typing.Iterable[str]) -> None:
+        try:
+            self._get_connection().executemany(
+                "DELETE FROM preview_file WHERE file_name = ?",
+                [(file_name,) for file_name in file_names],
+            )
+        except sqlite3.Error as exc:
+            self.logger.warning("Cache index {} is not writable: {}".format(self.index_path, exc))
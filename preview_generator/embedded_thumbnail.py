@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Extraction of the preview image embedded in documents stored as zip containers: thumbnail of
+OOXML (docx, xlsx, pptx, …) and OpenDocument (odt, ods, odp, …) files, cover of EPUB books.
+
+The first page of such documents can be previewed from this image instead of converting the
+whole document to pdf.
+"""
+
+import os
+import posixpath
+import typing
+from urllib.parse import unquote
+from xml.etree import ElementTree
+import zipfile
+
+# INFO - set to 0 to always build document previews from their conversion to pdf, eg. if
+# documents are edited by applications which do not update their thumbnail
+EMBEDDED_THUMBNAIL_ENABLED = os.getenv("PREVIEW_GENERATOR_EMBEDDED_THUMBNAILS", "1") == "1"
+# INFO - paths of thumbnails in OOXML and OpenDocument files. Other formats (eg. the wmf
+# thumbnails of some OOXML files) are ignored.
+THUMBNAIL_PATHS = (
+    "docProps/thumbnail.jpeg",
+    "docProps/thumbnail.jpg",
+    "docProps/thumbnail.png",
+    "Thumbnails/thumbnail.png",
+)
+EPUB_CONTAINER_PATH = "META-INF/container.xml"
+IMAGE_EXTENSIONS = (".jpeg", ".jpg", ".png", ".gif")
+# INFO - members of the container larger than this (uncompressed) are not read: a thumbnail or
+# a package document is far smaller, larger ones are likely zip bombs
+EMBEDDED_MEMBER_MAX_SIZE = 16 * 1024 * 1024
+
+
+def _local_name(tag: str) -> str:
+    """
+    >>> _local_name("{http://www.idpf.org/2007/opf}item")
+    'item'
+    """
+    return tag.rsplit("}", 1)[-1]
+
+
+def _read_member(container: zipfile.ZipFile, name: str) -> typing.Optional[bytes]:
+    """
+    :return: content of the member of the container, None if it is larger than
+    EMBEDDED_MEMBER_MAX_SIZE
+    """
+    if container.getinfo(name).file_size > EMBEDDED_MEMBER_MAX_SIZE:
+        return None
+    return container.read(name)
+
+
+def _resolve_href(package_path: str, href: str) -> str:
+    """
+    :return: path in the container of a resource referenced by the package document
+    >>> _resolve_href("OEBPS/content.opf", "../images/my%20cover.png")
+    'images/my cover.png'
+    """
+    return posixpath.normpath(posixpath.join(posixpath.dirname(package_path), unquote(href)))
+
+
+def get_epub_cover_path(container: zipfile.ZipFile) -> typing.Optional[str]:
+    """
+    :return: path in the container of the cover image of an EPUB book, declared in the
+    manifest of its package document (EPUB 3 "cover-image" property or EPUB 2 "cover" meta)
+    """
+    container_content = _read_member(container, EPUB_CONTAINER_PATH)
+    if container_content is None:
+        return None
+    container_xml = ElementTree.fromstring(container_content)
+    package_path = None
+    for element in container_xml.iter():
+        if _local_name(element.tag) == "rootfile" and element.get("full-path"):
+            package_path = element.get("full-path")
+            break
+    if not package_path:
+        return None
+
+    package_content = _read_member(container, package_path)
+    if package_content is None:
+        return None
+    package = ElementTree.fromstring(package_content)
+    cover_id = None
+    items = {}  # type: typing.Dict[str, str]
+    for element in package.iter():
+        tag = _local_name(element.tag)
+        if tag == "meta" and element.get("name") == "cover":
+            cover_id = element.get("content")
+        elif tag == "item" and element.get("href"):
+            href = element.get("href", "")
+            if "cover-image" in element.get("properties", "").split():
+                return _resolve_href(package_path, href)
+            items[element.get("id", "")] = href
+    if cover_id and cover_id in items:
+        return _resolve_href(package_path, items[cover_id])
+    return None
+
+
+def get_embedded_thumbnail(file_path: str) -> typing.Optional[bytes]:
+    """
+    :return: content of the preview image embedded in the document, None if there is none
+    """
+    if not zipfile.is_zipfile(file_path):
+        return None
+    try:
+        with zipfile.ZipFile(file_path) as container:
+            names = set(container.namelist())
+            for thumbnail_path in THUMBNAIL_PATHS:
+                if thumbnail_path in names:
+                    return _read_member(container, thumbnail_path)
+            if EPUB_CONTAINER_PATH in names:
+                cover_path = get_epub_cover_path(container)
+                if cover_path and cover_path.lower().endswith(IMAGE_EXTENSIONS):
+                    return _read_member(container, cover_path)
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+        pass
+    return None
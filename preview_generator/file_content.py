@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import shutil
+import tempfile
+import types
+import typing
+
+from preview_generator.fingerprint import CONTENT_HASH_DIGEST_SIZE
+from preview_generator.fingerprint import content_hash_cache
+
+# INFO - buffer used to copy file contents, much larger than the usual 1 KiB/8 KiB to limit
+# syscalls on large files
+COPY_BUFFER_SIZE = 1024 * 1024
+# INFO - contents given as streams are kept in memory up to this size, larger ones are
+# written to a temporary file while being read
+FILE_CONTENT_MAX_MEMORY_SIZE = 64 * 1024 * 1024
+MIME_DETECTION_BUFFER_SIZE = 8192
+
+FileContentInput = typing.Union[bytes, bytearray, memoryview, typing.IO[bytes]]
+
+
+class FileContent(object):
+    """
+    File given as bytes or as a binary stream instead of a path.
+
+    The content is hashed while being read (same hash as the "content" cache key mode).
+    Builders able to decode from memory use get_data(), other builders use get_path(),
+    which writes the content once to a temporary file, only when required.
+    Streams of regular files (eg. open("file", "rb")) not read yet are linked, not copied.
+    """
+
+    def __init__(
+        self,
+        file_content: FileContentInput,
+        file_ext: str = "",
+        max_memory_size: int = FILE_CONTENT_MAX_MEMORY_SIZE,
+    ) -> None:
+        """
+        :param file_content: bytes-like object or binary stream, read from its current position
+        :param file_ext: extension of the file, eg ".docx". Some builders need it.
+        :param max_memory_size: streams larger than this are not kept in memory
+        """
+        self._tmp_dir = tempfile.mkdtemp(prefix="preview-generator-")
+        # INFO - the path is unique even if the content is not written yet: it is also used
+        # to identify the content in the manager
+        self.path = os.path.join(self._tmp_dir, "content" + file_ext)
+        self._data = None  # type: typing.Optional[bytes]
+        self._written = False
+        try:
+            if isinstance(file_content, (bytes, bytearray, memoryview)):
+                self._data = bytes(file_content)
+                content_hash = hashlib.blake2b(self._data, digest_size=CONTENT_HASH_DIGEST_SIZE)
+                self.hash = content_hash.hexdigest()
+            elif self._is_regular_file(file_content):
+                file_name = os.path.abspath(getattr(file_content, "name"))
+                self.hash = content_hash_cache.get(file_name)
+                os.symlink(file_name, self.path)
+                self._written = True
+            else:
+                self.hash = self._read_stream(file_content, max_memory_size)
+        except BaseException:
+            self.close()
+            raise
+
+    @staticmethod
+    def _is_regular_file(file_content: typing.IO[bytes]) -> bool:
+        """
+        :return: True if the stream is a regular file read from its beginning, which can be
+        linked instead of copied
+        """
+        file_name = getattr(file_content, "name", None)
+        if not isinstance(file_name, str) or not os.path.isfile(file_name):
+            return False
+        try:
+            return file_content.tell() == 0
+        except (OSError, ValueError):
+            return False
+
+    def _read_stream(self, file_content: typing.IO[bytes], max_memory_size: int) -> str:
+        content_hash = hashlib.blake2b(digest_size=CONTENT_HASH_DIGEST_SIZE)
+        buffers = []  # type: typing.List[bytes]
+        size = 0
+        output_file = None  # type: typing.Optional[typing.IO[bytes]]
+        try:
+            buffer = file_content.read(COPY_BUFFER_SIZE)
+            while buffer:
+                content_hash.update(buffer)
+                if output_file:
+                    output_file.write(buffer)
+                else:
+                    buffers.append(buffer)
+                    size += len(buffer)
+                    if size > max_memory_size:
+                        output_file = open(self.path, "wb")
+                        self._written = True
+                        for memory_buffer in buffers:
+                            output_file.write(memory_buffer)
+                        buffers = []
+                buffer = file_content.read(COPY_BUFFER_SIZE)
+        finally:
+            if output_file:
+                output_file.close()
+        if not self._written:
+            self._data = b"".join(buffers)
+        return content_hash.hexdigest()
+
+    def get_head(self, size: int = MIME_DETECTION_BUFFER_SIZE) -> bytes:
+        """
+        :return: first bytes of the content, eg. to detect its mimetype
+        """
+        if self._data is not None:
+            return self._data[:size]
+        with open(self.path, "rb") as file_handle:
+            return file_handle.read(size)
+
+    def get_data(self) -> bytes:
+        """
+        :return: the whole content
+        """
+        if self._data is None:
+            with open(self.path, "rb") as file_handle:
+                self._data = file_handle.read()
+        return self._data
+
+    def get_path(self) -> str:
+        """
+        :return: path of a file with the content, written on first call
+        """
+        if not self._written:
+            assert self._data is not None
+            with open(self.path, "wb") as file_handle:
+                file_handle.write(self._data)
+            self._written = True
+        return self.path
+
+    def close(self) -> None:
+        self._data = None
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    def __enter__(self) -> "FileContent":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: typing.Optional[typing.Type[BaseException]],
+        exc_value: typing.Optional[BaseException],
+        traceback: typing.Optional[types.TracebackType],
+    ) -> None:
+        self.close()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+import hashlib
+import os
+from threading import Lock
+import typing
+
+# INFO - the cache key of a preview can be computed from the path of the original file
+# (historical behavior) or from its content (same content = same previews, updated content =
+# new previews).
+CACHE_KEY_PATH = "path"
+CACHE_KEY_CONTENT = "content"
+CACHE_KEY_MODES = (CACHE_KEY_PATH, CACHE_KEY_CONTENT)
+
+HASH_READ_BUFFER_SIZE = 1024 * 1024
+# INFO - blake2b digest size is chosen to get the same hash length as md5 (32 hex chars),
+# so preview names keep the same format whatever the cache key mode is.
+CONTENT_HASH_DIGEST_SIZE = 16
+FINGERPRINT_CACHE_MAX_SIZE = 4096
+
+FileFingerprint = typing.Tuple[int, int, int, int]
+T = typing.TypeVar("T")
+
+
+def get_path_hash(file_path: str) -> str:
+    """
+    Hash of the path of the file, used as cache key in path mode.
+    """
+    return hashlib.md5(file_path.encode("utf-8")).hexdigest()
+
+
+def get_file_fingerprint(file_path: str) -> FileFingerprint:
+    """
+    Cheap fingerprint of the file based on stat() result. If the fingerprint did not change,
+    the content of the file is considered unchanged.
+    :return: (device, inode, size, modification time in ns)
+    """
+    stat_result = os.stat(file_path)
+    return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+
+def compute_content_hash(file_path: str) -> str:
+    """
+    Hash the content of the file using streaming reads.
+    """
+    content_hash = hashlib.blake2b(digest_size=CONTENT_HASH_DIGEST_SIZE)
+    with open(file_path, "rb") as file_handle:
+        buffer = file_handle.read(HASH_READ_BUFFER_SIZE)
+        while buffer:
+            content_hash.update(buffer)
+            buffer = file_handle.read(HASH_READ_BUFFER_SIZE)
+    return content_hash.hexdigest()
+
+
+class FingerprintLRUCache(typing.Generic[T]):
+    """
+    In-memory LRU of values computed from files (content hash, mimetype, …), indexed by file
+    path and the other arguments of the computation. The stored value is reused as long as
+    the stat fingerprint of the file is unchanged, so unchanged files are not read again.
+    """
+
+    def __init__(
+        self, compute: typing.Callable[..., T], max_size: int = FINGERPRINT_CACHE_MAX_SIZE
+    ) -> None:
+        """
+        :param compute: function computing the value from the file path and other arguments
+        :param max_size: max number of stored values
+        """
+        self.compute = compute
+        self.max_size = max_size
+        self._entries = (
+            OrderedDict()
+        )  # type: typing.OrderedDict[typing.Tuple[typing.Hashable, ...], typing.Tuple[FileFingerprint, T]]
+        self._lock = Lock()
+
+    def get(self, file_path: str, *args: typing.Hashable) -> T:
+        """
+        :return: compute(file_path, *args), computed again only if the file changed. The value
+        may be shared, do not modify it.
+        """
+        fingerprint = get_file_fingerprint(file_path)
+        key = (file_path,) + args
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == fingerprint:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        value = self.compute(file_path, *args)
+        with self._lock:
+            self._entries[key] = (fingerprint, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+content_hash_cache = FingerprintLRUCache(compute_content_hash)  # type: FingerprintLRUCache[str]
+
+
+def get_cache_key(file_path: str, cache_key_mode: str = CACHE_KEY_PATH) -> str:
+    """
+    Compute the key used to name previews of the given file in the cache folder.
+    :param file_path: path of the original file
+    :param cache_key_mode: CACHE_KEY_PATH or CACHE_KEY_CONTENT
+    :return: hash to use as preview name prefix
+    """
+    if cache_key_mode == CACHE_KEY_CONTENT:
+        return content_hash_cache.get(file_path)
+    if cache_key_mode == CACHE_KEY_PATH:
+        return get_path_hash(file_path)
+    raise ValueError(
+        "Invalid cache key mode: {}, expected one of {}".format(cache_key_mode, CACHE_KEY_MODES)
+    )
@@ -1,16 +1,32 @@
 # -*- coding: utf-8 -*-
 
-import hashlib
+import contextlib
 import logging
 import os
+import threading
 import typing
 
 from filelock import FileLock
 
+from preview_generator.cache_gc import EVICTION_POLICY_LRU
+from preview_generator.cache_gc import GcStats
+from preview_generator.cache_gc import collect_cache
+from preview_generator.cache_index import CacheIndex
 from preview_generator.exception import UnsupportedMimeType
 from preview_generator.extension import mimetypes_storage
+from preview_generator.file_content import FileContent
+from preview_generator.file_content import FileContentInput
+from preview_generator.fingerprint import CACHE_KEY_MODES
+from preview_generator.fingerprint import CACHE_KEY_PATH
+from preview_generator.fingerprint import get_cache_key
+from preview_generator.fingerprint import get_file_fingerprint
 from preview_generator.preview.builder.document_generic import DocumentPreviewBuilder
+from preview_generator.preview.builder.document_generic import INTERMEDIATE_PDF_LOCK_TIMEOUT
+from preview_generator.preview.builder.document_generic import PARTIAL_PDF_PAGE_NB
+from preview_generator.preview.builder.document_generic import get_partial_pdf_name
 from preview_generator.preview.builder_factory import PreviewBuilderFactory
+from preview_generator.preview.generic_preview import PreviewBuilder
+from preview_generator.utils import DocumentMetadata
 from preview_generator.utils import ImgDims
 from preview_generator.utils import LOCKFILE_EXTENSION
 from preview_generator.utils import LOCK_DEFAULT_TIMEOUT
@@ -18,33 +34,117 @@ from preview_generator.utils import LOGGER_NAME
 
 
 class PreviewContext(object):
+    """
+    Cache key, mimetype, builder and lock of a file. Only the cache key is computed on
+    creation: mimetype detection, builder lookup and lock creation are only done when
+    a preview has to be built, not for previews found in the cache.
+    """
+
     def __init__(
         self,
         preview_builder_factory: PreviewBuilderFactory,
         cache_path: str,
         file_path: str,
         file_ext: str,
+        cache_key_mode: str = CACHE_KEY_PATH,
+        mimetype: typing.Optional[str] = None,
+        file_hash: typing.Optional[str] = None,
+        lock_path: typing.Optional[str] = None,
+        lock_timeout: float = LOCK_DEFAULT_TIMEOUT,
     ):
-        self.mimetype = preview_builder_factory.get_file_mimetype(file_path, file_ext)
-        self.builder = preview_builder_factory.get_preview_builder(self.mimetype)
-        self.hash = hashlib.md5(file_path.encode("utf-8")).hexdigest()
-        file_lock_path = os.path.join(cache_path, self.hash + LOCKFILE_EXTENSION)
-        self.filelock = FileLock(file_lock_path, timeout=LOCK_DEFAULT_TIMEOUT)
+        """
+        :param mimetype: mimetype of the file, detected if not given
+        :param file_hash: cache key of the file, computed according to cache_key_mode if not given
+        :param lock_path: path of the lock of the file, "<cache key>.lock" if not given
+        :param lock_timeout: max time to wait for the lock
+        """
+        self._preview_builder_factory = preview_builder_factory
+        self._cache_path = cache_path
+        self._file_path = file_path
+        self._file_ext = file_ext
+        self._mimetype = mimetype
+        self._builder = None  # type: typing.Optional[PreviewBuilder]
+        self._filelock = None  # type: typing.Optional[FileLock]
+        self._lock_path = lock_path
+        self._lock_timeout = lock_timeout
+        self.hash = file_hash or get_cache_key(file_path, cache_key_mode)
+
+    @property
+    def mimetype(self) -> str:
+        if self._mimetype is None:
+            self._mimetype = self._preview_builder_factory.get_file_mimetype(
+                self._file_path, self._file_ext
+            )
+        return self._mimetype
+
+    @property
+    def builder(self) -> PreviewBuilder:
+        if self._builder is None:
+            try:
+                self._builder = self._preview_builder_factory.get_preview_builder(self.mimetype)
+            except UnsupportedMimeType as exc:
+                raise UnsupportedMimeType(
+                    "Mimetype guessed for '{}{}' is not supported.".format(
+                        self._file_path, self._file_ext or ""
+                    )
+                ) from exc
+        return self._builder
+
+    @property
+    def filelock(self) -> FileLock:
+        if self._filelock is None:
+            file_lock_path = self._lock_path or os.path.join(
+                self._cache_path, self.hash + LOCKFILE_EXTENSION
+            )
+            lock_timeout = self._lock_timeout
+            if isinstance(self.builder, DocumentPreviewBuilder):
+                # INFO - the lock is held while the document is converted to pdf
+                lock_timeout = max(lock_timeout, INTERMEDIATE_PDF_LOCK_TIMEOUT)
+            self._filelock = FileLock(file_lock_path, timeout=lock_timeout)
+        return self._filelock
+
+
+# INFO - (preview context, file content, preview name) -> None
+BuildFromContent = typing.Callable[[PreviewContext, bytes, str], None]
 
 
 class PreviewManager(object):
-    def __init__(self, cache_folder_path: str, create_folder: bool = False) -> None:
+    def __init__(
+        self,
+        cache_folder_path: str,
+        create_folder: bool = False,
+        cache_key_mode: str = CACHE_KEY_PATH,
+        track_cache_access: bool = False,
+    ) -> None:
         """
         :param cache_folder_path: path to the cache folder.
         This is where previews will be stored
         :param create_folder: if True, then create the cache folder
         if it does not exist
+        :param cache_key_mode: how previews are keyed in the cache folder. "path" (default)
+        uses the path of the file, "content" uses a hash of the file content so that same
+        content shares its previews and modified files get new previews.
+        :param track_cache_access: if True, accesses to previews are recorded in the cache
+        index, so that least used previews can be evicted (see collect_cache). It costs a
+        write to the index on each cache hit. Otherwise, previews are evicted by build date.
         """
         self.logger = logging.getLogger(LOGGER_NAME)
+        if cache_key_mode not in CACHE_KEY_MODES:
+            raise ValueError(
+                "Invalid cache key mode: {}, expected one of {}".format(
+                    cache_key_mode, CACHE_KEY_MODES
+                )
+            )
+        self.cache_key_mode = cache_key_mode
+        self.track_cache_access = track_cache_access
         cache_folder_path = os.path.join(cache_folder_path, "")  # add trailing slash
         # nopep8 see https://stackoverflow.com/questions/2736144/python-add-trailing-slash-to-directory-string-os-independently
 
         self.cache_path = cache_folder_path  # type: str
+        self._cache_index = CacheIndex(self.cache_path)
+        # INFO - preview contexts of files given by content, by path of their FileContent
+        self._content_contexts = {}  # type: typing.Dict[str, PreviewContext]
+        self._content_contexts_lock = threading.Lock()
         self._factory = (
             PreviewBuilderFactory.get_instance()
         )  # nopep8 keep link to singleton instance as it will be often used
@@ -56,12 +156,16 @@ class PreviewManager(object):
                 self.logger.error("cant create cache folder [{}]".format(self.cache_path))
 
     def get_preview_context(self, file_path: str, file_ext: str) -> PreviewContext:
-        try:
-            return PreviewContext(self._factory, self.cache_path, file_path, file_ext)
-        except UnsupportedMimeType as exc:
-            raise UnsupportedMimeType(
-                "Mimetype guessed for '{}{}' is not supported.".format(file_path, file_ext or "")
-            ) from exc
+        """
+        :return: context of the file. UnsupportedMimeType is raised when its builder is used.
+        """
+        with self._content_contexts_lock:
+            content_context = self._content_contexts.get(file_path)
+        if content_context:
+            return content_context
+        return PreviewContext(
+            self._factory, self.cache_path, file_path, file_ext, self.cache_key_mode
+        )
 
     def get_mimetype(self, file_path: str, file_ext: str = "") -> str:
         """
@@ -138,8 +242,29 @@ class PreviewManager(object):
                 it's usefull if the extension can't be found in file_path
         :return: number of pages. Default is 1 (eg for a JPEG)
         """
+        return self.get_document_metadata(file_path, file_ext).page_nb
+
+    def get_document_metadata(self, file_path: str, file_ext: str = "") -> DocumentMetadata:
+        """
+        Return metadata of the given file: number of pages and, when the builder knows
+        them, size of each page.
+        Metadata of documents (pdf, office, …) is kept in an index in the cache folder
+        until the file changes.
+        :param file_path: path of the file
+        :param file_ext: extension associated to the file. Eg 'jpg'. May be empty -
+                it's usefull if the extension can't be found in file_path
+        :return: metadata of the document
+        """
 
         preview_context = self.get_preview_context(file_path, file_ext)
+        # INFO - metadata is indexed by the cache key and the fingerprint of the given file:
+        # cached metadata is returned without detecting the mimetype of the file
+        fingerprint = get_file_fingerprint(file_path)
+        metadata = self._cache_index.get_document_metadata(preview_context.hash, fingerprint)
+        if metadata is not None:
+            return metadata
+
+        metadata_context = preview_context
         # INFO - G.M - 2021-04-29 deal with pivot format
         # jpeg preview from pdf for libreoffice/scribus
         # - change original file to use to pivot file (pdf preview) of the content instead of the
@@ -147,11 +272,15 @@ class PreviewManager(object):
         # - use preview context of this pivot pdf file.
         if isinstance(preview_context.builder, DocumentPreviewBuilder):
             file_path = self.get_pdf_preview(file_path=file_path, file_ext=file_ext, force=False)
-            preview_context = self.get_preview_context(file_path, file_ext=".pdf")
-        with preview_context.filelock:
-            return preview_context.builder.get_page_number(
-                file_path, preview_context.hash, self.cache_path, preview_context.mimetype
+            metadata_context = self._get_intermediate_pdf_context(file_path)
+
+        with metadata_context.filelock:
+            metadata = metadata_context.builder.get_document_metadata(
+                file_path, metadata_context.hash, self.cache_path, metadata_context.mimetype
             )
+        if metadata_context.builder.cache_document_metadata:
+            self._cache_index.set_document_metadata(preview_context.hash, fingerprint, metadata)
+        return metadata
 
     def get_jpeg_preview(
         self,
@@ -177,6 +306,7 @@ class PreviewManager(object):
         :return: path to the generated preview file
         """
         preview_context = self.get_preview_context(file_path, file_ext)
+        preview_hash = preview_context.hash
 
         if width is None:
             width = height
@@ -187,6 +317,13 @@ class PreviewManager(object):
         preview_file_path = os.path.join(self.cache_path, preview_name + extension)  # nopep8
 
         if dry_run:
+            # INFO - unsupported files are rejected even if the preview is not built
+            preview_context.builder
+            return preview_file_path
+        # INFO - previews are renamed into place once complete (see utils.atomic_output_path),
+        # so an existing preview is always a whole one: cache hits do not need the lock
+        if not force and os.path.exists(preview_file_path):
+            self._record_access(preview_hash, [preview_file_path])
             return preview_file_path
 
         # INFO - G.M - 2021-04-29 deal with pivot format
@@ -195,9 +332,17 @@ class PreviewManager(object):
         # original file
         # - use preview context of this pivot pdf file.
         if isinstance(preview_context.builder, DocumentPreviewBuilder):
-            file_path = self.get_pdf_preview(file_path=file_path, file_ext=file_ext, force=force)
-            preview_context = self.get_preview_context(file_path, file_ext=".pdf")
+            if page <= 0 and self._build_first_page_jpeg_previews(
+                preview_context, file_path, [(size, preview_name)], extension
+            ):
+                self._record_access(preview_hash, [preview_file_path])
+                return preview_file_path
+            file_path = self._get_document_pdf_preview(
+                preview_context, file_path, file_ext, [max(page, 0)], force
+            )
+            preview_context = self._get_intermediate_pdf_context(file_path)
         with preview_context.filelock:
+            # INFO - the preview may have been built while waiting for the lock
             if force or not os.path.exists(preview_file_path):
                 preview_context.builder.build_jpeg_preview(
                     file_path=file_path,
@@ -209,8 +354,168 @@ class PreviewManager(object):
                     mimetype=preview_context.mimetype,
                 )
 
+        self._record_access(preview_hash, [preview_file_path])
         return preview_file_path
 
+    def get_jpeg_preview_sizes(
+        self,
+        file_path: str,
+        sizes: typing.List[ImgDims],
+        page: int = -1,
+        force: bool = False,
+        file_ext: str = "",
+        dry_run: bool = False,
+    ) -> typing.List[str]:
+        """
+        Return JPEG previews of a page of given file in several sizes.
+        Missing previews are generated at once when the builder supports it
+        (eg. a single decoding of the image for all sizes).
+        :param file_path: path of the file to preview
+        :param sizes: sizes of the requested preview images
+        :param page: page of the original document, if it makes sense
+        :param force: if True, do not use cached previews.
+        :param file_ext: extension associated to the file. Eg 'jpg'. May be empty -
+                it's useful if the extension can't be found in file_path
+        :param dry_run: Don't actually generate the files, but return their paths as
+                if we had
+        :return: paths to the generated preview files, in sizes order
+        """
+        preview_context = self.get_preview_context(file_path, file_ext)
+        preview_hash = preview_context.hash
+        extension = ".jpeg"
+
+        preview_names = [
+            (size, self._get_preview_name(preview_context.hash, size, page)) for size in sizes
+        ]
+        preview_file_paths = [
+            os.path.join(self.cache_path, preview_name + extension)
+            for _, preview_name in preview_names
+        ]
+
+        if dry_run:
+            # INFO - unsupported files are rejected even if the preview is not built
+            preview_context.builder
+            return preview_file_paths
+        # INFO - cache hits do not need the lock, see get_jpeg_preview
+        if not force and all(os.path.exists(path) for path in preview_file_paths):
+            self._record_access(preview_hash, preview_file_paths)
+            return preview_file_paths
+
+        # INFO - deal with pivot format, see get_jpeg_preview
+        if isinstance(preview_context.builder, DocumentPreviewBuilder):
+            if page <= 0 and self._build_first_page_jpeg_previews(
+                preview_context, file_path, preview_names, extension
+            ):
+                self._record_access(preview_hash, preview_file_paths)
+                return preview_file_paths
+            file_path = self._get_document_pdf_preview(
+                preview_context, file_path, file_ext, [max(page, 0)], force
+            )
+            preview_context = self._get_intermediate_pdf_context(file_path)
+        with preview_context.filelock:
+            missing_preview_names = [
+                (size, preview_name)
+                for size, preview_name in preview_names
+                if force
+                or not os.path.exists(os.path.join(self.cache_path, preview_name + extension))
+            ]
+            if missing_preview_names:
+                preview_context.builder.build_jpeg_preview_sizes(
+                    file_path=file_path,
+                    preview_names=missing_preview_names,
+                    cache_path=self.cache_path,
+                    page_id=max(page, 0),  # if page is -1 then return preview of first page,
+                    extension=extension,
+                    mimetype=preview_context.mimetype,
+                )
+
+        self._record_access(preview_hash, preview_file_paths)
+        return preview_file_paths
+
+    def get_jpeg_previews(
+        self,
+        file_path: str,
+        pages: typing.Optional[typing.Iterable[int]] = None,
+        width: int = None,
+        height: int = 256,
+        force: bool = False,
+        file_ext: str = "",
+        dry_run: bool = False,
+    ) -> typing.List[str]:
+        """
+        Return JPEG previews of several pages of given file, according to parameters.
+        Missing previews are generated at once when the builder supports it
+        (eg. a single pdftocairo call for a range of pdf pages).
+        :param file_path: path of the file to preview
+        :param pages: pages of the original document, eg. range(0, 10). Default is all pages
+        :param width: width of the requested preview images
+        :param height: height of the requested preview images
+        :param force: if True, do not use cached previews.
+        :param file_ext: extension associated to the file. Eg 'jpg'. May be empty -
+                it's useful if the extension can't be found in file_path
+        :param dry_run: Don't actually generate the files, but return their paths as
+                if we had
+        :return: paths to the generated preview files, in pages order
+        """
+        preview_context = self.get_preview_context(file_path, file_ext)
+        preview_hash = preview_context.hash
+
+        if width is None:
+            width = height
+        size = ImgDims(width=width, height=height)
+        extension = ".jpeg"
+
+        if pages is None:
+            pages = range(self.get_page_nb(file_path, file_ext))
+        page_ids = list(pages)
+        preview_names = {
+            page_id: self._get_preview_name(preview_context.hash, size, page_id)
+            for page_id in page_ids
+        }
+        preview_file_paths = [
+            os.path.join(self.cache_path, preview_names[page_id] + extension)
+            for page_id in page_ids
+        ]
+
+        if dry_run:
+            # INFO - unsupported files are rejected even if the preview is not built
+            preview_context.builder
+            return preview_file_paths
+        # INFO - cache hits do not need the lock, see get_jpeg_preview
+        if not force and all(os.path.exists(path) for path in preview_file_paths):
+            self._record_access(preview_hash, preview_file_paths)
+            return preview_file_paths
+
+        # INFO - G.M - 2021-04-29 deal with pivot format
+        # jpeg preview from pdf for libreoffice/scribus
+        # - change original file to use to pivot file (pdf preview) of the content instead of the
+        # original file
+        # - use preview context of this pivot pdf file.
+        if isinstance(preview_context.builder, DocumentPreviewBuilder):
+            file_path = self._get_document_pdf_preview(
+                preview_context, file_path, file_ext, page_ids, force
+            )
+            preview_context = self._get_intermediate_pdf_context(file_path)
+        with preview_context.filelock:
+            missing_preview_names = {
+                page_id: preview_name
+                for page_id, preview_name in preview_names.items()
+                if force
+                or not os.path.exists(os.path.join(self.cache_path, preview_name + extension))
+            }
+            if missing_preview_names:
+                preview_context.builder.build_jpeg_previews(
+                    file_path=file_path,
+                    preview_names=missing_preview_names,
+                    cache_path=self.cache_path,
+                    extension=extension,
+                    size=size,
+                    mimetype=preview_context.mimetype,
+                )
+
+        self._record_access(preview_hash, preview_file_paths)
+        return preview_file_paths
+
     def get_pdf_preview(
         self,
         file_path: str,
@@ -237,6 +542,12 @@ class PreviewManager(object):
         try:
             cache_file_path = self.cache_path + preview_name + extension
             if dry_run:
+                # INFO - unsupported files are rejected even if the preview is not built
+                preview_context.builder
+                return cache_file_path
+            # INFO - cache hits do not need the lock, see get_jpeg_preview
+            if not force and os.path.exists(cache_file_path):
+                self._record_access(preview_context.hash, [cache_file_path])
                 return cache_file_path
             with preview_context.filelock:
                 if force or not os.path.exists(cache_file_path):
@@ -249,6 +560,7 @@ class PreviewManager(object):
                         mimetype=preview_context.mimetype,
                     )
 
+            self._record_access(preview_context.hash, [cache_file_path])
             return cache_file_path
 
         except AttributeError:
@@ -273,6 +585,12 @@ class PreviewManager(object):
         try:
             cache_file_path = self.cache_path + preview_name + extension
             if dry_run:
+                # INFO - unsupported files are rejected even if the preview is not built
+                preview_context.builder
+                return cache_file_path
+            # INFO - cache hits do not need the lock, see get_jpeg_preview
+            if not force and os.path.exists(cache_file_path):
+                self._record_access(preview_context.hash, [cache_file_path])
                 return cache_file_path
             with preview_context.filelock:
                 if force or not os.path.exists(cache_file_path):
@@ -282,6 +600,7 @@ class PreviewManager(object):
                         cache_path=self.cache_path,
                         extension=extension,
                     )
+            self._record_access(preview_context.hash, [cache_file_path])
             return cache_file_path
 
         except AttributeError:
@@ -306,6 +625,12 @@ class PreviewManager(object):
         try:
             cache_file_path = self.cache_path + preview_name + extension
             if dry_run:
+                # INFO - unsupported files are rejected even if the preview is not built
+                preview_context.builder
+                return cache_file_path
+            # INFO - cache hits do not need the lock, see get_jpeg_preview
+            if not force and os.path.exists(cache_file_path):
+                self._record_access(preview_context.hash, [cache_file_path])
                 return cache_file_path
             with preview_context.filelock:
                 if force or not os.path.exists(cache_file_path):
@@ -315,6 +640,7 @@ class PreviewManager(object):
                         cache_path=self.cache_path,
                         extension=extension,
                     )
+            self._record_access(preview_context.hash, [cache_file_path])
             return cache_file_path
 
         except AttributeError:
@@ -339,6 +665,12 @@ class PreviewManager(object):
         try:
             cache_file_path = self.cache_path + preview_name + extension
             if dry_run:
+                # INFO - unsupported files are rejected even if the preview is not built
+                preview_context.builder
+                return cache_file_path
+            # INFO - cache hits do not need the lock, see get_jpeg_preview
+            if not force and os.path.exists(cache_file_path):
+                self._record_access(preview_context.hash, [cache_file_path])
                 return cache_file_path
             with preview_context.filelock:
                 if force or not os.path.exists(cache_file_path):  # nopep8
@@ -348,10 +680,359 @@ class PreviewManager(object):
                         cache_path=self.cache_path,
                         extension=extension,
                     )
+            self._record_access(preview_context.hash, [cache_file_path])
             return cache_file_path
         except AttributeError:
             raise Exception("Error while getting the file preview")
 
+    def _build_first_page_jpeg_previews(
+        self,
+        preview_context: PreviewContext,
+        file_path: str,
+        preview_names: typing.List[typing.Tuple[ImgDims, str]],
+        extension: str,
+    ) -> bool:
+        """
+        Build first page previews of a document without converting it to pdf when its builder
+        is able to, eg. from its embedded thumbnail if it is large enough: most small previews
+        of office documents do not need a conversion to pdf.
+        :return: True if the previews are built
+        """
+        builder = typing.cast(DocumentPreviewBuilder, preview_context.builder)
+        with preview_context.filelock:
+            return builder.build_first_page_jpeg_preview_sizes(
+                file_path=file_path,
+                preview_names=preview_names,
+                cache_path=self.cache_path,
+                extension=extension,
+                mimetype=preview_context.mimetype,
+            )
+
+    def _get_document_pdf_preview(
+        self,
+        preview_context: PreviewContext,
+        file_path: str,
+        file_ext: str,
+        pages: typing.List[int],
+        force: bool,
+    ) -> str:
+        """
+        Return the pdf used to build jpeg previews of the given pages of a document. While the
+        full pdf of the document is not built, previews of its first PARTIAL_PDF_PAGE_NB pages
+        are built from a pdf of these pages only: the full pdf is only built when it is
+        requested (get_pdf_preview) or when later pages are requested.
+        :return: path of the partial or full pdf
+        """
+        builder = typing.cast(DocumentPreviewBuilder, preview_context.builder)
+        full_pdf_file_path = self.get_pdf_preview(file_path, file_ext=file_ext, dry_run=True)
+        if (
+            not PARTIAL_PDF_PAGE_NB
+            or not builder.has_partial_pdf_preview()
+            or os.path.exists(full_pdf_file_path)
+            or any(page >= PARTIAL_PDF_PAGE_NB for page in pages)
+        ):
+            return self.get_pdf_preview(file_path=file_path, file_ext=file_ext, force=force)
+
+        preview_name = get_partial_pdf_name(preview_context.hash, PARTIAL_PDF_PAGE_NB)
+        cache_file_path = self.cache_path + preview_name + ".pdf"
+        if force or not os.path.exists(cache_file_path):
+            with preview_context.filelock:
+                if force or not os.path.exists(cache_file_path):
+                    builder.build_partial_pdf_preview(
+                        file_path=file_path,
+                        preview_name=preview_name,
+                        cache_path=self.cache_path,
+                        page_nb=PARTIAL_PDF_PAGE_NB,
+                        mimetype=preview_context.mimetype,
+                    )
+        self._record_access(preview_context.hash, [cache_file_path])
+        return cache_file_path
+
+    def _get_intermediate_pdf_context(self, file_path: str) -> PreviewContext:
+        """
+        :return: context of the intermediate pdf of a document. Its lock is the one of the
+        conversion of the document (see DocumentPreviewBuilder._build_intermediate_pdf), also
+        taken by the cache collection to evict the pdf.
+        """
+        return PreviewContext(
+            self._factory,
+            self.cache_path,
+            file_path,
+            ".pdf",
+            self.cache_key_mode,
+            lock_path=file_path + LOCKFILE_EXTENSION,
+            lock_timeout=INTERMEDIATE_PDF_LOCK_TIMEOUT,
+        )
+
+    def _record_access(self, preview_hash: str, preview_file_paths: typing.List[str]) -> None:
+        """
+        Keep track of accesses to previews in the cache index, used to evict previews
+        """
+        if self.track_cache_access:
+            self._cache_index.record_access(preview_hash, preview_file_paths)
+
+    def collect_cache(
+        self,
+        max_size: typing.Optional[int] = None,
+        max_age: typing.Optional[float] = None,
+        policy: str = EVICTION_POLICY_LRU,
+        max_deletions: typing.Optional[int] = None,
+    ) -> GcStats:
+        """
+        Evict previews from the cache folder, see cache_gc.collect_cache.
+        :param max_size: byte budget of the cache folder
+        :param max_age: previews not accessed since max_age seconds are evicted
+        :param policy: "lru" or "lfu"
+        :param max_deletions: max number of previews evicted by this call
+        """
+        return collect_cache(
+            self.cache_path,
+            max_size=max_size,
+            max_age=max_age,
+            policy=policy,
+            max_deletions=max_deletions,
+        )
+
+    @contextlib.contextmanager
+    def _open_file_content(
+        self, file_content: FileContentInput, file_ext: str
+    ) -> typing.Generator[FileContent, None, None]:
+        """
+        Read the content and register its preview context, so that the path of the
+        FileContent can be given to other methods of the manager.
+        """
+        with FileContent(file_content, file_ext) as content:
+            try:
+                mimetype = self._factory.get_content_mimetype(content, file_ext)
+                preview_context = PreviewContext(
+                    self._factory,
+                    self.cache_path,
+                    content.path,
+                    file_ext,
+                    mimetype=mimetype,
+                    file_hash=content.hash,
+                )
+                # INFO - unsupported contents are rejected before being used
+                preview_context.builder
+            except UnsupportedMimeType as exc:
+                raise UnsupportedMimeType(
+                    "Mimetype guessed for content '{}' is not supported.".format(file_ext)
+                ) from exc
+            with self._content_contexts_lock:
+                self._content_contexts[content.path] = preview_context
+            try:
+                yield content
+            finally:
+                with self._content_contexts_lock:
+                    del self._content_contexts[content.path]
+
+    def _get_preview_from_content(
+        self,
+        file_content: FileContentInput,
+        file_ext: str,
+        get_preview: typing.Callable[..., str],
+        build_preview_from_content: typing.Optional[BuildFromContent],
+        force: bool,
+        dry_run: bool,
+        **kwargs: typing.Any
+    ) -> str:
+        """
+        Return a preview of a file given by its content.
+        :param get_preview: method of the manager returning the preview of a file
+        :param build_preview_from_content: function calling the builder method building
+        the preview from memory, if any. Builders not implementing it (NotImplementedError)
+        get the content as a file.
+        """
+        with self._open_file_content(file_content, file_ext) as content:
+            preview_file_path = get_preview(content.path, file_ext=file_ext, dry_run=True, **kwargs)
+            preview_context = self.get_preview_context(content.path, file_ext)
+            if dry_run:
+                return preview_file_path
+            if not force and os.path.exists(preview_file_path):
+                self._record_access(preview_context.hash, [preview_file_path])
+                return preview_file_path
+
+            # INFO - documents are converted to pdf by external programs, which need a file
+            if build_preview_from_content and not isinstance(
+                preview_context.builder, DocumentPreviewBuilder
+            ):
+                preview_name = os.path.splitext(os.path.basename(preview_file_path))[0]
+                try:
+                    with preview_context.filelock:
+                        if force or not os.path.exists(preview_file_path):
+                            build_preview_from_content(
+                                preview_context, content.get_data(), preview_name
+                            )
+                    self._record_access(preview_context.hash, [preview_file_path])
+                    return preview_file_path
+                except NotImplementedError:
+                    pass
+
+            return get_preview(content.get_path(), file_ext=file_ext, force=force, **kwargs)
+
+    def get_jpeg_preview_from_content(
+        self,
+        file_content: FileContentInput,
+        file_ext: str = "",
+        page: int = -1,
+        width: int = None,
+        height: int = 256,
+        force: bool = False,
+        dry_run: bool = False,
+    ) -> str:
+        """
+        Return a JPEG preview of a file given as bytes or as a binary stream.
+        Previews are keyed by the hash of the content, whatever the cache key mode is.
+        Builders able to decode from memory (images, svg, raw files) do not use any temporary
+        file, other builders get the content written once to a temporary file.
+        :param file_content: bytes-like object or binary stream
+        :param file_ext: extension of the file, eg '.docx'. Recommended, as it is used to
+                detect the type of the content and required by some builders.
+        see get_jpeg_preview for other parameters
+        :return: path to the generated preview file
+        """
+        size = ImgDims(width=width if width is not None else height, height=height)
+
+        def build_preview_from_content(
+            preview_context: PreviewContext, data: bytes, preview_name: str
+        ) -> None:
+            preview_context.builder.build_jpeg_preview_from_content(
+                file_content=data,
+                preview_name=preview_name,
+                cache_path=self.cache_path,
+                page_id=max(page, 0),  # if page is -1 then return preview of first page,
+                extension=".jpeg",
+                size=size,
+                mimetype=preview_context.mimetype,
+            )
+
+        return self._get_preview_from_content(
+            file_content,
+            file_ext,
+            self.get_jpeg_preview,
+            build_preview_from_content,
+            force=force,
+            dry_run=dry_run,
+            page=page,
+            width=width,
+            height=height,
+        )
+
+    def get_pdf_preview_from_content(
+        self,
+        file_content: FileContentInput,
+        file_ext: str = "",
+        page: int = -1,
+        force: bool = False,
+        dry_run: bool = False,
+    ) -> str:
+        """
+        Return a PDF preview of a file given as bytes or as a binary stream.
+        see get_jpeg_preview_from_content and get_pdf_preview
+        """
+        return self._get_preview_from_content(
+            file_content,
+            file_ext,
+            self.get_pdf_preview,
+            None,
+            force=force,
+            dry_run=dry_run,
+            page=page,
+        )
+
+    def get_text_preview_from_content(
+        self,
+        file_content: FileContentInput,
+        file_ext: str = "",
+        force: bool = False,
+        dry_run: bool = False,
+    ) -> str:
+        """
+        Return a TXT preview of a file given as bytes or as a binary stream.
+        see get_jpeg_preview_from_content and get_text_preview
+        """
+
+        def build_preview_from_content(
+            preview_context: PreviewContext, data: bytes, preview_name: str
+        ) -> None:
+            preview_context.builder.build_text_preview_from_content(
+                file_content=data,
+                preview_name=preview_name,
+                cache_path=self.cache_path,
+                extension=".txt",
+            )
+
+        return self._get_preview_from_content(
+            file_content,
+            file_ext,
+            self.get_text_preview,
+            build_preview_from_content,
+            force=force,
+            dry_run=dry_run,
+        )
+
+    def get_html_preview_from_content(
+        self,
+        file_content: FileContentInput,
+        file_ext: str = "",
+        force: bool = False,
+        dry_run: bool = False,
+    ) -> str:
+        """
+        Return a HTML preview of a file given as bytes or as a binary stream.
+        see get_jpeg_preview_from_content and get_html_preview
+        """
+
+        def build_preview_from_content(
+            preview_context: PreviewContext, data: bytes, preview_name: str
+        ) -> None:
+            preview_context.builder.build_html_preview_from_content(
+                file_content=data,
+                preview_name=preview_name,
+                cache_path=self.cache_path,
+                extension=".html",
+            )
+
+        return self._get_preview_from_content(
+            file_content,
+            file_ext,
+            self.get_html_preview,
+            build_preview_from_content,
+            force=force,
+            dry_run=dry_run,
+        )
+
+    def get_json_preview_from_content(
+        self,
+        file_content: FileContentInput,
+        file_ext: str = "",
+        force: bool = False,
+        dry_run: bool = False,
+    ) -> str:
+        """
+        Return a JSON preview of a file given as bytes or as a binary stream.
+        see get_jpeg_preview_from_content and get_json_preview
+        """
+
+        def build_preview_from_content(
+            preview_context: PreviewContext, data: bytes, preview_name: str
+        ) -> None:
+            preview_context.builder.build_json_preview_from_content(
+                file_content=data,
+                preview_name=preview_name,
+                cache_path=self.cache_path,
+                extension=".json",
+            )
+
+        return self._get_preview_from_content(
+            file_content,
+            file_ext,
+            self.get_json_preview,
+            build_preview_from_content,
+            force=force,
+            dry_run=dry_run,
+        )
+
     def _get_preview_name(self, filehash: str, size: ImgDims = None, page: int = None) -> str:
         """
         Build a hash based on the given parameters.
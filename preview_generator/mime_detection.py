@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Mimetype detection of files: extension first, then libmagic. Types that libmagic or the
+extension can't tell precisely (text/plain, application/xml, image/tiff, …) are resolved
+in-process from the shared-mime-info extension database then, for files without a precise
+extension, from the first bytes of the file, which is what the `mimetype` command of
+File::MimeInfo did.
+"""
+
+import os
+import re
+import threading
+import typing
+
+import magic
+
+from preview_generator.extension import mimetypes_storage
+from preview_generator.file_content import MIME_DETECTION_BUFFER_SIZE
+from preview_generator.fingerprint import FingerprintLRUCache
+
+AMBIGUOUS_MIMES = [
+    "text/xml",
+    "text/plain",
+    "application/xml",
+    "application/octet-stream",
+    "image/tiff",
+    "audio/ogg",
+]
+# INFO - extensions shared by several formats: files matching them are sniffed like files
+# without known extension
+AMBIGUOUS_GLOB_MIMES = [
+    "application/octet-stream",
+    "application/ogg",
+    "audio/ogg",
+    "video/ogg",
+]
+MIMETYPE_CACHE_MAX_SIZE = 4096
+SHARED_MIME_INFO_GLOBS_PATHS = (
+    "/usr/local/share/mime/globs2",
+    "/usr/share/mime/globs2",
+)
+
+OGG_MAGIC = b"OggS"
+OGG_THEORA_MAGIC = b"\x80theora"
+OGG_VORBIS_MAGIC = b"\x01vorbis"
+XML_ROOT_ELEMENT_PATTERN = re.compile(
+    rb"^\s*(?:<\?xml[^>]*>\s*)?(?:<!--.*?-->\s*|<!DOCTYPE[^>]*>\s*)*<(?:\w+:)?(\w+)",
+    re.DOTALL | re.IGNORECASE,
+)
+XML_ROOT_ELEMENT_MIMETYPES = {b"svg": "image/svg+xml", b"html": "text/html"}
+
+_thread_local = threading.local()
+_globs_lock = threading.Lock()
+_shared_mime_info_globs = None  # type: typing.Optional[typing.Dict[str, str]]
+
+
+def get_magic() -> magic.Magic:
+    """
+    :return: libmagic handle of the current thread. Handles are not thread safe and loading
+    the magic database is slow, so each thread keeps its own.
+    """
+    mime = getattr(_thread_local, "magic", None)
+    if mime is None:
+        mime = magic.Magic(mime=True)
+        _thread_local.magic = mime
+    return mime
+
+
+def load_shared_mime_info_globs(
+    globs_paths: typing.Iterable[str] = SHARED_MIME_INFO_GLOBS_PATHS,
+) -> typing.Dict[str, str]:
+    """
+    Read "*.ext" patterns of shared-mime-info globs2 files.
+    :return: mimetype of highest weight by lower case extension, eg {".dng": "image/x-adobe-dng"}
+    """
+    globs = {}  # type: typing.Dict[str, typing.Tuple[int, str]]
+    for globs_path in globs_paths:
+        if not os.path.isfile(globs_path):
+            continue
+        with open(globs_path, encoding="utf-8") as globs_file:
+            for line in globs_file:
+                if line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split(":")
+                if len(fields) < 3 or not fields[0].isdigit():
+                    continue
+                weight, mimetype, pattern = int(fields[0]), fields[1], fields[2]
+                extension = pattern[1:]
+                if not pattern.startswith("*.") or any(char in extension for char in "*?["):
+                    continue
+                extension = extension.lower()
+                # INFO - on same weight, the first pattern wins, as in update-mime-database
+                if extension not in globs or globs[extension][0] < weight:
+                    globs[extension] = (weight, mimetype)
+    return {extension: mimetype for extension, (_, mimetype) in globs.items()}
+
+
+def guess_type_from_shared_mime_info(file_name: str) -> typing.Optional[str]:
+    global _shared_mime_info_globs
+    with _globs_lock:
+        if _shared_mime_info_globs is None:
+            _shared_mime_info_globs = load_shared_mime_info_globs()
+    return _shared_mime_info_globs.get(os.path.splitext(file_name)[1].lower())
+
+
+def sniff_mimetype(head: bytes) -> typing.Optional[str]:
+    """
+    Guess a precise mimetype from the first bytes of a file of ambiguous type.
+
+    >>> sniff_mimetype(b'<?xml version="1.0"?><svg xmlns="http://www.w3.org/2000/svg"/>')
+    'image/svg+xml'
+    >>> sniff_mimetype(b"OggS" + bytes(24) + b"\\x80theora")
+    'video/x-theora+ogg'
+    >>> sniff_mimetype(b"plain text") is None
+    True
+    """
+    if head.startswith(OGG_MAGIC):
+        if OGG_THEORA_MAGIC in head:
+            return "video/x-theora+ogg"
+        if OGG_VORBIS_MAGIC in head:
+            return "audio/x-vorbis+ogg"
+        return None
+    match = XML_ROOT_ELEMENT_PATTERN.match(head.lstrip(b"\xef\xbb\xbf"))
+    if match:
+        return XML_ROOT_ELEMENT_MIMETYPES.get(match.group(1).lower())
+    return None
+
+
+def resolve_ambiguous_mimetype(mimetype: str, file_name: str, head: bytes) -> str:
+    """
+    The extension is trusted first, as in the `mimetype` command: eg. a ".txt" file
+    containing html stays "text/plain". The content is only sniffed if no extension of the
+    shared-mime-info database matches, or if it matches several formats (see
+    AMBIGUOUS_GLOB_MIMES).
+    :param mimetype: mimetype found from the extension or by libmagic, see AMBIGUOUS_MIMES
+    :param file_name: name of the file, with its extension
+    :param head: first bytes of the file
+    """
+    extension_mimetype = guess_type_from_shared_mime_info(file_name)
+    if extension_mimetype and extension_mimetype not in AMBIGUOUS_GLOB_MIMES:
+        return extension_mimetype
+    return sniff_mimetype(head) or mimetype
+
+
+def read_head(file_path: str, size: int = MIME_DETECTION_BUFFER_SIZE) -> bytes:
+    with open(file_path, "rb") as file_handle:
+        return file_handle.read(size)
+
+
+def detect_file_mimetype(file_path: str, file_ext: str = "") -> str:
+    """
+    :param file_ext: extension of the file, if not found in file_path, eg ".docx"
+    """
+    file_name = file_path + file_ext if file_ext else file_path
+    mimetype, _ = mimetypes_storage.guess_type(file_name, strict=False)
+
+    if not mimetype or mimetype == "application/octet-stream":
+        mimetype = get_magic().from_file(file_path)
+
+    if mimetype and mimetype in AMBIGUOUS_MIMES:
+        head = read_head(file_path) if os.path.isfile(file_path) else b""
+        mimetype = resolve_ambiguous_mimetype(mimetype, file_name, head)
+
+    if not mimetype:
+        # Should never happen.
+        raise ValueError("Cannot determine the type of " + file_path)
+    return mimetype
+
+
+def detect_content_mimetype(head: bytes, file_name: str) -> str:
+    """
+    :param head: first bytes of the content
+    :param file_name: name of the content, used for its extension
+    """
+    mimetype, _ = mimetypes_storage.guess_type(file_name, strict=False)
+
+    if not mimetype or mimetype == "application/octet-stream":
+        mimetype = get_magic().from_buffer(head)
+
+    if mimetype and mimetype in AMBIGUOUS_MIMES:
+        mimetype = resolve_ambiguous_mimetype(mimetype, file_name, head)
+
+    if not mimetype:
+        # Should never happen.
+        raise ValueError("Cannot determine the type of the file content")
+    return mimetype
+
+
+mimetype_cache = FingerprintLRUCache(
+    detect_file_mimetype, MIMETYPE_CACHE_MAX_SIZE
+)  # type: FingerprintLRUCache[str]
+
+
+def get_file_mimetype(file_path: str, file_ext: str = "") -> str:
+    """
+    Same as detect_file_mimetype, the mimetype being detected again only if the file changed
+    """
+    try:
+        return mimetype_cache.get(file_path, file_ext)
+    except OSError:
+        # INFO - the extension may be enough to find the mimetype of a missing file
+        return detect_file_mimetype(file_path, file_ext)
@@ -1,99 +1,134 @@
 # -*- coding: utf-8 -*-
 
-from datetime import datetime
+import html
 from io import BytesIO
+from io import StringIO
 import json
 import logging
+import os
 import typing
 import zipfile
 
+from preview_generator.archive_index import ArchiveInfo
+from preview_generator.archive_index import FileInfo
+from preview_generator.archive_index import archive_info_cache
+from preview_generator.archive_index import get_archive_tree
+from preview_generator.archive_index import py7zr_installed
+from preview_generator.archive_index import read_archive_info
+from preview_generator.archive_index import zipfile_to_infos
 from preview_generator.preview.generic_preview import OnePagePreviewBuilder
 from preview_generator.utils import LOGGER_NAME
 from preview_generator.utils import PreviewGeneratorJsonEncoder
-
-
-class FileInfo(object):
-    FILE = "file"
-    DIR = "dir"
-    UNDEFINED = "undefined"
-
-    def __init__(self) -> None:
-        self.last_modification = None  # type: typing.Optional[datetime]
-        self.name = ""
-        self.type = FileInfo.UNDEFINED
-        self.size = 0
-        self.size__compressed = 0
-
-    def to_dict(self) -> dict:
-        return {
-            "lastModification": self.last_modification,
-            "name": self.name,
-            "size": self.size,
-            "sizeCompressed": self.size__compressed,
-        }
-
-
-class ArchiveInfo(object):
-    def __init__(self) -> None:
-        self.files = []  # type: typing.List[FileInfo]
-        self.size = 0
-        self.size__compressed = 0
-        self.last_modification = None  # type: typing.Optional[datetime]
-
-    @property
-    def compression_rate(self) -> float:
-        return self.size / self.size__compressed
-
-    @property
-    def file_nb(self) -> int:
-        return len(self.files)
-
-    def to_dict(self) -> dict:
-        return {
-            "fileNb": self.file_nb,
-            "files": [file.to_dict() for file in self.files],
-            "size": self.size,
-            "sizeCompressed": self.size__compressed,
-            "lastModification": self.last_modification,
-            "compressionRate": self.compression_rate,
-        }
+from preview_generator.utils import atomic_output_path
+
+ARCHIVE_JSON_LAYOUT_FLAT = "flat"
+ARCHIVE_JSON_LAYOUT_TREE = "tree"
+# INFO - layout of json previews of archives, see write_archive_info_json
+ARCHIVE_JSON_LAYOUT = os.getenv("PREVIEW_GENERATOR_ARCHIVE_JSON_LAYOUT", ARCHIVE_JSON_LAYOUT_FLAT)
+
+
+def _to_json(value: typing.Any) -> str:
+    return json.dumps(value, cls=PreviewGeneratorJsonEncoder)
+
+
+def archive_info_properties(
+    archive_info: ArchiveInfo,
+) -> typing.List[typing.Tuple[str, typing.Any]]:
+    """
+    :return: (property, value) of the archive shown in previews, except its entries
+    """
+    return [
+        ("fileNb", archive_info.file_nb),
+        ("size", archive_info.size),
+        ("sizeCompressed", archive_info.size__compressed),
+        ("lastModification", archive_info.last_modification),
+        ("compressionRate", archive_info.compression_rate),
+        ("truncated", archive_info.truncated),
+    ]
+
+
+def write_archive_info_text(archive_info: ArchiveInfo, output: typing.TextIO) -> None:
+    for property, value in archive_info_properties(archive_info):
+        output.write("{}: {}\n".format(property, value))
+    output.write("files:\n")
+    for file in archive_info.files:
+        output.write("- {}: {} ({})\n".format(file.name, file.size__compressed, file.size))
+    if archive_info.truncated:
+        unlisted_file_nb = archive_info.file_nb - len(archive_info.files)
+        output.write("- … {} more files not listed\n".format(unlisted_file_nb))
+
+
+def write_archive_info_html(archive_info: ArchiveInfo, output: typing.TextIO) -> None:
+    output.write("<ul>")
+    for property, value in archive_info_properties(archive_info):
+        output.write("<li>{}: {}</li>\n".format(property, html.escape(str(value))))
+    output.write("<li>Files:<ul>")
+    for file in archive_info.files:
+        output.write(
+            "<li><b>{name}</b>:<ul><li>Size: {size_compressed}</li>"
+            "<li>Original size: {size}</li></ul>\n".format(
+                name=html.escape(file.name), size_compressed=file.size__compressed, size=file.size
+            )
+        )
+    if archive_info.truncated:
+        unlisted_file_nb = archive_info.file_nb - len(archive_info.files)
+        output.write("<li>… {} more files not listed</li>\n".format(unlisted_file_nb))
+    output.write("</ul></ul>")
+
+
+def write_archive_info_json(
+    archive_info: ArchiveInfo, output: typing.TextIO, layout: str = ARCHIVE_JSON_LAYOUT_FLAT
+) -> None:
+    """
+    Write the json preview entry by entry, without building the whole document in memory
+    :param layout: ARCHIVE_JSON_LAYOUT_FLAT: entries are listed in "files".
+    ARCHIVE_JSON_LAYOUT_TREE: entries are grouped by directory in "tree", see get_archive_tree
+    """
+    output.write('{{"fileNb": {}, '.format(archive_info.file_nb))
+    if layout == ARCHIVE_JSON_LAYOUT_TREE:
+        output.write('"tree": ')
+        _write_json_tree_node(get_archive_tree(archive_info), output)
+    else:
+        output.write('"files": [')
+        for index, file in enumerate(archive_info.files):
+            if index:
+                output.write(", ")
+            output.write(_to_json(file.to_dict()))
+        output.write("]")
+    for property, value in archive_info_properties(archive_info):
+        if property != "fileNb":
+            output.write(", {}: {}".format(_to_json(property), _to_json(value)))
+    output.write("}")
+
+
+def _write_json_tree_node(node: typing.Union[dict, FileInfo], output: typing.TextIO) -> None:
+    if isinstance(node, FileInfo):
+        file_dict = node.to_dict()
+        file_dict["type"] = FileInfo.FILE
+        output.write(_to_json(file_dict))
+        return
+    output.write(
+        '{{"name": {}, "type": {}, "children": ['.format(
+            _to_json(node["name"]), _to_json(node["type"])
+        )
+    )
+    for index, child in enumerate(node["children"].values()):
+        if index:
+            output.write(", ")
+        _write_json_tree_node(child, output)
+    output.write("]}")
 
 
 def archive_info_to_text(archive_info: ArchiveInfo) -> str:
-    text = ""
-    text__files = ""
-    for property, value in archive_info.to_dict().items():
-        if property == "files":
-            for file in value:
-                text__files += "- {}: {} ({})\n".format(
-                    file["name"], file["sizeCompressed"], file["size"]
-                )
-        else:
-            text += "{}: {}\n".format(property, value)
-
-    text += "files:\n"
-    text += text__files
-    return text
+    output = StringIO()
+    write_archive_info_text(archive_info, output)
+    return output.getvalue()
 
 
 def archive_info_to_html(archive_info: ArchiveInfo) -> str:
-    html = ""
-    html__files = ""
-    for property, value in archive_info.to_dict().items():
-        if property == "files":
-            for file in value:
-                html__files += "<li><b>{name}</b>:<ul><li>Size: {sizeCompressed}</li><li>Original size: {size}</li></ul>\n".format(
-                    name=file["name"], sizeCompressed=file["sizeCompressed"], size=file["size"]
-                )
-        else:
-            html += "<li>{}: {}</li>\n".format(property, value)
-
-    html += "files:\n"
-    html += html__files
-    final_html = "<ul>{properties}<li>Files:<ul>{files}</ul></ul>".format(
-        properties=html, files=html__files
-    )
-    return final_html
+    output = StringIO()
+    write_archive_info_html(archive_info, output)
+    return output.getvalue()
 
 
 class ZipPreviewBuilder(OnePagePreviewBuilder):
@@ -105,16 +140,23 @@ class ZipPreviewBuilder(OnePagePreviewBuilder):
 
     @classmethod
     def get_supported_mimetypes(cls) -> typing.List[str]:
-        return [
+        mimetypes = [
             "application/x-compressed",
             "application/x-zip-compressed",
             "application/zip",
             "multipart/x-zip",
             "application/x-tar",
             "application/x-gzip",
+            "application/gzip",
             "application/x-gtar",
             "application/x-tgz",
+            "application/x-compressed-tar",
+            "application/x-bzip-compressed-tar",
+            "application/x-xz-compressed-tar",
         ]
+        if py7zr_installed:
+            mimetypes.append("application/x-7z-compressed")
+        return mimetypes
 
     def build_text_preview(
         self,
@@ -127,15 +169,20 @@ class ZipPreviewBuilder(OnePagePreviewBuilder):
         """
         generate the text preview
         """
-        with open(file_path, "rb") as filestream:
-            self.logger.info("Converting zip to text")
-            zip = zipfile.ZipFile(filestream)
-            info = self.zipfile_to_infos(zip)
-            text_content = archive_info_to_text(info)
+        info = archive_info_cache.get(file_path)
+        self._write_text_preview(info, cache_path + preview_name + extension)
 
-        cache_file_path = cache_path + preview_name + extension
-        with open(cache_file_path, "w") as file_handle:
-            file_handle.write(text_content)
+    def build_text_preview_from_content(
+        self, file_content: bytes, preview_name: str, cache_path: str, extension: str = ".txt"
+    ) -> None:
+        info = read_archive_info(BytesIO(file_content), preview_name)
+        self._write_text_preview(info, cache_path + preview_name + extension)
+
+    def _write_text_preview(self, info: ArchiveInfo, cache_file_path: str) -> None:
+        self.logger.info("Converting archive to text")
+        with atomic_output_path(cache_file_path) as output_path:
+            with open(output_path, "w") as file_handle:
+                write_archive_info_text(info, file_handle)
 
     def build_html_preview(
         self, file_path: str, preview_name: str, cache_path: str, extension: str = ".html"
@@ -143,15 +190,20 @@ class ZipPreviewBuilder(OnePagePreviewBuilder):
         """
         generate the text preview
         """
-        with open(file_path, "rb") as filestream:
-            self.logger.info("Converting zip to html")
-            zip = zipfile.ZipFile(filestream)
-            info = self.zipfile_to_infos(zip)
-            text_content = archive_info_to_html(info)
+        info = archive_info_cache.get(file_path)
+        self._write_html_preview(info, cache_path + preview_name + extension)
+
+    def build_html_preview_from_content(
+        self, file_content: bytes, preview_name: str, cache_path: str, extension: str = ".html"
+    ) -> None:
+        info = read_archive_info(BytesIO(file_content), preview_name)
+        self._write_html_preview(info, cache_path + preview_name + extension)
 
-        cache_file_path = cache_path + preview_name + extension
-        with open(cache_file_path, "w") as file_handle:
-            file_handle.write(text_content)
+    def _write_html_preview(self, info: ArchiveInfo, cache_file_path: str) -> None:
+        self.logger.info("Converting archive to html")
+        with atomic_output_path(cache_file_path) as output_path:
+            with open(output_path, "w") as file_handle:
+                write_archive_info_html(info, file_handle)
 
     def build_json_preview(
         self,
@@ -164,49 +216,23 @@ class ZipPreviewBuilder(OnePagePreviewBuilder):
         """
         generate the json preview
         """
-        json_string = ""
-        with open(file_path, "rb") as filestream:
-            self.logger.info("Converting zip to json")
-            zip = zipfile.ZipFile(filestream)
-            info = self.zipfile_to_infos(zip)
+        info = archive_info_cache.get(file_path)
+        self._write_json_preview(info, cache_path + preview_name + extension)
 
-            json_string = json.dumps(info.to_dict(), cls=PreviewGeneratorJsonEncoder)
+    def build_json_preview_from_content(
+        self, file_content: bytes, preview_name: str, cache_path: str, extension: str = ".json"
+    ) -> None:
+        info = read_archive_info(BytesIO(file_content), preview_name)
+        self._write_json_preview(info, cache_path + preview_name + extension)
 
-        cache_file_path = cache_path + preview_name + extension
-        with open(cache_file_path, "w") as json_file_handle:
-            json_file_handle.write(json_string)
+    def _write_json_preview(self, info: ArchiveInfo, cache_file_path: str) -> None:
+        self.logger.info("Converting archive to json")
+        with atomic_output_path(cache_file_path) as output_path:
+            with open(output_path, "w") as json_file_handle:
+                write_archive_info_json(info, json_file_handle, ARCHIVE_JSON_LAYOUT)
 
     def zipfile_to_infos(self, zipfile: zipfile.ZipFile) -> ArchiveInfo:
-        archive_info = ArchiveInfo()
-        for ziplineinfo in zipfile.infolist():
-            fileinfo = FileInfo()
-            fileinfo.last_modification = datetime(
-                year=ziplineinfo.date_time[0],
-                month=ziplineinfo.date_time[1],
-                day=ziplineinfo.date_time[2],
-                hour=ziplineinfo.date_time[3],
-                minute=ziplineinfo.date_time[4],
-                second=ziplineinfo.date_time[5],
-            )
-
-            fileinfo.name = ziplineinfo.filename
-            fileinfo.size = ziplineinfo.file_size
-            fileinfo.size__compressed = ziplineinfo.compress_size
-            # if info.is_dir():
-            #     fileinfo.type = FileInfo.DIR
-            # else:
-            #     fileinfo.type = FileInfo.FILE
-            archive_info.files.append(fileinfo)
-
-            archive_info.size += fileinfo.size
-            archive_info.size__compressed += fileinfo.size__compressed
-            if (
-                not archive_info.last_modification
-                or archive_info.last_modification < fileinfo.last_modification
-            ):
-                archive_info.last_modification = fileinfo.last_modification
-
-        return archive_info
+        return zipfile_to_infos(zipfile)
 
     def has_html_preview(self) -> bool:
         return True
@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
+import contextlib
+import math
 import os
-import tempfile
+import threading
 import typing
 
+from wand.image import Image
+
 from preview_generator.exception import BuilderDependencyNotFound
 from preview_generator.exception import UnsupportedMimeType
 from preview_generator.extension import mimetypes_storage
@@ -17,11 +21,12 @@ try:
     from vtk import vtkAbstractPolyDataReader
     from vtk import vtkActor
     from vtk import vtkGLTFReader
+    from vtk import vtkMaskPoints
     from vtk import vtkNamedColors
     from vtk import vtkOBJReader
     from vtk import vtkPLYReader
-    from vtk import vtkPNGWriter
     from vtk import vtkPolyDataMapper
+    from vtk import vtkQuadricClustering
     from vtk import vtkRenderWindow
     from vtk import vtkRenderer
     from vtk import vtkSTLReader
@@ -31,9 +36,10 @@ except ImportError:
     vtk_version_installed = 8
     try:
         from vtk import vtkActor
+        from vtk import vtkMaskPoints
         from vtk import vtkNamedColors
-        from vtk import vtkPNGWriter
         from vtk import vtkPolyDataMapper
+        from vtk import vtkQuadricClustering
         from vtk import vtkRenderWindow
         from vtk import vtkRenderer
         from vtk import vtkSTLReader
@@ -51,6 +57,24 @@ except ImportError:
 GLTF_EXPERIMENTAL_SUPPORT_ENABLED = (
     os.environ.get("GLTF_EXPERIMENTAL_SUPPORT_ENABLED") == "1" and vtk_version_installed == 9
 )
+# INFO - rotations (around x, y and z axes, in degrees) of the mesh in each page of the
+# preview. Only the first PREVIEW_GENERATOR_VTK_VIEW_NB ones are used as pages.
+VTK_VIEW_ROTATIONS = [
+    (-70, 0, 45),  # three-quarter view
+    (-90, 0, 0),  # front view
+    (-90, 0, 90),  # side view
+    (0, 0, 0),  # top view
+    (-70, 0, 225),  # opposite three-quarter view
+]
+VTK_VIEW_NB = max(
+    1, min(int(os.getenv("PREVIEW_GENERATOR_VTK_VIEW_NB", "1")), len(VTK_VIEW_ROTATIONS))
+)
+# INFO - meshes with more triangles (or points, for point clouds) than this by pixel of the
+# preview are simplified before being rendered, 0 disables the simplification
+VTK_MAX_CELLS_BY_PIXEL = float(os.getenv("PREVIEW_GENERATOR_VTK_MAX_CELLS_BY_PIXEL", "2"))
+# INFO - points of STL files larger than this are not merged while reading: merging needs
+# a point locator as large as the mesh
+VTK_LARGE_FILE_SIZE = 64 * 1024 * 1024
 
 
 class ImagePreviewBuilderVtk(PreviewBuilder):
@@ -129,68 +153,55 @@ class ImagePreviewBuilderVtk(PreviewBuilder):
         size: ImgDims = None,
         mimetype: str = "",
     ) -> None:
+        self.build_jpeg_previews(
+            file_path=file_path,
+            preview_names={page_id: preview_name},
+            cache_path=cache_path,
+            extension=extension,
+            size=size,
+            mimetype=mimetype,
+        )
+
+    def build_jpeg_previews(
+        self,
+        file_path: str,
+        preview_names: typing.Dict[int, str],
+        cache_path: str,
+        extension: str = ".jpg",
+        size: ImgDims = None,
+        mimetype: str = "",
+    ) -> None:
+        """
+        Read the mesh once and render each requested view (page) of it
+        """
         if not size:
             size = self.default_size
-
-        colors = vtkNamedColors()
-
         if not mimetype:
             guessed_mimetype, _ = mimetypes_storage.guess_type(file_path, strict=False)
             # INFO - G.M - 2019-11-22 - guessed_mimetype can be None
             mimetype = guessed_mimetype or ""
         reader = self._get_vtk_reader(mimetype)
         reader.SetFileName(file_path)
+        if isinstance(reader, vtkSTLReader) and os.path.getsize(file_path) > VTK_LARGE_FILE_SIZE:
+            reader.MergingOff()
         reader.Update()
 
-        mapper = vtkPolyDataMapper()
-
         # set parent node as output for GLTF
         if mimetype == "model/gltf":
             mesh = reader.GetOutput()
-            mesh_parent = mesh.GetDataSet(mesh.NewIterator())
-            mapper.SetInputData(mesh_parent)
+            polydata = mesh.GetDataSet(mesh.NewIterator())
         else:
-            mapper.SetInputConnection(reader.GetOutputPort())
-
-        actor = vtkActor()
-        actor.SetMapper(mapper)
-
-        rotation = (-70, 0, 45)
-        R_x, R_y, R_z = rotation  # TODO set a good looking default orientation
-        actor.RotateX(R_x)
-        actor.RotateY(R_y)
-        actor.RotateZ(R_z)
-
-        # Create a rendering window and renderer
-        ren = vtkRenderer()
-        renWin = vtkRenderWindow()
-        renWin.OffScreenRenderingOn()
-        renWin.AddRenderer(ren)
-        renWin.SetSize(size.width, size.height)
-        ren.SetBackground(colors.GetColor3d("white"))
-
-        # Assign actor to the renderer
-        ren.AddActor(actor)
-
-        renWin.Render()
-
-        # Write image
-        windowto_image_filter = vtkWindowToImageFilter()
-        windowto_image_filter.SetInput(renWin)
-        # windowto_image_filter.SetScale(scale)  # image scale
-        windowto_image_filter.SetInputBufferTypeToRGBA()
-
-        with tempfile.NamedTemporaryFile(
-            "w+b", prefix="preview-generator-", suffix=".png"
-        ) as tmp_png:
-            writer = vtkPNGWriter()
-            writer.SetFileName(tmp_png.name)
-            writer.SetInputConnection(windowto_image_filter.GetOutputPort())
-            writer.Write()
-
-            return ImagePreviewBuilderWand().build_jpeg_preview(
-                tmp_png.name, preview_name, cache_path, page_id, extension, size, mimetype
-            )
+            polydata = reader.GetOutput()
+        polydata = simplify_mesh(polydata, size)
+
+        wand_builder = ImagePreviewBuilderWand.get_instance()
+        render_context = get_render_context()
+        with render_context.mesh(polydata):
+            for page_id, preview_name in preview_names.items():
+                with render_context.render(get_view_rotation(page_id), size) as img:
+                    wand_builder.wand_image_to_jpeg_sizes(
+                        img, [(size, os.path.join(cache_path, preview_name + extension))]
+                    )
 
     def has_jpeg_preview(self) -> bool:
         return True
@@ -198,4 +209,122 @@ class ImagePreviewBuilderVtk(PreviewBuilder):
     def get_page_number(
         self, file_path: str, preview_name: str, cache_path: str, mimetype: str = ""
     ) -> int:
-        return 1
+        return VTK_VIEW_NB
+
+
+def simplify_mesh(polydata: typing.Any, size: ImgDims) -> typing.Any:
+    """
+    Reduce the number of triangles (or points, for point clouds) of the mesh to what is visible
+    in a preview of the given size, see VTK_MAX_CELLS_BY_PIXEL
+    :return: the simplified mesh, or polydata if it is small enough
+    """
+    if VTK_MAX_CELLS_BY_PIXEL <= 0:
+        return polydata
+    max_cell_nb = max(1, int(size.width * size.height * VTK_MAX_CELLS_BY_PIXEL))
+    if polydata.GetNumberOfPolys() + polydata.GetNumberOfStrips():
+        if polydata.GetNumberOfCells() <= max_cell_nb:
+            return polydata
+        # INFO - vertex clustering on a grid of at most max_cell_nb cells, so that the
+        # simplified mesh has at most max_cell_nb points: unlike vtkQuadricDecimation, it runs
+        # in linear time with little memory and does not need merged points
+        division_nb = max(2, int(max_cell_nb ** (1 / 3)))
+        decimation = vtkQuadricClustering()
+        decimation.SetNumberOfDivisions(division_nb, division_nb, division_nb)
+        decimation.AutoAdjustNumberOfDivisionsOff()
+        decimation.SetInputData(polydata)
+        decimation.Update()
+        return decimation.GetOutput()
+    if polydata.GetNumberOfPoints() <= max_cell_nb:
+        return polydata
+    subsampling = vtkMaskPoints()
+    subsampling.SetInputData(polydata)
+    subsampling.SetOnRatio(math.ceil(polydata.GetNumberOfPoints() / max_cell_nb))
+    subsampling.SetMaximumNumberOfPoints(max_cell_nb)
+    subsampling.GenerateVerticesOn()
+    subsampling.SingleVertexPerCellOn()
+    subsampling.Update()
+    return subsampling.GetOutput()
+
+
+def get_view_rotation(page_id: int) -> typing.Tuple[int, int, int]:
+    """
+    :return: rotation of the mesh (around x, y and z axes, in degrees) shown in the given page
+    """
+    if 0 <= page_id < VTK_VIEW_NB:
+        return VTK_VIEW_ROTATIONS[page_id]
+    return VTK_VIEW_ROTATIONS[0]
+
+
+class VtkRenderContext(object):
+    """
+    Offscreen render window, renderer and actor reused to render all meshes of a thread:
+    creating an OpenGL context for each preview is much slower than rendering small meshes.
+    OpenGL contexts are bound to a thread, use get_render_context() to get the context
+    of the current thread.
+    """
+
+    def __init__(self) -> None:
+        self.mapper = vtkPolyDataMapper()
+        self.actor = vtkActor()
+        self.actor.SetMapper(self.mapper)
+        self.renderer = vtkRenderer()
+        self.renderer.SetBackground(vtkNamedColors().GetColor3d("white"))
+        self.renderer.AddActor(self.actor)
+        self.render_window = vtkRenderWindow()
+        self.render_window.OffScreenRenderingOn()
+        self.render_window.AddRenderer(self.renderer)
+        self.window_to_image_filter = vtkWindowToImageFilter()
+        self.window_to_image_filter.SetInput(self.render_window)
+        self.window_to_image_filter.SetInputBufferTypeToRGB()
+        self.window_to_image_filter.ReadFrontBufferOff()
+
+    @contextlib.contextmanager
+    def mesh(self, polydata: typing.Any) -> typing.Iterator[None]:
+        """
+        Show the given mesh in the render window while in the context
+        """
+        self.mapper.SetInputData(polydata)
+        try:
+            yield
+        finally:
+            # INFO - do not keep the mesh in memory until the next preview
+            self.mapper.SetInputData(None)
+
+    @contextlib.contextmanager
+    def render(
+        self, rotation: typing.Tuple[int, int, int], size: ImgDims
+    ) -> typing.Iterator[Image]:
+        """
+        Render the current mesh with the given rotation
+        :return: the rendered frame, as a wand image
+        """
+        self.actor.SetOrientation(0, 0, 0)
+        rotation_x, rotation_y, rotation_z = rotation
+        self.actor.RotateX(rotation_x)
+        self.actor.RotateY(rotation_y)
+        self.actor.RotateZ(rotation_z)
+        self.renderer.ResetCamera()
+        self.render_window.SetSize(size.width, size.height)
+        self.render_window.Render()
+
+        self.window_to_image_filter.Modified()
+        self.window_to_image_filter.Update()
+        frame = self.window_to_image_filter.GetOutput()
+        width, height, _ = frame.GetDimensions()
+        # INFO - raw pixels are given to wand, without encoding the frame to a png file
+        pixels = bytes(memoryview(frame.GetPointData().GetScalars()))
+        with Image(blob=pixels, format="rgb", width=width, height=height, depth=8) as img:
+            # INFO - the first row of vtk images is the bottom one
+            img.flip()
+            yield img
+
+
+_render_contexts = threading.local()
+
+
+def get_render_context() -> VtkRenderContext:
+    render_context = getattr(_render_contexts, "render_context", None)
+    if render_context is None:
+        render_context = VtkRenderContext()
+        _render_contexts.render_context = render_context
+    return render_context
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 from subprocess import DEVNULL
 from subprocess import STDOUT
-from subprocess import check_call
 import tempfile
 import typing
 
@@ -9,6 +8,7 @@ from preview_generator.exception import BuilderDependencyNotFound
 from preview_generator.exception import IntermediateFileBuildingFailed
 from preview_generator.preview.builder.image__wand import ImagePreviewBuilderWand
 from preview_generator.preview.generic_preview import PreviewBuilder
+from preview_generator.process import check_call
 from preview_generator.utils import ImgDims
 from preview_generator.utils import MimetypeMapping
 from preview_generator.utils import executable_is_available
@@ -90,7 +90,7 @@ class ImagePreviewBuilderDrawio(PreviewBuilder):
                     "failed with status {}".format(build_jpg_result_code)
                 )
 
-            ImagePreviewBuilderWand().build_jpeg_preview(
+            ImagePreviewBuilderWand.get_instance().build_jpeg_preview(
                 tmp_jpg.name, preview_name, cache_path, page_id, extension, size, mimetype
             )
 
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import os
+import typing
+
+from preview_generator.embedded_thumbnail import get_embedded_thumbnail
+from preview_generator.exception import UnavailablePreviewType
+from preview_generator.preview.builder.image__wand import ImagePreviewBuilderWand  # nopep8
+from preview_generator.preview.generic_preview import PreviewBuilder
+from preview_generator.utils import ImgDims
+from preview_generator.utils import MimetypeMapping
+
+
+class ImagePreviewBuilderEpub(PreviewBuilder):
+    """
+    Preview of EPUB books from their cover image
+    """
+
+    EPUB_MIMETYPES_MAPPING = [MimetypeMapping("application/epub+zip", ".epub")]
+    weight = 130
+
+    @classmethod
+    def get_label(cls) -> str:
+        return "Images generator from epub covers"
+
+    @classmethod
+    def get_supported_mimetypes(cls) -> typing.List[str]:
+        return [mimetype_mapping.mimetype for mimetype_mapping in cls.get_mimetypes_mapping()]
+
+    @classmethod
+    def get_mimetypes_mapping(cls) -> typing.List[MimetypeMapping]:
+        return cls.EPUB_MIMETYPES_MAPPING
+
+    def build_jpeg_preview(
+        self,
+        file_path: str,
+        preview_name: str,
+        cache_path: str,
+        page_id: int,
+        extension: str = ".jpg",
+        size: ImgDims = None,
+        mimetype: str = "",
+    ) -> None:
+        if not size:
+            size = self.default_size
+        self.build_jpeg_preview_sizes(
+            file_path, [(size, preview_name)], cache_path, page_id, extension, mimetype
+        )
+
+    def build_jpeg_preview_sizes(
+        self,
+        file_path: str,
+        preview_names: typing.List[typing.Tuple[ImgDims, str]],
+        cache_path: str,
+        page_id: int,
+        extension: str = ".jpg",
+        mimetype: str = "",
+    ) -> None:
+        cover = get_embedded_thumbnail(file_path)
+        if not cover:
+            raise UnavailablePreviewType("No cover image found in {}".format(file_path))
+        ImagePreviewBuilderWand.get_instance().blob_to_jpeg_wand_sizes(
+            cover,
+            [
+                (size, os.path.join(cache_path, preview_name + extension))
+                for size, preview_name in preview_names
+            ],
+        )
+
+    def has_jpeg_preview(self) -> bool:
+        return True
+
+    def get_page_number(
+        self, file_path: str, preview_name: str, cache_path: str, mimetype: str = ""
+    ) -> int:
+        return 1
@@ -6,15 +6,14 @@ import os
 from shutil import which
 from subprocess import DEVNULL
 from subprocess import STDOUT
-from subprocess import check_call
 from subprocess import check_output
 import typing
 
 from preview_generator.exception import BuilderDependencyNotFound
 from preview_generator.extension import mimetypes_storage
 from preview_generator.preview.builder.document_generic import DocumentPreviewBuilder
-from preview_generator.preview.builder.document_generic import create_flag_file
 from preview_generator.preview.builder.document_generic import write_file_content
+from preview_generator.process import check_call
 from preview_generator.utils import LOGGER_NAME
 from preview_generator.utils import executable_is_available
 
@@ -86,47 +85,37 @@ def convert_sla_to_pdf(
     temporary_input_content_path = output_filepath
     if input_extension:
         temporary_input_content_path += input_extension
-    with create_flag_file(output_filepath):
+    logger.debug(
+        "conversion is based on temporary file {}".format(temporary_input_content_path)
+    )  # nopep8
 
+    if not os.path.exists(output_filepath):
+        write_file_content(file_content, output_filepath=temporary_input_content_path)  # nopep8
+        logger.debug("temporary file written: {}".format(temporary_input_content_path))  # nopep8
         logger.debug(
-            "conversion is based on temporary file {}".format(temporary_input_content_path)
-        )  # nopep8
-
-        if not os.path.exists(output_filepath):
-            write_file_content(file_content, output_filepath=temporary_input_content_path)  # nopep8
-            logger.debug(
-                "temporary file written: {}".format(temporary_input_content_path)
-            )  # nopep8
-            logger.debug(
-                "converting {} to pdf into folder {}".format(
-                    temporary_input_content_path, cache_path
-                )
-            )
-            with Xvfb():
-                check_call(
-                    [
-                        "scribus",
-                        "-g",
-                        "-py",
-                        SCRIPT_PATH,
-                        output_filepath,
-                        "--",
-                        temporary_input_content_path,
-                    ],
-                    stdout=DEVNULL,
-                    stderr=STDOUT,
-                )
-
-        # HACK - D.A. - 2018-05-31 - name is defined by libreoffice
-        # according to input file name, for homogeneity we prefer to rename it
-        logger.debug(
-            "renaming output file {} to {}".format(output_filepath + ".pdf", output_filepath)
+            "converting {} to pdf into folder {}".format(temporary_input_content_path, cache_path)
         )
+        with Xvfb():
+            check_call(
+                [
+                    "scribus",
+                    "-g",
+                    "-py",
+                    SCRIPT_PATH,
+                    output_filepath,
+                    "--",
+                    temporary_input_content_path,
+                ],
+                stdout=DEVNULL,
+                stderr=STDOUT,
+            )
+
+    # HACK - D.A. - 2018-05-31 - name is defined by libreoffice
+    # according to input file name, for homogeneity we prefer to rename it
+    logger.debug("renaming output file {} to {}".format(output_filepath + ".pdf", output_filepath))
 
-        logger.info(
-            "Removing temporary copy file {}".format(temporary_input_content_path)
-        )  # nopep8
-        os.remove(temporary_input_content_path)
+    logger.info("Removing temporary copy file {}".format(temporary_input_content_path))  # nopep8
+    os.remove(temporary_input_content_path)
 
     with open(output_filepath, "rb") as pdf_handle:
         pdf_handle.seek(0, 0)
@@ -46,7 +46,7 @@ class ImagePreviewBuilderSketch(PreviewBuilder):
                 zip.extract("previews/preview.png", tmp_dir)
                 zip.close()
 
-                ImagePreviewBuilderWand().build_jpeg_preview(
+                ImagePreviewBuilderWand.get_instance().build_jpeg_preview(
                     tmp_dir + "/previews/preview.png",
                     preview_name,
                     cache_path,
@@ -4,14 +4,37 @@ from abc import ABC
 import contextlib
 from io import BytesIO
 import os
-from pathlib import Path
-import time
+import shutil
 import typing
 
+from filelock import FileLock
+from filelock import Timeout
+
 from preview_generator import utils
+from preview_generator.embedded_thumbnail import EMBEDDED_THUMBNAIL_ENABLED
+from preview_generator.embedded_thumbnail import get_embedded_thumbnail
 from preview_generator.exception import PreviewAbortedMaxAttempsExceeded
-from preview_generator.preview.builder.pdf__poppler_utils import PdfPreviewBuilderPopplerUtils
+from preview_generator.file_content import COPY_BUFFER_SIZE
 from preview_generator.preview.generic_preview import PreviewBuilder
+from preview_generator.utils import LOCKFILE_EXTENSION
+
+# INFO - max time to wait for a conversion of the same document running in another thread or
+# process (libreoffice conversions themselves are bounded by LIBREOFFICE_PROCESS_TIMEOUT)
+INTERMEDIATE_PDF_LOCK_TIMEOUT = 300
+# INFO - number of first pages of documents converted to serve their first jpeg previews
+# without converting the whole document, see DocumentPreviewBuilder.build_partial_pdf_preview.
+# 0 (default) disables partial conversions: the whole document is converted again as soon as
+# its number of pages or a later page is requested, so they only pay off for applications
+# which only show the first pages of documents.
+PARTIAL_PDF_PAGE_NB = int(os.getenv("PREVIEW_GENERATOR_PARTIAL_PDF_PAGE_NB", "0"))
+
+
+def get_partial_pdf_name(preview_hash: str, page_nb: int) -> str:
+    """
+    >>> get_partial_pdf_name("720f89890597ec1eb45e7b775898e806", 3)
+    '720f89890597ec1eb45e7b775898e806-first3pages'
+    """
+    return "{}-first{}pages".format(preview_hash, page_nb)
 
 
 class DocumentPreviewBuilder(PreviewBuilder, ABC):
@@ -34,15 +57,29 @@ class DocumentPreviewBuilder(PreviewBuilder, ABC):
 
         raise NotImplementedError
 
+    def _convert_to_partial_pdf(
+        self,
+        file_content: typing.IO[bytes],
+        input_extension: str,
+        cache_path: str,
+        output_filepath: str,
+        mimetype: str,
+        page_nb: int,
+    ) -> None:
+        """
+        abstract function to transform the first page_nb pages of a file to pdf,
+        see has_partial_pdf_preview
+        """
+        raise NotImplementedError
+
     @classmethod
     def check_dependencies(cls) -> None:
-        PdfPreviewBuilderPopplerUtils().check_dependencies()
+        # INFO - imported on use, so that importing this module does not load wand
+        from preview_generator.preview.builder.pdf__poppler_utils import (
+            PdfPreviewBuilderPopplerUtils,
+        )
 
-    def _cache_file_process_already_running(self, file_name: str) -> bool:
-        if os.path.exists(file_name + "_flag"):
-            return True
-        else:
-            return False
+        PdfPreviewBuilderPopplerUtils.check_dependencies()
 
     def build_jpeg_preview(
         self,
@@ -59,6 +96,71 @@ class DocumentPreviewBuilder(PreviewBuilder, ABC):
             "Convert to pdf first and use intermediate file to" "generate the jpeg preview."
         )
 
+    def build_first_page_jpeg_preview_sizes(
+        self,
+        file_path: str,
+        preview_names: typing.List[typing.Tuple[utils.ImgDims, str]],
+        cache_path: str,
+        extension: str = ".jpg",
+        mimetype: str = "",
+    ) -> bool:
+        """
+        generate jpeg previews of the first page without converting the document to pdf, when
+        possible. Default is to use the thumbnail embedded in the document, see
+        build_jpeg_preview_sizes_from_thumbnail.
+        :param preview_names: (size, preview name) of each requested preview
+        :return: False if nothing was built, previews are then built from the pdf
+        """
+        return self.build_jpeg_preview_sizes_from_thumbnail(
+            file_path, preview_names, cache_path, extension
+        )
+
+    def build_jpeg_preview_sizes_from_thumbnail(
+        self,
+        file_path: str,
+        preview_names: typing.List[typing.Tuple[utils.ImgDims, str]],
+        cache_path: str,
+        extension: str = ".jpg",
+    ) -> bool:
+        """
+        generate jpeg previews of the first page from the thumbnail embedded in the document
+        (see embedded_thumbnail), without converting the document to pdf.
+        :param preview_names: (size, preview name) of each requested preview
+        :return: False if nothing was built: the document has no thumbnail, or the thumbnail
+        is smaller than a requested preview
+        """
+        if not EMBEDDED_THUMBNAIL_ENABLED:
+            return False
+        thumbnail = get_embedded_thumbnail(file_path)
+        if not thumbnail:
+            return False
+
+        # INFO - imported on use, so that importing this module does not load wand
+        from wand.exceptions import WandException
+
+        from preview_generator.preview.builder.image__wand import ImagePreviewBuilderWand
+
+        wand_builder = ImagePreviewBuilderWand.get_instance()
+        try:
+            img = wand_builder.read_image(blob=thumbnail)
+        except WandException:
+            self.logger.warning("Embedded thumbnail of {} can't be decoded".format(file_path))
+            return False
+        with img:
+            thumbnail_dims = utils.ImgDims(width=img.width, height=img.height)
+            for size, _ in preview_names:
+                resize_dims = utils.compute_resize_dims(dims_in=thumbnail_dims, dims_out=size)
+                if resize_dims.width > img.width or resize_dims.height > img.height:
+                    return False
+            wand_builder.wand_image_to_jpeg_sizes(
+                img,
+                [
+                    (size, os.path.join(cache_path, preview_name + extension))
+                    for size, preview_name in preview_names
+                ],
+            )
+        return True
+
     def build_pdf_preview(
         self,
         file_path: str,
@@ -69,46 +171,21 @@ class DocumentPreviewBuilder(PreviewBuilder, ABC):
         mimetype: str = "",
         attempt: int = 0,
     ) -> None:
+        """
+        :param attempt: unused, kept for compatibility
+        """
         intermediate_pdf_filename = preview_name.split("-page")[0] + ".pdf"
         intermediate_pdf_file_path = os.path.join(cache_path, intermediate_pdf_filename)
-
-        # TODO - G.M - 2021-10-21 Refactor this part with a lock and consider splitting
-        # full and simple page pdf to make intermediate file preview easier.
-        if not os.path.exists(intermediate_pdf_file_path):
-            if os.path.exists(intermediate_pdf_file_path + "_flag"):
-                # Wait 2 seconds, then retry
-                # Info - B.L - 2018/09/28 - Protection for concurent file access
-                # If two person try to preview the same file one will override the file
-                # while the other is reading it.
-                if attempt >= 5:
-                    raise PreviewAbortedMaxAttempsExceeded("Max attempts exceeded aborting preview")
-                attempt += 1
-                time.sleep(2)
-                return self.build_pdf_preview(
-                    file_path=file_path,
-                    preview_name=preview_name,
-                    cache_path=cache_path,
-                    extension=extension,
-                    page_id=page_id,
-                    mimetype=mimetype,
-                    attempt=attempt,
-                )
-
-            with open(file_path, "rb") as input_stream:
-                input_extension = os.path.splitext(file_path)[1]
-                # first step is to convert full document to full pdf
-                self._convert_to_pdf(
-                    file_content=input_stream,
-                    input_extension=input_extension,
-                    cache_path=cache_path,
-                    output_filepath=intermediate_pdf_file_path,
-                    mimetype=mimetype,
-                )
+        self._build_intermediate_pdf(file_path, intermediate_pdf_file_path, cache_path, mimetype)
 
         if page_id < 0:
             return  # in this case, the intermediate file is the requested one
 
-        PdfPreviewBuilderPopplerUtils().build_pdf_preview(
+        from preview_generator.preview.builder.pdf__poppler_utils import (
+            PdfPreviewBuilderPopplerUtils,
+        )
+
+        PdfPreviewBuilderPopplerUtils.get_instance().build_pdf_preview(
             file_path=intermediate_pdf_file_path,
             preview_name=preview_name,
             cache_path=cache_path,
@@ -116,6 +193,81 @@ class DocumentPreviewBuilder(PreviewBuilder, ABC):
             extension=extension,
         )
 
+    def build_partial_pdf_preview(
+        self,
+        file_path: str,
+        preview_name: str,
+        cache_path: str,
+        page_nb: int,
+        extension: str = ".pdf",
+        mimetype: str = "",
+    ) -> None:
+        """
+        generate a pdf of the first page_nb pages of the document only. It is enough to build
+        jpeg previews of these pages and is much faster to build than the whole pdf for
+        large documents (spreadsheets, presentations, …).
+        """
+        self._build_intermediate_pdf(
+            file_path,
+            os.path.join(cache_path, preview_name + extension),
+            cache_path,
+            mimetype,
+            page_nb=page_nb,
+        )
+
+    def _build_intermediate_pdf(
+        self,
+        file_path: str,
+        intermediate_pdf_file_path: str,
+        cache_path: str,
+        mimetype: str,
+        page_nb: int = 0,
+    ) -> None:
+        """
+        :param page_nb: number of first pages to convert, 0 means all pages
+        """
+        if os.path.exists(intermediate_pdf_file_path):
+            return
+        # INFO - single flight: concurrent builds of the same document wait for the
+        # conversion in progress instead of polling a flag file. The lock is released by
+        # the system if the converting process crashes, so no stale state can remain.
+        conversion_lock = FileLock(
+            intermediate_pdf_file_path + LOCKFILE_EXTENSION, timeout=INTERMEDIATE_PDF_LOCK_TIMEOUT
+        )
+        try:
+            with conversion_lock:
+                # INFO - the pdf may have been built while waiting for the lock
+                if os.path.exists(intermediate_pdf_file_path):
+                    return
+                with open(file_path, "rb") as input_stream, utils.atomic_output_path(
+                    intermediate_pdf_file_path
+                ) as output_path:
+                    input_extension = os.path.splitext(file_path)[1]
+                    if page_nb:
+                        self._convert_to_partial_pdf(
+                            file_content=input_stream,
+                            input_extension=input_extension,
+                            cache_path=cache_path,
+                            output_filepath=output_path,
+                            mimetype=mimetype,
+                            page_nb=page_nb,
+                        )
+                    else:
+                        # first step is to convert full document to full pdf
+                        self._convert_to_pdf(
+                            file_content=input_stream,
+                            input_extension=input_extension,
+                            cache_path=cache_path,
+                            output_filepath=output_path,
+                            mimetype=mimetype,
+                        )
+        except Timeout as exc:
+            raise PreviewAbortedMaxAttempsExceeded(
+                "Conversion of {} to pdf still running after {}s, aborting preview".format(
+                    file_path, INTERMEDIATE_PDF_LOCK_TIMEOUT
+                )
+            ) from exc
+
     def get_page_number(
         self, file_path: str, preview_name: str, cache_path: str, mimetype: str = ""
     ) -> int:
@@ -136,26 +288,28 @@ class DocumentPreviewBuilder(PreviewBuilder, ABC):
         """
         return True
 
-
-@contextlib.contextmanager
-def create_flag_file(filepath: str) -> typing.Generator[str, None, None]:
-    """
-    Create a flag file in order to avoid concurrent build of same previews
-    :param filepath: file to protect
-    :return: flag file path
-    """
-    flag_file_path = Path("{}_flag".format(filepath))
-    flag_file_path.touch()
-    try:
-        yield str(flag_file_path)
-    finally:
-        flag_file_path.unlink()
+    def has_partial_pdf_preview(self) -> bool:
+        """
+        Override and return True if your builder implements _convert_to_partial_pdf
+        """
+        return False
 
 
 def write_file_content(file_content: typing.IO[bytes], output_filepath: str) -> None:
+    """
+    Write the content to output_filepath. If the content is a regular file, output_filepath
+    is a symbolic link to it instead of a copy.
+    """
+    # INFO - never write through a link to an original file left by a previous conversion
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(output_filepath)
+    file_name = getattr(file_content, "name", None)
+    if isinstance(file_name, str) and os.path.isfile(file_name):
+        try:
+            os.symlink(os.path.abspath(file_name), output_filepath)
+            return
+        except OSError:
+            pass
     with open(output_filepath, "wb") as temporary_file:
         file_content.seek(0, 0)
-        buffer = file_content.read(1024)
-        while buffer:
-            temporary_file.write(buffer)
-            buffer = file_content.read(1024)
+        shutil.copyfileobj(file_content, temporary_file, COPY_BUFFER_SIZE)
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import tempfile
+import os
 import typing
 
 # HACK - G.M - 2020-12-26 - Hack to allow loading modules without cairosvg installed
@@ -8,6 +8,7 @@ from preview_generator.exception import BuilderDependencyNotFound
 from preview_generator.preview.builder.image__wand import ImagePreviewBuilderWand  # nopep8
 from preview_generator.preview.generic_preview import ImagePreviewBuilder
 from preview_generator.utils import ImgDims
+from preview_generator.utils import atomic_output_path
 
 cairosvg_installed = True
 try:
@@ -50,14 +51,28 @@ class ImagePreviewBuilderCairoSVG(ImagePreviewBuilder):
         if not size:
             size = self.default_size
 
-        with tempfile.NamedTemporaryFile(
-            "w+b", prefix="preview-generator", suffix="png"
-        ) as tmp_png:
-            cairosvg.svg2png(url=file_path, write_to=tmp_png.name, dpi=96)
+        png_content = cairosvg.svg2png(url=file_path, dpi=96)
+        dest_path = os.path.join(cache_path, preview_name + extension)
+        wand_builder = ImagePreviewBuilderWand.get_instance()
+        wand_builder.blob_to_jpeg_wand_sizes(png_content, [(size, dest_path)])
 
-            return ImagePreviewBuilderWand().build_jpeg_preview(
-                tmp_png.name, preview_name, cache_path, page_id, extension, size, mimetype
-            )
+    def build_jpeg_preview_from_content(
+        self,
+        file_content: bytes,
+        preview_name: str,
+        cache_path: str,
+        page_id: int,
+        extension: str = ".jpg",
+        size: ImgDims = None,
+        mimetype: str = "",
+    ) -> None:
+        if not size:
+            size = self.default_size
+
+        png_content = cairosvg.svg2png(bytestring=file_content, dpi=96)
+        dest_path = os.path.join(cache_path, preview_name + extension)
+        wand_builder = ImagePreviewBuilderWand.get_instance()
+        wand_builder.blob_to_jpeg_wand_sizes(png_content, [(size, dest_path)])
 
     def build_pdf_preview(
         self,
@@ -74,7 +89,8 @@ class ImagePreviewBuilderCairoSVG(ImagePreviewBuilder):
         preview_file_path = "{path}{extension}".format(
             path=cache_path + preview_name, extension=extension
         )
-        cairosvg.svg2pdf(url=file_path, write_to=preview_file_path)
+        with atomic_output_path(preview_file_path) as output_path:
+            cairosvg.svg2pdf(url=file_path, write_to=output_path)
 
     def has_pdf_preview(self) -> bool:
         return True
@@ -3,7 +3,6 @@ from shutil import which
 from subprocess import CalledProcessError
 from subprocess import DEVNULL
 from subprocess import STDOUT
-from subprocess import check_call
 from subprocess import check_output
 import tempfile
 import typing
@@ -12,6 +11,7 @@ from preview_generator.exception import BuilderDependencyNotFound
 from preview_generator.exception import IntermediateFileBuildingFailed
 from preview_generator.preview.builder.image__wand import ImagePreviewBuilderWand  # nopep8
 from preview_generator.preview.generic_preview import ImagePreviewBuilder
+from preview_generator.process import check_call
 from preview_generator.utils import ImgDims
 from preview_generator.utils import executable_is_available
 
@@ -20,19 +20,30 @@ INKSCAPE_EXECUTABLE = "inkscape"
 INKSCAPE_0x_SVG_TO_PNG_OPTIONS = ("--export-area-drawing", "-e")
 INKSCAPE_100_SVG_TO_PNG_OPTIONS = ("--export-area-drawing", "--export-type=png", "-o")
 
-try:
-    inkscape_version = check_output((INKSCAPE_EXECUTABLE, "--version"))
-except (FileNotFoundError, CalledProcessError):
-    inkscape_version = b"not_installed"
-INKSCAPE_SVG_TO_PNG_OPTIONS = (
-    INKSCAPE_0x_SVG_TO_PNG_OPTIONS
-    if inkscape_version.startswith(b"Inkscape 0.")
-    else INKSCAPE_100_SVG_TO_PNG_OPTIONS
-)
+_inkscape_version = None  # type: typing.Optional[bytes]
+
+
+def get_inkscape_version() -> bytes:
+    """
+    :return: output of inkscape --version, which is only run on first call
+    """
+    global _inkscape_version
+    if _inkscape_version is None:
+        try:
+            _inkscape_version = check_output((INKSCAPE_EXECUTABLE, "--version"))
+        except (FileNotFoundError, CalledProcessError):
+            _inkscape_version = b"not_installed"
+    return _inkscape_version
+
+
+def get_inkscape_svg_to_png_options() -> typing.Tuple[str, ...]:
+    if get_inkscape_version().startswith(b"Inkscape 0."):
+        return INKSCAPE_0x_SVG_TO_PNG_OPTIONS
+    return INKSCAPE_100_SVG_TO_PNG_OPTIONS
 
 
 def get_inkscape_parameters(input_path: str, output_path: str) -> typing.Tuple[str, ...]:
-    return (INKSCAPE_EXECUTABLE, input_path, *INKSCAPE_SVG_TO_PNG_OPTIONS, output_path)
+    return (INKSCAPE_EXECUTABLE, input_path, *get_inkscape_svg_to_png_options(), output_path)
 
 
 class ImagePreviewBuilderInkscape(ImagePreviewBuilder):
@@ -53,7 +64,7 @@ class ImagePreviewBuilderInkscape(ImagePreviewBuilder):
 
     @classmethod
     def dependencies_versions(cls) -> typing.Optional[str]:
-        return "{} from {}".format(inkscape_version.decode(), which(INKSCAPE_EXECUTABLE))
+        return "{} from {}".format(get_inkscape_version().decode(), which(INKSCAPE_EXECUTABLE))
 
     def build_jpeg_preview(
         self,
@@ -83,6 +94,6 @@ class ImagePreviewBuilderInkscape(ImagePreviewBuilder):
                     "failed with status {}".format(build_png_result_code)
                 )
 
-            return ImagePreviewBuilderWand().build_jpeg_preview(
+            return ImagePreviewBuilderWand.get_instance().build_jpeg_preview(
                 tmp_png.name, preview_name, cache_path, page_id, extension, size, mimetype
             )
@@ -1,13 +1,17 @@
-import tempfile
+from io import BytesIO
+import os
 import typing
 
 from wand.image import Image
 
 from preview_generator.exception import BuilderDependencyNotFound
 from preview_generator.preview.builder.image__wand import ImagePreviewBuilderWand
+from preview_generator.preview.builder.image__wand import SHRINK_ON_LOAD_FACTOR
+from preview_generator.preview.builder.image__wand import get_max_dim
 from preview_generator.preview.generic_preview import ImagePreviewBuilder
 from preview_generator.utils import ImgDims
 from preview_generator.utils import MimetypeMapping
+from preview_generator.utils import compute_resize_dims
 
 rawpy_installed = True
 try:
@@ -15,6 +19,9 @@ try:
 except ImportError:
     rawpy_installed = False
 
+# INFO - rotation (clockwise) to apply to the embedded preview for each libraw "flip" value
+LIBRAW_FLIP_ROTATION = {3: 180, 5: 270, 6: 90}
+
 
 class ImagePreviewBuilderRawpy(ImagePreviewBuilder):
     weight = 150
@@ -73,14 +80,98 @@ class ImagePreviewBuilderRawpy(ImagePreviewBuilder):
     ) -> None:
         if not size:
             size = self.default_size
-        with tempfile.NamedTemporaryFile(
-            "w+b", prefix="preview-generator", suffix=".tiff"
-        ) as tmp_tiff:
-            with rawpy.imread(file_path) as raw:
-                processed_image = raw.postprocess(use_auto_wb=True)
-                with Image.from_array(processed_image) as img:
-                    img.save(filename=tmp_tiff.name)
-
-            return ImagePreviewBuilderWand().build_jpeg_preview(
-                tmp_tiff.name, preview_name, cache_path, page_id, extension, size, mimetype
-            )
+        self.build_jpeg_preview_sizes(
+            file_path, [(size, preview_name)], cache_path, page_id, extension, mimetype
+        )
+
+    def build_jpeg_preview_sizes(
+        self,
+        file_path: str,
+        preview_names: typing.List[typing.Tuple[ImgDims, str]],
+        cache_path: str,
+        page_id: int,
+        extension: str = ".jpeg",
+        mimetype: str = "",
+    ) -> None:
+        """
+        Use the preview embedded in the raw file when it is large enough for all requested
+        sizes, otherwise demosaic the raw image. Images are given to wand in memory.
+        """
+        previews = [
+            (size, os.path.join(cache_path, preview_name + extension))
+            for size, preview_name in preview_names
+        ]
+        self._raw_to_jpeg_sizes(file_path, previews)
+
+    def build_jpeg_preview_from_content(
+        self,
+        file_content: bytes,
+        preview_name: str,
+        cache_path: str,
+        page_id: int,
+        extension: str = ".jpeg",
+        size: ImgDims = None,
+        mimetype: str = "",
+    ) -> None:
+        if not size:
+            size = self.default_size
+        dest_path = os.path.join(cache_path, preview_name + extension)
+        self._raw_to_jpeg_sizes(BytesIO(file_content), [(size, dest_path)])
+
+    def _raw_to_jpeg_sizes(
+        self,
+        raw_file: typing.Union[str, typing.IO[bytes]],
+        previews: typing.List[typing.Tuple[ImgDims, str]],
+    ) -> None:
+        """
+        :param raw_file: path or stream of the raw file
+        """
+        wand_builder = ImagePreviewBuilderWand.get_instance()
+        with rawpy.imread(raw_file) as raw:
+            img = self._get_embedded_preview(raw, wand_builder, previews)
+            if img is None:
+                max_dim = get_max_dim(previews)
+                # INFO - half size skips demosaicing: each 2x2 bayer block gives one pixel
+                half_size = (
+                    max(raw.sizes.width, raw.sizes.height) >= 2 * max_dim * SHRINK_ON_LOAD_FACTOR
+                )
+                processed_image = raw.postprocess(use_auto_wb=True, half_size=half_size)
+                img = Image.from_array(processed_image)
+        with img:
+            wand_builder.wand_image_to_jpeg_sizes(img, previews)
+
+    def _get_embedded_preview(
+        self,
+        raw: "rawpy.RawPy",
+        wand_builder: ImagePreviewBuilderWand,
+        previews: typing.List[typing.Tuple[ImgDims, str]],
+    ) -> typing.Optional[Image]:
+        """
+        :return: decoded preview embedded in the raw file, or None if there is no embedded
+        preview or if it is smaller than one of the requested previews
+        """
+        try:
+            thumb = raw.extract_thumb()
+        except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
+            return None
+
+        if thumb.format == rawpy.ThumbFormat.JPEG:
+            img = wand_builder.read_image(blob=thumb.data, max_dim=get_max_dim(previews))
+        elif thumb.format == rawpy.ThumbFormat.BITMAP:
+            img = Image.from_array(thumb.data)
+        else:
+            return None
+
+        # INFO - embedded previews usually have no orientation, the raw one applies
+        if img.orientation in ("undefined", "top_left"):
+            rotation = LIBRAW_FLIP_ROTATION.get(getattr(raw.sizes, "flip", 0))
+            if rotation:
+                img.rotate(rotation)
+
+        img_dims = ImgDims(width=img.width, height=img.height)
+        for preview_dims, _ in previews:
+            resize_dims = compute_resize_dims(dims_in=img_dims, dims_out=preview_dims)
+            if resize_dims.width > img_dims.width or resize_dims.height > img_dims.height:
+                img.close()
+                return None
+        return img
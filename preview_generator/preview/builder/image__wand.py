@@ -14,12 +14,23 @@ from preview_generator.extension import mimetypes_storage
 from preview_generator.preview.generic_preview import ImagePreviewBuilder
 from preview_generator.utils import ImgDims
 from preview_generator.utils import MimetypeMapping
+from preview_generator.utils import atomic_output_path
 from preview_generator.utils import compute_resize_dims
 from preview_generator.utils import executable_is_available
 from preview_generator.utils import imagemagick_supported_mimes
 
 DEFAULT_JPEG_QUALITY = 85
 DEFAULT_JPEG_PROGRESSIVE = True
+# INFO - images are decoded at (at least) this factor of the preview size when the decoder
+# is able to downscale while decoding, which keeps a good thumbnail quality
+SHRINK_ON_LOAD_FACTOR = 2
+
+
+def get_max_dim(previews: typing.List[typing.Tuple[ImgDims, str]]) -> int:
+    """
+    :return: largest dimension of requested (size, destination path) previews
+    """
+    return max(preview_dims.max_dim() for preview_dims, _ in previews)
 
 
 class ImagePreviewBuilderWand(ImagePreviewBuilder):
@@ -141,34 +152,165 @@ class ImagePreviewBuilderWand(ImagePreviewBuilder):
         dest_path = os.path.join(cache_path, preview_name)
         self.image_to_jpeg_wand(file_path, size, dest_path, mimetype=mimetype)
 
+    def build_jpeg_preview_sizes(
+        self,
+        file_path: str,
+        preview_names: typing.List[typing.Tuple[ImgDims, str]],
+        cache_path: str,
+        page_id: int,
+        extension: str = ".jpeg",
+        mimetype: str = "",
+    ) -> None:
+        previews = [
+            (size, os.path.join(cache_path, preview_name + extension))
+            for size, preview_name in preview_names
+        ]
+        self.image_to_jpeg_wand_sizes(file_path, previews, mimetype=mimetype)
+
     def image_to_jpeg_wand(
         self, file_path: str, preview_dims: ImgDims, dest_path: str, mimetype: typing.Optional[str]
     ) -> None:
+        self.image_to_jpeg_wand_sizes(file_path, [(preview_dims, dest_path)], mimetype=mimetype)
+
+    def image_to_jpeg_wand_sizes(
+        self,
+        file_path: str,
+        previews: typing.List[typing.Tuple[ImgDims, str]],
+        mimetype: typing.Optional[str],
+    ) -> None:
+        """
+        Decode the image once and save a jpeg preview for each (size, destination path)
+        """
         try:
-            with self._convert_image(file_path, preview_dims) as img:
-                img.save(filename=dest_path)
+            self._save_image_sizes(file_path, previews)
         except (CoderError, CoderFatalError, CoderWarning) as e:
             assert mimetype
             file_ext = mimetypes_storage.guess_extension(mimetype, strict=False) or ""
             if file_ext:
                 file_path = file_ext.lstrip(".") + ":" + file_path
-                with self._convert_image(file_path, preview_dims) as img:
-                    img.save(filename=dest_path)
+                self._save_image_sizes(file_path, previews)
             else:
                 raise e
 
+    def build_jpeg_preview_from_content(
+        self,
+        file_content: bytes,
+        preview_name: str,
+        cache_path: str,
+        page_id: int,
+        extension: str = ".jpeg",
+        size: ImgDims = None,
+        mimetype: str = "",
+    ) -> None:
+        if not size:
+            size = self.default_size
+        dest_path = os.path.join(cache_path, preview_name + extension)
+        self.blob_to_jpeg_wand_sizes(file_content, [(size, dest_path)], mimetype=mimetype)
+
+    def blob_to_jpeg_wand_sizes(
+        self,
+        blob: bytes,
+        previews: typing.List[typing.Tuple[ImgDims, str]],
+        mimetype: typing.Optional[str] = None,
+    ) -> None:
+        """
+        Same as image_to_jpeg_wand_sizes, for an encoded image already in memory
+        """
+        max_dim = get_max_dim(previews)
+        try:
+            img = self.read_image(blob=blob, max_dim=max_dim)
+        except (CoderError, CoderFatalError, CoderWarning) as e:
+            file_ext = ""
+            if mimetype:
+                file_ext = mimetypes_storage.guess_extension(mimetype, strict=False) or ""
+            if not file_ext:
+                raise e
+            img = self.read_image(blob=blob, max_dim=max_dim, format=file_ext.lstrip("."))
+        with img:
+            self.wand_image_to_jpeg_sizes(img, previews)
+
+    def wand_image_to_jpeg_sizes(
+        self, img: Image, previews: typing.List[typing.Tuple[ImgDims, str]]
+    ) -> None:
+        """
+        Save a jpeg preview of a decoded image for each (size, destination path).
+        Previews are downscaled from the largest one to the smallest one, each preview
+        being computed from the previous (larger) one instead of the original image.
+        img is modified.
+        """
+        self._prepare_image(img)
+        img_dims = ImgDims(width=img.width, height=img.height)
+        resized_previews = [
+            (compute_resize_dims(dims_in=img_dims, dims_out=preview_dims), dest_path)
+            for preview_dims, dest_path in previews
+        ]
+        resized_previews.sort(key=lambda preview: preview[0].width, reverse=True)
+        for resize_dim, dest_path in resized_previews:
+            img.thumbnail(resize_dim.width, resize_dim.height)
+            with atomic_output_path(dest_path) as output_path:
+                img.save(filename=output_path)
+
+    def _save_image_sizes(
+        self, file_path: str, previews: typing.List[typing.Tuple[ImgDims, str]]
+    ) -> None:
+        with self.read_image(file_path=file_path, max_dim=get_max_dim(previews)) as img:
+            self.wand_image_to_jpeg_sizes(img, previews)
+
     def _convert_image(self, file_path: str, preview_dims: ImgDims) -> Image:
         """
         refer: https://legacy.imagemagick.org/Usage/thumbnails/
         like cmd: convert -layers merge  -background white -thumbnail widthxheight \
         -auto-orient -quality 85 -interlace plane input.jpeg output.jpeg
         """
-
-        img = Image(filename=file_path)
-        img.auto_orient()
+        img = self._load_image(file_path, max_dim=preview_dims.max_dim())
         resize_dim = compute_resize_dims(
             dims_in=ImgDims(width=img.width, height=img.height), dims_out=preview_dims
         )
+        img.thumbnail(resize_dim.width, resize_dim.height)
+        return img
+
+    def _load_image(self, file_path: str, max_dim: typing.Optional[int] = None) -> Image:
+        img = self.read_image(file_path=file_path, max_dim=max_dim)
+        self._prepare_image(img)
+        return img
+
+    def read_image(
+        self,
+        file_path: typing.Optional[str] = None,
+        blob: typing.Optional[bytes] = None,
+        max_dim: typing.Optional[int] = None,
+        format: typing.Optional[str] = None,
+    ) -> Image:
+        """
+        Decode an image from a file or from memory.
+        :param max_dim: largest dimension of the previews to build. If given, decoders
+        supporting it decode a reduced image instead of the full resolution one.
+        :param format: format of the blob (eg. "xcf"), when it can't be detected
+        """
+        img = Image()
+        try:
+            if max_dim:
+                # INFO - shrink-on-load: libjpeg DCT scaling decodes the image at the smallest
+                # 1/2, 1/4 or 1/8 scale still larger than the hint, so memory and CPU depend
+                # on the preview size instead of the source size. Other decoders ignore it.
+                # The hint is square because the image may be rotated by auto_orient.
+                hint_dim = max_dim * SHRINK_ON_LOAD_FACTOR
+                img.options["jpeg:size"] = "{}x{}".format(hint_dim, hint_dim)
+            read_options = {}  # type: typing.Dict[str, str]
+            if format:
+                read_options["format"] = format
+            img.read(filename=file_path, blob=blob, **read_options)
+        except BaseException:
+            img.close()
+            raise
+        return img
+
+    def _prepare_image(self, img: Image) -> None:
+        """
+        Prepare a decoded image to be saved as jpeg previews: orientation,
+        layers merged on a white background, jpeg quality and interlacing.
+        """
+        img.auto_orient()
 
         img.iterator_reset()
         img.background_color = Color("white")
@@ -178,7 +320,3 @@ class ImagePreviewBuilderWand(ImagePreviewBuilder):
             img.interlace_scheme = "plane"
 
         img.compression_quality = self.quality
-
-        img.thumbnail(resize_dim.width, resize_dim.height)
-
-        return img
@@ -1,49 +1,24 @@
 # -*- coding: utf-8 -*-
 import contextlib
-import hashlib
 from io import BytesIO
 import logging
 import os
 from shutil import which
-import signal
-from subprocess import DEVNULL
-from subprocess import Popen
-from subprocess import STDOUT
 from subprocess import check_output
 import typing
 
-from filelock import FileLock
-
 from preview_generator.exception import BuilderDependencyNotFound
 from preview_generator.exception import InputExtensionNotFound
 from preview_generator.extension import mimetypes_storage
 from preview_generator.preview.builder.document_generic import DocumentPreviewBuilder
-from preview_generator.preview.builder.document_generic import create_flag_file
 from preview_generator.preview.builder.document_generic import write_file_content
-from preview_generator.utils import LOCKFILE_EXTENSION
-from preview_generator.utils import LOCK_DEFAULT_TIMEOUT
+from preview_generator.preview.libreoffice_pool import LIBREOFFICE_LOCK_NAME  # noqa: F401
+from preview_generator.preview.libreoffice_pool import LIBREOFFICE_PROCESS_TIMEOUT  # noqa: F401
+from preview_generator.preview.libreoffice_pool import get_libreoffice_pool
 from preview_generator.utils import LOGGER_NAME
 from preview_generator.utils import MimetypeMapping
 from preview_generator.utils import executable_is_available
 
-LIBREOFFICE_LOCK_NAME = "libreoffice"
-# NOTE - SG - 20210420 - The default timeout value is 60 seconds and can be overridden
-# by the LIBREOFFICE_PROCESS_TIMEOUT variable.
-# If this variable has a value lesser or equal than 0, the timeout is disabled
-env_var = os.getenv("LIBREOFFICE_PROCESS_TIMEOUT", "60")
-try:
-    timeout_from_var = float(env_var)
-except ValueError:
-    raise ValueError(
-        "Invalid value for LIBREOFFICE_PROCESS_TIMEOUT: it should be a number, got {}".format(
-            env_var
-        )
-    )
-if timeout_from_var > 0:
-    LIBREOFFICE_PROCESS_TIMEOUT = timeout_from_var  # type: typing.Optional[float]
-else:
-    LIBREOFFICE_PROCESS_TIMEOUT = None
-
 
 class OfficePreviewBuilderLibreoffice(DocumentPreviewBuilder):
     weight = 40
@@ -88,12 +63,26 @@ class OfficePreviewBuilderLibreoffice(DocumentPreviewBuilder):
             file_content, input_extension, cache_path, output_filepath, mimetype
         )
 
-    def _get_libreoffice_lock(self, cache_path: str) -> FileLock:
-        # INFO - jumenzel - 2019-03-12 - Do not allow multiple concurrent libreoffice calls to avoid issue.
-        # INFO - jumenzel - 2019-03-12 - Should we allow running multiple libreoffice instances ?
-        # see https://github.com/algoo/preview-generator/issues/77
-        file_lock_path = os.path.join(cache_path, LIBREOFFICE_LOCK_NAME + LOCKFILE_EXTENSION)
-        return FileLock(file_lock_path, timeout=LOCK_DEFAULT_TIMEOUT)
+    def _convert_to_partial_pdf(
+        self,
+        file_content: typing.IO[bytes],
+        input_extension: str,
+        cache_path: str,
+        output_filepath: str,
+        mimetype: str,
+        page_nb: int,
+    ) -> None:
+        self.convert_office_document_to_pdf(
+            file_content,
+            input_extension,
+            cache_path,
+            output_filepath,
+            mimetype,
+            page_range="1-{}".format(page_nb),
+        )
+
+    def has_partial_pdf_preview(self) -> bool:
+        return True
 
     def convert_office_document_to_pdf(
         self,
@@ -102,7 +91,11 @@ class OfficePreviewBuilderLibreoffice(DocumentPreviewBuilder):
         cache_path: str,
         output_filepath: str,
         mimetype: str,
+        page_range: str = "",
     ) -> BytesIO:
+        """
+        :param page_range: pages to convert, eg. "1-3". All pages are converted if empty
+        """
         logger = logging.getLogger(LOGGER_NAME)
         logger.debug(
             "converting file bytes {} to pdf file {}".format(file_content, output_filepath)
@@ -115,93 +108,44 @@ class OfficePreviewBuilderLibreoffice(DocumentPreviewBuilder):
                 "unable convert office document to pdf.".format(mimetype)
             )  # nopep8
         temporary_input_content_path = output_filepath + input_extension  # nopep8
-        with create_flag_file(output_filepath):
+        logger.debug(
+            "conversion is based on temporary file {}".format(temporary_input_content_path)
+        )  # nopep8
+
+        if not os.path.exists(output_filepath):
+            write_file_content(file_content, output_filepath=temporary_input_content_path)
             logger.debug(
-                "conversion is based on temporary file {}".format(temporary_input_content_path)
+                "temporary file written: {}".format(temporary_input_content_path)
             )  # nopep8
-
-            if not os.path.exists(output_filepath):
-                write_file_content(file_content, output_filepath=temporary_input_content_path)
-                logger.debug(
-                    "temporary file written: {}".format(temporary_input_content_path)
-                )  # nopep8
-                logger.debug(
-                    "converting {} to pdf into folder {}".format(
-                        temporary_input_content_path, cache_path
-                    )
+            logger.debug(
+                "converting {} to pdf into folder {}".format(
+                    temporary_input_content_path, cache_path
                 )
+            )
 
-                libreoffice_lock = self._get_libreoffice_lock(cache_path)
-                cache_path_hash = hashlib.md5(cache_path.encode("utf-8")).hexdigest()
-                default_filters_by_mimetype = {"text/html": "-infilter=writerglobal8_HTML"}
-                infilter = default_filters_by_mimetype.get(mimetype, "")
-                with libreoffice_lock:
-                    process = Popen(
-                        [
-                            "libreoffice",
-                            "--headless",
-                            infilter,
-                            "--convert-to",
-                            "pdf:writer_pdf_Export",
-                            temporary_input_content_path,
-                            "--outdir",
-                            cache_path,
-                            "-env:UserInstallation=file:///tmp/LibreOffice-conversion-{}".format(
-                                cache_path_hash
-                            ),  # nopep8
-                        ],
-                        stdout=DEVNULL,
-                        stderr=STDOUT,
-                        start_new_session=True,
-                    )
-                    process_timeout = LIBREOFFICE_PROCESS_TIMEOUT
-                    if process_timeout is not None:
-                        stop_process_timeout = process_timeout / 10  # type: typing.Optional[float]
-                    else:
-                        stop_process_timeout = None
-                    try:
-                        process.communicate(timeout=process_timeout)
-                    except Exception as exc:
-                        try:
-                            # INFO - SG - 2021-04-16
-                            # we waited long enough (or we got another exception), give a little time to the process
-                            # to exit cleanly
-                            logger.warning(
-                                "The preview generation for {} took too long, try aborting it".format(
-                                    temporary_input_content_path
-                                )
-                            )
-                            os.killpg(process.pid, signal.SIGTERM)
-                            process.communicate(timeout=stop_process_timeout)
-                        except Exception:
-                            # too slow to exit… let's kill
-                            logger.warning(
-                                "Preview generation process for {} doesn't respond, force stopping it".format(
-                                    temporary_input_content_path
-                                )
-                            )
-                            os.killpg(process.pid, signal.SIGKILL)
-                            process.communicate(timeout=stop_process_timeout)
-                        finally:
-                            raise exc
+            get_libreoffice_pool(cache_path).convert(
+                input_path=temporary_input_content_path,
+                output_dir=cache_path,
+                output_filepath=output_filepath,
+                mimetype=mimetype,
+                page_range=page_range,
+            )
 
-            # HACK - D.A. - 2018-05-31 - name is defined by libreoffice
-            # according to input file name, for homogeneity we prefer to rename it
-            # HACK-HACK - B.L - 2018-10-8 - if file is given without its extension
-            # in its name it won't have the double ".pdf"
-            if os.path.exists(output_filepath + ".pdf"):
-                logger.debug(
-                    "renaming output file {} to {}".format(
-                        output_filepath + ".pdf", output_filepath
-                    )
-                )
-                os.rename(output_filepath + ".pdf", output_filepath)
+        # HACK - D.A. - 2018-05-31 - name is defined by libreoffice
+        # according to input file name, for homogeneity we prefer to rename it
+        # HACK-HACK - B.L - 2018-10-8 - if file is given without its extension
+        # in its name it won't have the double ".pdf"
+        if os.path.exists(output_filepath + ".pdf"):
+            logger.debug(
+                "renaming output file {} to {}".format(output_filepath + ".pdf", output_filepath)
+            )
+            os.rename(output_filepath + ".pdf", output_filepath)
 
-            with contextlib.suppress(FileNotFoundError):
-                logger.info(
-                    "Removing temporary copy file {}".format(temporary_input_content_path)
-                )  # nopep8
-                os.remove(temporary_input_content_path)
+        with contextlib.suppress(FileNotFoundError):
+            logger.info(
+                "Removing temporary copy file {}".format(temporary_input_content_path)
+            )  # nopep8
+            os.remove(temporary_input_content_path)
 
         with open(output_filepath, "rb") as pdf_handle:
             pdf_handle.seek(0, 0)
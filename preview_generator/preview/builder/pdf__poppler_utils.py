@@ -1,25 +1,53 @@
 # -*- coding: utf-8 -*-
 
+import glob
+import os
+import re
+from subprocess import CalledProcessError
 from subprocess import DEVNULL
 from subprocess import STDOUT
-from subprocess import check_call
-from subprocess import check_output
 import tempfile
 import typing
 
 from preview_generator import utils
 from preview_generator.exception import BuilderDependencyNotFound
-from preview_generator.exception import IntermediateFileBuildingFailed
+from preview_generator.exception import UnavailablePreviewType
 from preview_generator.preview.builder.image__wand import ImagePreviewBuilderWand
 from preview_generator.preview.generic_preview import PreviewBuilder
+from preview_generator.process import check_call
+from preview_generator.process import check_output
+from preview_generator.utils import DocumentMetadata
 from preview_generator.utils import executable_is_available
 
 PDFTOCAIRO_EXECUTABLE = "pdftocairo"
 PDFINFO_EXECUTABLE = "pdfinfo"
+# INFO - pdftocairo names output files like <prefix>-<page number>.png, with page numbers
+# padded with zeros according to the number of pages of the document.
+PDFTOCAIRO_PAGE_FILE_PATTERN = re.compile(r"-(\d+)\.png$")
+# INFO - pdfinfo gives the size of each page when run with a page range,
+# eg: "Page    1 size: 612 x 792 pts (letter)"
+PDFINFO_PAGE_SIZE_PATTERN = re.compile(r"^Page\s+\d+\s+size:\s+([\d.]+)\s+x\s+([\d.]+)")
+
+
+def get_page_ranges(page_ids: typing.Iterable[int]) -> typing.List[typing.Tuple[int, int]]:
+    """
+    Group page ids into ranges of consecutive pages
+
+    >>> get_page_ranges([4, 0, 1, 2, 7, 8])
+    [(0, 2), (4, 4), (7, 8)]
+    """
+    ranges = []  # type: typing.List[typing.Tuple[int, int]]
+    for page_id in sorted(set(page_ids)):
+        if ranges and ranges[-1][1] == page_id - 1:
+            ranges[-1] = (ranges[-1][0], page_id)
+        else:
+            ranges.append((page_id, page_id))
+    return ranges
 
 
 class PdfPreviewBuilderPopplerUtils(PreviewBuilder):
     weight = 140
+    cache_document_metadata = True
 
     @classmethod
     def get_label(cls) -> str:
@@ -52,42 +80,136 @@ class PdfPreviewBuilderPopplerUtils(PreviewBuilder):
         """
         generate the pdf small preview
         """
-        # INFO - G.M - 2021-10-21 - Page id in pdftocairo begins at 1 instead of 0
-        page_id = page_id + 1
         if not size:
             size = self.default_size
 
         with tempfile.NamedTemporaryFile(
             "w+b", prefix="preview-generator-", suffix=".png"
         ) as tmp_png:
-            build_png_result_code = check_call(
-                [
-                    PDFTOCAIRO_EXECUTABLE,
-                    "-png",
-                    "-singlefile",
-                    "-scale-to",
-                    str(size.max_dim()),
-                    "-f",
-                    str(page_id),
-                    "-l",
-                    str(page_id),
-                    file_path,
-                    # HACK - G.M - 2021-10-21 - For unclear reason, pdftocairo add a second .png
-                    # extension to the file created.
-                    tmp_png.name.rsplit(".png", 1)[0],
-                ],
-                stdout=DEVNULL,
-                stderr=STDOUT,
+            self._build_png(file_path, page_id, size.max_dim(), tmp_png.name)
+            return ImagePreviewBuilderWand.get_instance().build_jpeg_preview(
+                tmp_png.name, preview_name, cache_path, page_id, extension, size, mimetype
+            )
+
+    def build_jpeg_preview_sizes(
+        self,
+        file_path: str,
+        preview_names: typing.List[typing.Tuple[utils.ImgDims, str]],
+        cache_path: str,
+        page_id: int,
+        extension: str = ".jpg",
+        mimetype: str = "",
+    ) -> None:
+        """
+        generate the pdf small preview in several sizes: the page is rendered once,
+        at the largest requested size.
+        """
+        max_dim = max(size.max_dim() for size, _ in preview_names)
+        with tempfile.NamedTemporaryFile(
+            "w+b", prefix="preview-generator-", suffix=".png"
+        ) as tmp_png:
+            self._build_png(file_path, page_id, max_dim, tmp_png.name)
+            ImagePreviewBuilderWand.get_instance().build_jpeg_preview_sizes(
+                tmp_png.name, preview_names, cache_path, page_id, extension, mimetype
+            )
+
+    def _build_png(self, file_path: str, page_id: int, max_dim: int, png_path: str) -> None:
+        """
+        render a page of the pdf as png, the larger side of the page being max_dim
+        """
+        check_call(
+            [
+                PDFTOCAIRO_EXECUTABLE,
+                "-png",
+                "-singlefile",
+                "-scale-to",
+                str(max_dim),
+                # INFO - G.M - 2021-10-21 - Page id in pdftocairo begins at 1 instead of 0
+                "-f",
+                str(page_id + 1),
+                "-l",
+                str(page_id + 1),
+                file_path,
+                # HACK - G.M - 2021-10-21 - For unclear reason, pdftocairo add a second .png
+                # extension to the file created.
+                png_path.rsplit(".png", 1)[0],
+            ],
+            stdout=DEVNULL,
+            stderr=STDOUT,
+        )
+
+    def build_jpeg_previews(
+        self,
+        file_path: str,
+        preview_names: typing.Dict[int, str],
+        cache_path: str,
+        extension: str = ".jpg",
+        size: utils.ImgDims = None,
+        mimetype: str = "",
+    ) -> None:
+        """
+        generate the pdf small preview of several pages: each range of consecutive
+        pages is rendered by a single pdftocairo call.
+        """
+        if not size:
+            size = self.default_size
+        negative_page_ids = sorted(page_id for page_id in preview_names if page_id < 0)
+        if negative_page_ids:
+            raise UnavailablePreviewType(
+                "Pages {} not found in {}".format(negative_page_ids, file_path)
             )
-            if build_png_result_code != 0:
-                raise IntermediateFileBuildingFailed(
-                    "Building PNG intermediate file using pdftocairo failed with status {}".format(
-                        build_png_result_code
+
+        with tempfile.TemporaryDirectory(prefix="preview-generator-") as tmp_dir:
+            for first_page_id, last_page_id in get_page_ranges(preview_names.keys()):
+                try:
+                    check_call(
+                        [
+                            PDFTOCAIRO_EXECUTABLE,
+                            "-png",
+                            "-scale-to",
+                            str(size.max_dim()),
+                            # INFO - G.M - 2021-10-21 - Page id in pdftocairo begins at 1
+                            # instead of 0
+                            "-f",
+                            str(first_page_id + 1),
+                            "-l",
+                            str(last_page_id + 1),
+                            file_path,
+                            os.path.join(tmp_dir, "page"),
+                        ],
+                        stdout=DEVNULL,
+                        stderr=STDOUT,
+                    )
+                except CalledProcessError:
+                    # INFO - pdftocairo fails if the whole range is out of the document: the
+                    # page number is only read to tell this case from other failures
+                    page_nb = self.get_page_number(file_path, "", cache_path)
+                    if first_page_id < page_nb:
+                        raise
+                    raise UnavailablePreviewType(
+                        "Pages {}-{} not found in {} ({} pages)".format(
+                            first_page_id, last_page_id, file_path, page_nb
+                        )
                     )
+
+            png_paths = {}  # type: typing.Dict[int, str]
+            for png_path in glob.glob(os.path.join(tmp_dir, "page-*.png")):
+                match = PDFTOCAIRO_PAGE_FILE_PATTERN.search(png_path)
+                if match:
+                    png_paths[int(match.group(1)) - 1] = png_path
+            # INFO - pdftocairo silently skips the end of a range which is out of the document,
+            # no preview is built if some pages are missing
+            missing_page_ids = sorted(set(preview_names) - set(png_paths))
+            if missing_page_ids:
+                raise UnavailablePreviewType(
+                    "Pages {} not found in {}".format(missing_page_ids, file_path)
+                )
+
+            wand_builder = ImagePreviewBuilderWand.get_instance()
+            for page_id, preview_name in preview_names.items():
+                wand_builder.build_jpeg_preview(
+                    png_paths[page_id], preview_name, cache_path, page_id, extension, size, mimetype
                 )
-            return ImagePreviewBuilderWand().build_jpeg_preview(
-                tmp_png.name, preview_name, cache_path, page_id, extension, size, mimetype
-            )
 
     def build_pdf_preview(
         self,
@@ -106,29 +228,30 @@ class PdfPreviewBuilderPopplerUtils(PreviewBuilder):
         preview_path = "{path}{file_name}{extension}".format(
             file_name=preview_name, path=cache_path, extension=extension
         )
-        if page_id > 0:
-            # page specific preview
-            check_call(
-                [
-                    PDFTOCAIRO_EXECUTABLE,
-                    "-pdf",
-                    "-f",
-                    str(page_id),
-                    "-l",
-                    str(page_id),
-                    file_path,
-                    preview_path,
-                ],
-                stdout=DEVNULL,
-                stderr=STDOUT,
-            )
-        else:
-            # Full preview
-            check_call(
-                [PDFTOCAIRO_EXECUTABLE, "-pdf", file_path, preview_path],
-                stdout=DEVNULL,
-                stderr=STDOUT,
-            )
+        with utils.atomic_output_path(preview_path) as output_path:
+            if page_id > 0:
+                # page specific preview
+                check_call(
+                    [
+                        PDFTOCAIRO_EXECUTABLE,
+                        "-pdf",
+                        "-f",
+                        str(page_id),
+                        "-l",
+                        str(page_id),
+                        file_path,
+                        output_path,
+                    ],
+                    stdout=DEVNULL,
+                    stderr=STDOUT,
+                )
+            else:
+                # Full preview
+                check_call(
+                    [PDFTOCAIRO_EXECUTABLE, "-pdf", file_path, output_path],
+                    stdout=DEVNULL,
+                    stderr=STDOUT,
+                )
 
     def get_page_number(
         self,
@@ -137,17 +260,42 @@ class PdfPreviewBuilderPopplerUtils(PreviewBuilder):
         cache_path: str,
         mimetype: typing.Optional[str] = None,
     ) -> int:
-        # TODO - G.M - 2021-10-21 - Reintroduce caching here ?
-        lines = check_output(["pdfinfo", file_path], stderr=STDOUT, universal_newlines=True).split(
-            "\n"
-        )
+        lines = check_output(
+            [PDFINFO_EXECUTABLE, file_path], stderr=STDOUT, universal_newlines=True
+        ).split("\n")
         for line in lines:
-            section, data = line.split(":", maxsplit=1)
+            section, _, data = line.partition(":")
             if section == "Pages":
                 return int(data.strip())
         # FIXME - G.M - 2021-10-21 - Better default case ?
         return 0
 
+    def get_document_metadata(
+        self, file_path: str, preview_name: str, cache_path: str, mimetype: str = ""
+    ) -> DocumentMetadata:
+        """
+        Get page number and size (in pts) of each page with a single pdfinfo call
+        """
+        # INFO - a negative last page means "up to the last page of the document" for pdfinfo
+        lines = check_output(
+            [PDFINFO_EXECUTABLE, "-f", "1", "-l", "-1", file_path],
+            stderr=STDOUT,
+            universal_newlines=True,
+        ).split("\n")
+        page_nb = 0
+        page_sizes = []  # type: typing.List[typing.Tuple[float, float]]
+        for line in lines:
+            section, _, data = line.partition(":")
+            if section == "Pages":
+                page_nb = int(data.strip())
+                continue
+            page_size_match = PDFINFO_PAGE_SIZE_PATTERN.match(line)
+            if page_size_match:
+                page_sizes.append(
+                    (float(page_size_match.group(1)), float(page_size_match.group(2)))
+                )
+        return DocumentMetadata(page_nb=page_nb, page_sizes=page_sizes)
+
     def has_jpeg_preview(self) -> bool:
         return True
 
@@ -1,11 +1,46 @@
 # -*- coding: utf-8 -*-
 
+import os
 import typing
 
 from preview_generator.preview.builder.office__libreoffice import OfficePreviewBuilderLibreoffice
+from preview_generator.text_layout import TEXT_PREVIEW_LINE_NB
+from preview_generator.text_layout import TEXT_RASTERIZER_ENABLED
+from preview_generator.text_layout import get_text_lines
+from preview_generator.text_layout import read_text_head
+from preview_generator.utils import ImgDims
+from preview_generator.utils import atomic_output_path
+from preview_generator.utils import compute_resize_dims
+
+# INFO - html files are rendered by LibreOffice, other text files are drawn as they are
+RASTERIZED_TEXT_MIMETYPES = ("text/plain", "text/xml", "application/xml", "application/javascript")
+# INFO - A4 page, in points
+TEXT_PAGE_DIMS = ImgDims(width=595, height=842)
+TEXT_PAGE_MARGIN_RATIO = 1 / 12
+TEXT_LINE_SPACING = 1.2
+# INFO - average advance of monospace fonts, relative to the font size
+MONOSPACE_CHAR_WIDTH_RATIO = 0.6
+TEXT_FONT_FAMILY = "monospace"
+
+
+def get_text_page_dims(sizes: typing.Iterable[ImgDims]) -> ImgDims:
+    """
+    :return: dims of a page large enough to be downscaled to all the given sizes
+    >>> str(get_text_page_dims([ImgDims(width=1000, height=100), ImgDims(width=256, height=256)]))
+    '181x256'
+    """
+    page_dims = [compute_resize_dims(dims_in=TEXT_PAGE_DIMS, dims_out=size) for size in sizes]
+    return ImgDims(
+        width=max(dims.width for dims in page_dims), height=max(dims.height for dims in page_dims)
+    )
 
 
 class PlainTextPreviewBuilder(OfficePreviewBuilderLibreoffice):
+    """
+    Jpeg previews of the first page of text files are drawn from their first lines, other
+    previews (pdf, later pages) are built from their conversion to pdf by LibreOffice.
+    """
+
     weight = 50
 
     @classmethod
@@ -33,15 +68,77 @@ class PlainTextPreviewBuilder(OfficePreviewBuilderLibreoffice):
         """
         generate the text preview
         """
-        with open(file_path, "rb") as txt:
-            with open(
-                "{path}{extension}".format(path=cache_path + preview_name, extension=extension),
-                "wb",
-            ) as output_text:
+        preview_path = "{path}{extension}".format(
+            path=cache_path + preview_name, extension=extension
+        )
+        with open(file_path, "rb") as txt, atomic_output_path(preview_path) as output_path:
+            with open(output_path, "wb") as output_text:
                 buffer = txt.read(1024)
                 while buffer:
                     output_text.write(buffer)
                     buffer = txt.read(1024)
 
+    def build_first_page_jpeg_preview_sizes(
+        self,
+        file_path: str,
+        preview_names: typing.List[typing.Tuple[ImgDims, str]],
+        cache_path: str,
+        extension: str = ".jpg",
+        mimetype: str = "",
+    ) -> bool:
+        if not TEXT_RASTERIZER_ENABLED or mimetype not in RASTERIZED_TEXT_MIMETYPES:
+            return super().build_first_page_jpeg_preview_sizes(
+                file_path, preview_names, cache_path, extension, mimetype
+            )
+        self.build_jpeg_preview_sizes_from_text(file_path, preview_names, cache_path, extension)
+        return True
+
+    def build_jpeg_preview_sizes_from_text(
+        self,
+        file_path: str,
+        preview_names: typing.List[typing.Tuple[ImgDims, str]],
+        cache_path: str,
+        extension: str = ".jpg",
+    ) -> None:
+        """
+        Draw the first TEXT_PREVIEW_LINE_NB lines of the text file on a page, in a monospace
+        font. The page is drawn large enough for all requested sizes and downscaled to them.
+        """
+        # INFO - imported on use, so that importing this module does not load wand
+        from wand.color import Color
+        from wand.drawing import Drawing
+        from wand.image import Image
+
+        from preview_generator.preview.builder.image__wand import ImagePreviewBuilderWand
+
+        page_dims = get_text_page_dims(size for size, _ in preview_names)
+        margin = round(page_dims.width * TEXT_PAGE_MARGIN_RATIO)
+        line_height = (page_dims.height - 2 * margin) / TEXT_PREVIEW_LINE_NB
+        font_size = line_height / TEXT_LINE_SPACING
+        column_nb = int((page_dims.width - 2 * margin) / (font_size * MONOSPACE_CHAR_WIDTH_RATIO))
+        lines = get_text_lines(read_text_head(file_path), TEXT_PREVIEW_LINE_NB, column_nb)
+
+        with Image(
+            width=page_dims.width, height=page_dims.height, background=Color("white")
+        ) as img:
+            with Drawing() as draw:
+                draw.font_family = TEXT_FONT_FAMILY
+                draw.font_size = font_size
+                draw.fill_color = Color("black")
+                draw.text_antialias = True
+                for line_index, line in enumerate(lines):
+                    # INFO - empty texts can't be drawn
+                    if line.strip():
+                        baseline = margin + line_index * line_height + font_size
+                        draw.text(margin, round(baseline), line)
+                draw(img)
+            ImagePreviewBuilderWand.get_instance().wand_image_to_jpeg_sizes(
+                img,
+                [
+                    (size, os.path.join(cache_path, preview_name + extension))
+                    for size, preview_name in preview_names
+                ],
+            )
+
     def has_text_preview(self) -> bool:
         return True
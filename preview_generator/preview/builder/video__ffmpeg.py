@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
 
+import contextlib
 import json
 from shutil import which
+from subprocess import CalledProcessError
+from subprocess import DEVNULL
 from subprocess import check_output
 import typing
+import warnings
 
 from preview_generator import utils
 from preview_generator.exception import BuilderDependencyNotFound
 from preview_generator.exception import PreviewGeneratorException
+from preview_generator.fingerprint import FingerprintLRUCache
 from preview_generator.preview.generic_preview import PreviewBuilder
+from preview_generator.process import check_call
+from preview_generator.process import check_output as check_process_output
 
 ffmpeg_installed = True
 try:
@@ -16,15 +23,60 @@ try:
 except ImportError:
     ffmpeg_installed = False
 
+VIDEO_PROBE_CACHE_MAX_SIZE = 256
+
+VideoProbe = typing.Dict[str, typing.Any]
+
 
 class NoVideoStream(PreviewGeneratorException):
     pass
 
 
+def run_ffmpeg(stream: "ffmpeg.nodes.OutputStream") -> None:
+    """
+    Same as stream.run() but the ffmpeg process is killed if the preview request is cancelled
+    """
+    args = stream.compile()
+    try:
+        check_call(args)
+    except CalledProcessError as exc:
+        raise ffmpeg.Error(args[0], None, None) from exc
+
+
+def probe_ffmpeg(file_path: str) -> VideoProbe:
+    """
+    Same as ffmpeg.probe() but the ffprobe process is killed if the preview request is cancelled
+    """
+    args = ["ffprobe", "-show_format", "-show_streams", "-of", "json", file_path]
+    try:
+        output = check_process_output(args, stderr=DEVNULL)
+    except CalledProcessError as exc:
+        raise ffmpeg.Error(args[0], exc.output, None) from exc
+    probe_result = json.loads(output.decode("utf-8"))  # type: VideoProbe
+    return probe_result
+
+
+# INFO - ffprobe results, so that building each page of a video does not start a new ffprobe
+# process. Results are shared, do not modify them.
+video_probe_cache = FingerprintLRUCache(
+    probe_ffmpeg, VIDEO_PROBE_CACHE_MAX_SIZE
+)  # type: FingerprintLRUCache[VideoProbe]
+
+
 class VideoPreviewBuilderFFMPEG(PreviewBuilder):
     page_nb = 10
     weight = 80
 
+    def __init__(self, page_nb: typing.Optional[int] = None) -> None:
+        """
+        :param page_nb: number of pages (frames) of the previews, page_nb class attribute
+        (10) by default. The builder returned by get_instance() and by the factory is shared
+        by all requests: build another instance to get previews with another number of pages.
+        """
+        super().__init__()
+        if page_nb is not None:
+            self.page_nb = page_nb
+
     @classmethod
     def get_label(cls) -> str:
         return "Video files - based on ffmpeg"
@@ -157,30 +209,57 @@ class VideoPreviewBuilderFFMPEG(PreviewBuilder):
         """
         generate the jpeg preview
         """
+        self.build_jpeg_previews(
+            file_path=file_path,
+            preview_names={page_id: preview_name},
+            cache_path=cache_path,
+            extension=extension,
+            size=size,
+            mimetype=mimetype,
+        )
+
+    def build_jpeg_previews(
+        self,
+        file_path: str,
+        preview_names: typing.Dict[int, str],
+        cache_path: str,
+        extension: str = ".jpg",
+        size: utils.ImgDims = None,
+        mimetype: str = "",
+    ) -> None:
+        """
+        generate the jpeg preview of several pages (frames) with a single ffmpeg process:
+        the video is given once as input for each frame, with a fast seek to the frame time.
+        """
         if not size:
             size = self.default_size
 
-        preview_path = "{path}{file_name}{extension}".format(
-            file_name=preview_name, path=cache_path, extension=extension
-        )
-
-        video_probe_data = ffmpeg.probe(file_path)
+        video_probe_data = video_probe_cache.get(file_path)
         video_size = self.get_dims_from_ffmpeg_probe(video_probe_data)
         extraction_size = self._get_extraction_size(video_size, size)
 
         video_duration = float(video_probe_data["format"]["duration"])
-        page_nb = self.get_page_number(file_path, preview_name, cache_path)
-        frame_time = self._get_frame_time(page_id, page_nb, video_duration)
-
-        (
-            ffmpeg.input(file_path, ss=frame_time)
-            .filter("scale", extraction_size.width, extraction_size.height)
-            .output(preview_path, vframes=1)
-            # INFO - G.M - 2020-07-03 we do allow overwrite to allow forcing the refresh of
-            # the preview.
-            .overwrite_output()
-            .run()
-        )
+        page_nb = self.get_page_number(file_path, "", cache_path)
+
+        with contextlib.ExitStack() as output_paths:
+            outputs = []
+            for page_id, preview_name in preview_names.items():
+                preview_path = "{path}{file_name}{extension}".format(
+                    file_name=preview_name, path=cache_path, extension=extension
+                )
+                output_path = output_paths.enter_context(utils.atomic_output_path(preview_path))
+                frame_time = self._get_frame_time(page_id, page_nb, video_duration)
+                outputs.append(
+                    ffmpeg.input(file_path, ss=frame_time)
+                    .filter("scale", extraction_size.width, extraction_size.height)
+                    .output(output_path, vframes=1)
+                )
+            run_ffmpeg(
+                ffmpeg.merge_outputs(*outputs)
+                # INFO - G.M - 2020-07-03 we do allow overwrite to allow forcing the refresh of
+                # the preview.
+                .overwrite_output()
+            )
 
     def build_json_preview(
         self,
@@ -193,15 +272,24 @@ class VideoPreviewBuilderFFMPEG(PreviewBuilder):
         """
         generate the json preview. Default implementation is based on ExifTool
         """
-        metadata = ffmpeg.probe(file_path)
+        metadata = video_probe_cache.get(file_path)
 
-        with open(cache_path + preview_name + extension, "w") as jsonfile:
-            json.dump(metadata, jsonfile)
+        with utils.atomic_output_path(cache_path + preview_name + extension) as output_path:
+            with open(output_path, "w") as jsonfile:
+                json.dump(metadata, jsonfile)
 
     def set_page_nb(self, page_nb: int) -> int:
         """
         Allow to override default page_nb (10 by default)
+
+        Deprecated: the builder returned by get_instance() is shared by all requests, this
+        changes the number of pages of all of them. Give page_nb to the constructor instead.
         """
+        warnings.warn(
+            "set_page_nb() is deprecated, use VideoPreviewBuilderFFMPEG(page_nb=...)",
+            DeprecationWarning,
+            stacklevel=2,
+        )
         self.page_nb = page_nb
         return self.page_nb
 
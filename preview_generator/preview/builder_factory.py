@@ -1,22 +1,29 @@
 # -*- coding: utf-8 -*-
 
 import glob
+import importlib
 import logging
 import os
 from os.path import basename
 from os.path import dirname
 from os.path import isfile
-from subprocess import PIPE
-from subprocess import Popen
 from threading import RLock
 import typing
 
-import magic
-
 from preview_generator.exception import BuilderDependencyNotFound
 from preview_generator.exception import BuilderNotLoaded
 from preview_generator.exception import UnsupportedMimeType
 from preview_generator.extension import mimetypes_storage
+from preview_generator.file_content import FileContent
+from preview_generator.mime_detection import AMBIGUOUS_MIMES  # noqa: F401
+from preview_generator.mime_detection import detect_content_mimetype
+from preview_generator.mime_detection import get_file_mimetype
+from preview_generator.preview.builder_registry import BUILDER_PACKAGE
+from preview_generator.preview.builder_registry import BuilderEntry
+from preview_generator.preview.builder_registry import get_modules_signature
+from preview_generator.preview.builder_registry import read_builder_registry
+from preview_generator.preview.builder_registry import remove_builder_registry
+from preview_generator.preview.builder_registry import write_builder_registry
 from preview_generator.preview.generic_preview import PreviewBuilder
 from preview_generator.utils import LOGGER_NAME
 from preview_generator.utils import get_subclasses_recursively
@@ -24,15 +31,6 @@ from preview_generator.utils import is_abstract
 
 PB = typing.TypeVar("PB", bound=PreviewBuilder)
 
-AMBIGUOUS_MIMES = [
-    "text/xml",
-    "text/plain",
-    "application/xml",
-    "application/octet-stream",
-    "image/tiff",
-    "audio/ogg",
-]
-
 
 class PreviewBuilderFactory(object):
 
@@ -41,56 +39,67 @@ class PreviewBuilderFactory(object):
 
     def __init__(self) -> None:
         self.builders_loaded = False
-        self.builders_classes = []  # type: typing.List[typing.Any]
+        self._builders_classes = []  # type: typing.List[typing.Any]
         self._builder_classes = {}  # type: typing.Dict[str, type]
+        # INFO - builders registered from the builder registry, their module is imported
+        # on first use
+        self._builder_entries = {}  # type: typing.Dict[str, BuilderEntry]
+        self._registered_builder_entries = []  # type: typing.List[BuilderEntry]
+        self._import_lock = RLock()
         self.logger = logging.getLogger(LOGGER_NAME)
 
+    @property
+    def builders_classes(self) -> typing.List[typing.Any]:
+        """
+        Registered builder classes. Builders not used yet are imported.
+        """
+        for builder_entry in list(self._registered_builder_entries):
+            self._import_builder_class(builder_entry)
+        return self._builders_classes
+
     def get_preview_builder(self, mimetype: str) -> PreviewBuilder:
 
         if not self.builders_loaded:
             raise BuilderNotLoaded()
 
         try:
-            return self._builder_classes[mimetype]()  # nopep8 get class and instantiate it
+            return self.get_builder_class(mimetype).get_instance()  # type: ignore
         except KeyError:
             raise UnsupportedMimeType("Unsupported mimetype: {}".format(mimetype))
 
     def get_file_mimetype(self, file_path: str, file_ext: str = "") -> str:
         """
         return the mimetype of the file. see python module mimetype
+        Detected mimetypes are kept in memory until the file changes.
         """
         assert file_ext == "" or file_ext.startswith("."), 'File extension must starts with ".""'
         # INFO - B.L - 2018/10/11 - If user force the file extension we do.
-        first_path = file_path + file_ext if file_ext else file_path
-        str_, encoding = mimetypes_storage.guess_type(first_path, strict=False)
-
-        if not str_ or str_ == "application/octet-stream":
-            mime = magic.Magic(mime=True)
-            str_ = mime.from_file(file_path)
+        return get_file_mimetype(file_path, file_ext)
 
-        if str_ and (str_ in AMBIGUOUS_MIMES):
-            raw_mime = Popen(
-                ["mimetype", "--output-format", "%m", file_path],
-                stdin=PIPE,
-                stdout=PIPE,
-                stderr=PIPE,
-            ).communicate()[0]
-            str_ = raw_mime.decode("utf-8").replace("\n", "")
-
-        if not str_:
-            # Should never happen.
-            raise ValueError("Cannot determine the type of " + file_path)
-
-        return str_
+    def get_content_mimetype(self, file_content: FileContent, file_ext: str = "") -> str:
+        """
+        return the mimetype of a file given by its content.
+        """
+        assert file_ext == "" or file_ext.startswith("."), 'File extension must starts with ".""'
+        return detect_content_mimetype(file_content.get_head(), file_content.path)
 
     def load_builders(self, force: bool = False) -> None:
         """
-        Loads all builders found in preview_generator.preview.builder module
+        Loads all builders found in preview_generator.preview.builder module.
+        If the builder registry is valid (see builder_registry), builders are registered
+        from it and their module is imported on first use. force loads all builders.
         :return: None
         """
         if force or not self.builders_loaded:
             builder_folder = get_builder_folder_name()
             builder_modules = get_builder_modules(builder_folder)
+            modules_signature = get_modules_signature(builder_folder, builder_modules)
+            builder_entries = None if force else read_builder_registry(modules_signature)
+            if builder_entries is not None:
+                self._register_builder_entries(builder_entries)
+                self.builders_loaded = True
+                return
+
             for module_name in builder_modules:
                 try:
                     import_builder_module(module_name)
@@ -103,15 +112,77 @@ class PreviewBuilderFactory(object):
                 get_subclasses_recursively(PreviewBuilder), key=lambda x: x.weight, reverse=True
             )
 
+            builder_entries = []
             for cls in builders:
                 if is_abstract(cls):
                     # INFO - G.M - 2021-06-22 - Skip abstract classes from loaded builders
                     pass
-                else:
-                    self.register_builder(cls, overwrite=False)
+                elif self.register_builder(cls, overwrite=False):
+                    builder_entry = get_builder_entry(cls)
+                    if builder_entry:
+                        builder_entries.append(builder_entry)
 
+            write_builder_registry(builder_entries, modules_signature)
             self.builders_loaded = True
 
+    def _register_builder_entries(self, builder_entries: typing.List[BuilderEntry]) -> None:
+        """
+        Register builders of the builder registry without importing them. Builders defined
+        out of the builder package and already imported (eg. by the application) are
+        registered too, in weight order.
+        """
+        builder_class_names = {entry.class_name for entry in builder_entries}
+        builders = [
+            (entry.weight, entry) for entry in builder_entries
+        ]  # type: typing.List[typing.Tuple[int, typing.Any]]
+        for cls in get_subclasses_recursively(PreviewBuilder):
+            if (
+                not is_abstract(cls)
+                and not cls.__module__.startswith(BUILDER_PACKAGE + ".")
+                and cls.__name__ not in builder_class_names
+            ):
+                builders.append((cls.weight, cls))
+        builders.sort(key=lambda builder: builder[0], reverse=True)
+
+        for _, builder in builders:
+            if not isinstance(builder, BuilderEntry):
+                self.register_builder(builder, overwrite=False)
+                continue
+            self._registered_builder_entries.append(builder)
+            for mimetype, file_extension in builder.mimetypes_mapping:
+                # INFO - same as PreviewBuilder.update_mimetypes_mapping
+                mimetypes_storage.add_type(  # type: ignore
+                    type=mimetype, ext=file_extension, strict=True
+                )
+            for mimetype in builder.mimetypes:
+                if mimetype not in self._builder_classes and mimetype not in self._builder_entries:
+                    self._builder_entries[mimetype] = builder
+
+    def _import_builder_class(self, builder_entry: BuilderEntry) -> type:
+        with self._import_lock:
+            try:
+                module = importlib.import_module(
+                    "{}.{}".format(BUILDER_PACKAGE, builder_entry.module_name)
+                )
+                builder_class = getattr(module, builder_entry.class_name)  # type: type
+            except Exception:
+                # INFO - eg. a dependency removed since the registry was written
+                self.logger.critical(
+                    "Builder {} failed to be loaded, the builder registry is reset".format(
+                        builder_entry.class_name
+                    )
+                )
+                remove_builder_registry()
+                raise
+            if builder_entry in self._registered_builder_entries:
+                for mimetype, entry in list(self._builder_entries.items()):
+                    if entry is builder_entry:
+                        self._builder_classes[mimetype] = builder_class
+                        del self._builder_entries[mimetype]
+                self._registered_builder_entries.remove(builder_entry)
+                self._builders_classes.append(builder_class)
+            return builder_class
+
     @classmethod
     def get_instance(cls) -> "PreviewBuilderFactory":
         # INFO - G.M - 2018-11-07 - lock to prevent case when
@@ -125,11 +196,14 @@ class PreviewBuilderFactory(object):
 
     def register_builder(
         self, builder: typing.Type["PreviewBuilder"], overwrite: bool = False
-    ) -> None:
+    ) -> bool:
+        """
+        :return: True if the builder is registered, False if a dependency is missing
+        """
         try:
             builder.check_dependencies()
             builder.update_mimetypes_mapping()
-            self.builders_classes.append(builder)
+            self._builders_classes.append(builder)
             # FIXME - G.M - 2018-10-18 - Fix issue with application/octet-stream
             # and builder which happened in some conditions
             # like automatic travis test with Ubuntu 14.04.5 LTS,
@@ -142,7 +216,9 @@ class PreviewBuilderFactory(object):
                         "register builder for {}: {} - SKIPPED".format(mimetype, builder.__name__)
                     )
                 else:
-                    if not overwrite and self._builder_classes.get(mimetype):
+                    if not overwrite and (
+                        self._builder_classes.get(mimetype) or mimetype in self._builder_entries
+                    ):
                         self.logger.debug(
                             "builder for {} already exist, do not handle it with {}".format(
                                 mimetype, builder.__name__
@@ -150,9 +226,11 @@ class PreviewBuilderFactory(object):
                         )
                     else:
                         self._builder_classes[mimetype] = builder
+                        self._builder_entries.pop(mimetype, None)
                         self.logger.debug(
                             "register builder for {}: {}".format(mimetype, builder.__name__)
                         )
+            return True
         except BuilderDependencyNotFound as e:
             self.logger.error("Builder {} is missing a dependency: {}".format(builder, e.__str__()))
         except NotImplementedError:
@@ -160,13 +238,16 @@ class PreviewBuilderFactory(object):
                 "Skipping builder class [{}]: method get_supported_mimetypes "
                 "is not implemented".format(builder)
             )
+        return False
 
     def get_supported_mimetypes(self) -> typing.List[str]:
         """
         Return the list of supported mimetypes.
         :return:
         """
-        return [mime for mime in self._builder_classes.keys()]
+        return [mime for mime in self._builder_classes.keys()] + [
+            mime for mime in self._builder_entries.keys()
+        ]
 
     def get_builder_class(self, mime: str) -> type:
         """
@@ -174,6 +255,9 @@ class PreviewBuilderFactory(object):
         :param mime: the mimetype. Eg image/jpeg
         :return:
         """
+        builder_entry = self._builder_entries.get(mime)
+        if mime not in self._builder_classes and builder_entry:
+            return self._import_builder_class(builder_entry)
         return self._builder_classes[mime]
 
 
@@ -199,6 +283,31 @@ def get_builder_modules(builder_folder: str) -> typing.List[str]:
     return module_names
 
 
+def get_builder_entry(builder: typing.Type[PreviewBuilder]) -> typing.Optional[BuilderEntry]:
+    """
+    :return: builder registry entry of a builder of the builder package, None for other builders
+    """
+    module_name = builder.__module__
+    package_prefix = BUILDER_PACKAGE + "."
+    if not module_name.startswith(package_prefix):
+        return None
+    prefix_length = len(package_prefix)
+    return BuilderEntry(
+        module_name=module_name[prefix_length:],
+        class_name=builder.__name__,
+        weight=builder.weight,
+        mimetypes=[
+            mimetype
+            for mimetype in builder.get_supported_mimetypes()
+            if mimetype != "application/octet-stream"
+        ],
+        mimetypes_mapping=[
+            (mapping.mimetype, mapping.file_extension)
+            for mapping in builder.get_mimetypes_mapping()
+        ],
+    )
+
+
 def import_builder_module(name: str) -> None:
     logger = logging.getLogger(LOGGER_NAME)
     logger.debug("Builder module loading: {}".format(name))
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk registry of available builders, used by the PreviewBuilderFactory to start without
+importing builder modules.
+
+Loading all builders imports heavy libraries (vtk, wand, rawpy, …) and probes their
+dependencies (executables lookup, ImageMagick formats enumeration, …). The result of this
+loading (builders whose dependencies are found, with their mimetypes and weight) is written
+to a json file. While this file is valid, the factory registers builders from it and only
+imports the module of a builder when a preview of one of its mimetypes is requested.
+
+The registry is invalidated when its TTL expires (eg. after the installation of a new
+dependency), when the version of preview_generator or python changes and when a builder
+module is modified.
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import typing
+
+from preview_generator.infos import __version__
+from preview_generator.utils import LOGGER_NAME
+from preview_generator.utils import atomic_output_path
+
+BUILDER_PACKAGE = "preview_generator.preview.builder"
+BUILDER_REGISTRY_PATH = os.getenv(
+    "PREVIEW_GENERATOR_BUILDER_REGISTRY_PATH",
+    os.path.join(tempfile.gettempdir(), "preview-generator-builders-{}.json".format(os.getuid())),
+)
+# INFO - validity of the registry in seconds, 0 disables the registry
+BUILDER_REGISTRY_TTL = float(os.getenv("PREVIEW_GENERATOR_BUILDER_REGISTRY_TTL", "86400"))
+
+
+class BuilderEntry(object):
+    def __init__(
+        self,
+        module_name: str,
+        class_name: str,
+        weight: int,
+        mimetypes: typing.List[str],
+        mimetypes_mapping: typing.List[typing.Tuple[str, str]],
+    ) -> None:
+        """
+        :param module_name: name of the builder module in BUILDER_PACKAGE, eg "image__wand"
+        :param mimetypes_mapping: (mimetype, file extension) specific to the builder
+        """
+        self.module_name = module_name
+        self.class_name = class_name
+        self.weight = weight
+        self.mimetypes = mimetypes
+        self.mimetypes_mapping = mimetypes_mapping
+
+    def to_dict(self) -> dict:
+        return {
+            "module_name": self.module_name,
+            "class_name": self.class_name,
+            "weight": self.weight,
+            "mimetypes": self.mimetypes,
+            "mimetypes_mapping": self.mimetypes_mapping,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BuilderEntry":
+        return cls(
+            module_name=data["module_name"],
+            class_name=data["class_name"],
+            weight=data["weight"],
+            mimetypes=data["mimetypes"],
+            mimetypes_mapping=[(mimetype, ext) for mimetype, ext in data["mimetypes_mapping"]],
+        )
+
+
+def get_modules_signature(builder_folder: str, module_names: typing.List[str]) -> typing.List:
+    """
+    :return: (module name, modification time) of builder modules
+    """
+    return [
+        [module_name, os.stat(os.path.join(builder_folder, module_name + ".py")).st_mtime_ns]
+        for module_name in sorted(module_names)
+    ]
+
+
+def read_builder_registry(
+    modules_signature: typing.List,
+    registry_path: str = BUILDER_REGISTRY_PATH,
+    ttl: float = BUILDER_REGISTRY_TTL,
+) -> typing.Optional[typing.List[BuilderEntry]]:
+    """
+    :return: builder entries, in registration order, or None if there is no valid registry
+    """
+    if ttl <= 0:
+        return None
+    try:
+        with open(registry_path) as registry_file:
+            registry = json.load(registry_file)
+    except (OSError, ValueError):
+        return None
+    if (
+        registry.get("version") != __version__
+        or registry.get("python_version") != list(sys.version_info[:2])
+        or registry.get("modules_signature") != modules_signature
+        or time.time() - registry.get("created", 0) > ttl
+    ):
+        return None
+    try:
+        return [BuilderEntry.from_dict(entry) for entry in registry["builders"]]
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def write_builder_registry(
+    builder_entries: typing.List[BuilderEntry],
+    modules_signature: typing.List,
+    registry_path: str = BUILDER_REGISTRY_PATH,
+    ttl: float = BUILDER_REGISTRY_TTL,
+) -> None:
+    if ttl <= 0:
+        return
+    registry = {
+        "version": __version__,
+        "python_version": list(sys.version_info[:2]),
+        "modules_signature": modules_signature,
+        "created": time.time(),
+        "builders": [entry.to_dict() for entry in builder_entries],
+    }
+    try:
+        with atomic_output_path(registry_path) as output_path:
+            with open(output_path, "w") as registry_file:
+                json.dump(registry, registry_file)
+    except OSError as exc:
+        # INFO - eg. read-only file system: builders are just loaded again next time
+        logging.getLogger(LOGGER_NAME).warning(
+            "Builder registry {} can't be written: {}".format(registry_path, exc)
+        )
+
+
+def remove_builder_registry(registry_path: str = BUILDER_REGISTRY_PATH) -> None:
+    try:
+        os.remove(registry_path)
+    except FileNotFoundError:
+        pass
@@ -2,25 +2,58 @@
 from abc import ABC
 import json
 import logging
+from threading import RLock
 import typing
 
 import pyexifinfo
 
 from preview_generator.exception import UnavailablePreviewType
 from preview_generator.extension import mimetypes_storage
+from preview_generator.utils import DocumentMetadata
 from preview_generator.utils import ImgDims
 from preview_generator.utils import LOGGER_NAME
 from preview_generator.utils import MimetypeMapping
+from preview_generator.utils import atomic_output_path
+
+PB = typing.TypeVar("PB", bound="PreviewBuilder")
 
 
 class PreviewBuilder(ABC):
+    """
+    Base class of builders. Previews must be written atomically to their cache path, eg. with
+    utils.atomic_output_path, as the manager returns existing previews without locking.
+
+    Builders are shared by all requests and threads (see get_instance): they must not keep
+    state related to a preview in their attributes.
+    """
+
     default_size = ImgDims(256, 256)
     weight = 999
+    # INFO - set to True if computing document metadata is expensive, so that the manager
+    # keeps it in the cache index
+    cache_document_metadata = False
+
+    _instances = {}  # type: typing.Dict[type, PreviewBuilder]
+    _instances_lock = RLock()
 
     def __init__(self) -> None:
         self.logger = logging.getLogger(LOGGER_NAME)
         self.logger.info("New Preview builder of class" + str(self.__class__))
 
+    @classmethod
+    def get_instance(cls: typing.Type[PB]) -> PB:
+        """
+        :return: the shared instance of this builder class, created on first call
+        """
+        instance = PreviewBuilder._instances.get(cls)
+        if instance is None:
+            with PreviewBuilder._instances_lock:
+                instance = PreviewBuilder._instances.get(cls)
+                if instance is None:
+                    instance = cls()
+                    PreviewBuilder._instances[cls] = instance
+        return instance  # type: ignore
+
     @classmethod
     def get_supported_mimetypes(cls) -> typing.List[str]:
         raise NotImplementedError()
@@ -74,6 +107,16 @@ class PreviewBuilder(ABC):
         """
         raise UnavailablePreviewType()
 
+    def get_document_metadata(
+        self, file_path: str, preview_name: str, cache_path: str, mimetype: str = ""
+    ) -> DocumentMetadata:
+        """
+        Get metadata of the document: number of pages and, if available, size of pages
+        """
+        return DocumentMetadata(
+            page_nb=self.get_page_number(file_path, preview_name, cache_path, mimetype)
+        )
+
     def build_jpeg_preview(
         self,
         file_path: str,
@@ -89,6 +132,58 @@ class PreviewBuilder(ABC):
         """
         raise UnavailablePreviewType()
 
+    def build_jpeg_previews(
+        self,
+        file_path: str,
+        preview_names: typing.Dict[int, str],
+        cache_path: str,
+        extension: str = ".jpg",
+        size: ImgDims = None,
+        mimetype: str = "",
+    ) -> None:
+        """
+        generate the jpg preview of several pages.
+        Default implementation generates pages one by one, override it if your builder
+        is able to render several pages at once.
+        :param preview_names: preview name of each requested page, by page id
+        """
+        for page_id, preview_name in preview_names.items():
+            self.build_jpeg_preview(
+                file_path=file_path,
+                preview_name=preview_name,
+                cache_path=cache_path,
+                page_id=page_id,
+                extension=extension,
+                size=size,
+                mimetype=mimetype,
+            )
+
+    def build_jpeg_preview_sizes(
+        self,
+        file_path: str,
+        preview_names: typing.List[typing.Tuple[ImgDims, str]],
+        cache_path: str,
+        page_id: int,
+        extension: str = ".jpg",
+        mimetype: str = "",
+    ) -> None:
+        """
+        generate the jpg preview of a page in several sizes.
+        Default implementation generates sizes one by one, override it if your builder
+        is able to produce all sizes from a single decoding of the file.
+        :param preview_names: (size, preview name) of each requested preview
+        """
+        for size, preview_name in preview_names:
+            self.build_jpeg_preview(
+                file_path=file_path,
+                preview_name=preview_name,
+                cache_path=cache_path,
+                page_id=page_id,
+                extension=extension,
+                size=size,
+                mimetype=mimetype,
+            )
+
     def has_pdf_preview(self) -> bool:
         """
         Override and return True if your builder allow PDF preview
@@ -157,8 +252,9 @@ class PreviewBuilder(ABC):
         """
         metadata = pyexifinfo.get_json(file_path)[0]
 
-        with open(cache_path + preview_name + extension, "w") as jsonfile:
-            json.dump(metadata, jsonfile)
+        with atomic_output_path(cache_path + preview_name + extension) as output_path:
+            with open(output_path, "w") as jsonfile:
+                json.dump(metadata, jsonfile)
 
     def build_text_preview(
         self,
@@ -173,6 +269,48 @@ class PreviewBuilder(ABC):
         """
         raise UnavailablePreviewType()
 
+    # INFO - *_from_content methods build previews of a file given as bytes. Override them if
+    # your builder is able to decode files from memory. Default implementation raises
+    # NotImplementedError: the manager then writes the content to a file and uses build_*.
+    def build_jpeg_preview_from_content(
+        self,
+        file_content: bytes,
+        preview_name: str,
+        cache_path: str,
+        page_id: int,
+        extension: str = ".jpg",
+        size: ImgDims = None,
+        mimetype: str = "",
+    ) -> None:
+        """
+        generate the jpg preview of a file given as bytes
+        """
+        raise NotImplementedError()
+
+    def build_html_preview_from_content(
+        self, file_content: bytes, preview_name: str, cache_path: str, extension: str = ".html"
+    ) -> None:
+        """
+        generate the html preview of a file given as bytes
+        """
+        raise NotImplementedError()
+
+    def build_json_preview_from_content(
+        self, file_content: bytes, preview_name: str, cache_path: str, extension: str = ".json"
+    ) -> None:
+        """
+        generate the json preview of a file given as bytes
+        """
+        raise NotImplementedError()
+
+    def build_text_preview_from_content(
+        self, file_content: bytes, preview_name: str, cache_path: str, extension: str = ".txt"
+    ) -> None:
+        """
+        generate the text preview of a file given as bytes
+        """
+        raise NotImplementedError()
+
 
 class OnePagePreviewBuilder(PreviewBuilder, ABC):
     """
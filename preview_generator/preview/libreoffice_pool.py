@@ -0,0 +1,492 @@
+# -*- coding: utf-8 -*-
+"""
+Pool of LibreOffice workers used to convert office documents to pdf.
+
+Each worker owns its own LibreOffice user profile (UserInstallation) so that
+several conversions can run concurrently. When the python UNO bridge is available,
+workers keep a headless soffice instance running and send it conversion jobs through
+a pipe listener, which avoids paying LibreOffice startup for each document.
+Otherwise, each job spawns a `libreoffice --headless --convert-to` process.
+"""
+
+import atexit
+import contextlib
+import functools
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+from subprocess import CalledProcessError
+from subprocess import DEVNULL
+from subprocess import Popen
+from subprocess import STDOUT
+from subprocess import TimeoutExpired
+from subprocess import check_output
+import threading
+import time
+import typing
+
+from filelock import FileLock
+from filelock import Timeout
+
+from preview_generator.process import kill_process_group
+from preview_generator.process import track_process
+from preview_generator.utils import LOCKFILE_EXTENSION
+from preview_generator.utils import LOGGER_NAME
+
+uno_installed = True
+try:
+    from com.sun.star.beans import PropertyValue
+    from com.sun.star.connection import NoConnectException
+    import uno
+except ImportError:
+    uno_installed = False
+
+LIBREOFFICE_EXECUTABLE = "libreoffice"
+LIBREOFFICE_LOCK_NAME = "libreoffice"
+PDF_FILTER_NAME = "writer_pdf_Export"
+DEFAULT_INFILTER_BY_MIMETYPE = {"text/html": "writerglobal8_HTML"}
+# INFO - pdf export filter to use according to the type of document loaded through UNO
+PDF_FILTER_BY_DOCUMENT_SERVICE = (
+    ("com.sun.star.sheet.SpreadsheetDocument", "calc_pdf_Export"),
+    ("com.sun.star.presentation.PresentationDocument", "impress_pdf_Export"),
+    ("com.sun.star.drawing.DrawingDocument", "draw_pdf_Export"),
+    ("com.sun.star.text.GenericTextDocument", PDF_FILTER_NAME),
+)
+WORKER_STARTUP_TIMEOUT = 30
+# INFO - pdf export option limiting the exported pages, eg. "1-3"
+PDF_PAGE_RANGE_OPTION = "PageRange"
+# INFO - json filter options of --convert-to, used to export page ranges, require this version
+JSON_FILTER_OPTIONS_MIN_VERSION = (7, 4)
+
+
+def _get_env_number(name: str, default: str) -> float:
+    env_var = os.getenv(name, default)
+    try:
+        return float(env_var)
+    except ValueError:
+        raise ValueError(
+            "Invalid value for {}: it should be a number, got {}".format(name, env_var)
+        )
+
+
+# NOTE - SG - 20210420 - The default timeout value is 60 seconds and can be overridden
+# by the LIBREOFFICE_PROCESS_TIMEOUT variable.
+# If this variable has a value lesser or equal than 0, the timeout is disabled
+timeout_from_var = _get_env_number("LIBREOFFICE_PROCESS_TIMEOUT", "60")
+if timeout_from_var > 0:
+    LIBREOFFICE_PROCESS_TIMEOUT = timeout_from_var  # type: typing.Optional[float]
+else:
+    LIBREOFFICE_PROCESS_TIMEOUT = None
+
+# INFO - number of concurrent LibreOffice conversions allowed for a cache folder,
+# one per cpu by default.
+LIBREOFFICE_WORKERS = max(int(_get_env_number("LIBREOFFICE_WORKERS", str(os.cpu_count() or 1))), 1)
+# INFO - max time (in seconds) to wait for an idle worker. By default, it depends on the
+# number of conversions queued before the request and on LIBREOFFICE_PROCESS_TIMEOUT
+# (no limit if the process timeout is disabled).
+LIBREOFFICE_QUEUE_TIMEOUT = _get_env_number("LIBREOFFICE_QUEUE_TIMEOUT", "0")
+# INFO - a persistent worker is restarted after this number of jobs to avoid
+# memory leaks or corrupted state of a long running LibreOffice instance.
+LIBREOFFICE_WORKER_MAX_JOBS = max(int(_get_env_number("LIBREOFFICE_WORKER_MAX_JOBS", "100")), 1)
+# INFO - persistent workers are opt-in, they require the UNO bridge
+LIBREOFFICE_PERSISTENT_WORKERS = os.getenv("LIBREOFFICE_PERSISTENT_WORKERS", "0") == "1"
+if LIBREOFFICE_PERSISTENT_WORKERS and not uno_installed:
+    logging.getLogger(LOGGER_NAME).warning(
+        "LIBREOFFICE_PERSISTENT_WORKERS is set but the python UNO bridge is not available, "
+        "a LibreOffice process is spawned for each conversion"
+    )
+    LIBREOFFICE_PERSISTENT_WORKERS = False
+
+
+def parse_libreoffice_version(version_output: str) -> typing.Tuple[int, ...]:
+    """
+    >>> parse_libreoffice_version("LibreOffice 7.3.7.2 30(Build:2)")
+    (7, 3, 7, 2)
+    >>> parse_libreoffice_version("unknown")
+    ()
+    """
+    match = re.search(r"\d+(\.\d+)+", version_output)
+    if not match:
+        return ()
+    return tuple(int(number) for number in match.group(0).split("."))
+
+
+@functools.lru_cache(maxsize=None)
+def get_libreoffice_version() -> typing.Tuple[int, ...]:
+    """
+    :return: version of the LibreOffice executable, empty if it is unknown
+    """
+    try:
+        version_output = check_output(
+            [LIBREOFFICE_EXECUTABLE, "--version"], stderr=DEVNULL, universal_newlines=True
+        )
+    except (OSError, CalledProcessError):
+        return ()
+    return parse_libreoffice_version(version_output)
+
+
+def _get_stop_timeout(process_timeout: typing.Optional[float]) -> typing.Optional[float]:
+    if process_timeout is not None:
+        return process_timeout / 10
+    return None
+
+
+class LibreofficeWorker(object):
+    """
+    One conversion slot. A slot has its own LibreOffice profile and a file lock
+    so that a profile is never used by two LibreOffice processes at the same time.
+    """
+
+    def __init__(self, cache_path: str, slot: int, persistent: bool) -> None:
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.cache_path = cache_path
+        self.slot = slot
+        self.persistent = persistent
+        cache_path_hash = hashlib.md5(cache_path.encode("utf-8")).hexdigest()
+        profile_name = "LibreOffice-conversion-{}".format(cache_path_hash)
+        if slot:
+            profile_name += "-{}".format(slot)
+        if persistent:
+            # INFO - persistent instances are owned by this process only
+            profile_name += "-{}".format(os.getpid())
+        self.profile_path = os.path.join("/tmp", profile_name)
+        self.pipe_name = "preview-generator-{}".format(profile_name)
+        self.job_nb = 0
+        self.process = None  # type: typing.Optional[Popen]
+        self._desktop = None  # type: typing.Any
+
+    def get_lock(self, timeout: typing.Optional[float] = None) -> FileLock:
+        """
+        :param timeout: max time to wait for the lock, no limit if None
+        """
+        lock_name = LIBREOFFICE_LOCK_NAME
+        if self.slot:
+            lock_name += "-{}".format(self.slot)
+        file_lock_path = os.path.join(self.cache_path, lock_name + LOCKFILE_EXTENSION)
+        return FileLock(file_lock_path, timeout=-1 if timeout is None else timeout)
+
+    def convert(
+        self,
+        input_path: str,
+        output_dir: str,
+        output_filepath: str,
+        infilter: str,
+        page_range: str = "",
+    ) -> None:
+        """
+        Convert input_path to pdf. Spawned workers write the result in output_dir
+        with a name derived from the input name, persistent workers write output_filepath.
+        :param page_range: pages to export, eg. "1-3". All pages are exported if empty
+        """
+        if self.persistent:
+            self._convert_with_instance(input_path, output_filepath, infilter, page_range)
+        else:
+            self._convert_with_process(input_path, output_dir, infilter, page_range)
+
+    def _get_profile_arg(self) -> str:
+        return "-env:UserInstallation=file://{}".format(self.profile_path)
+
+    def _convert_with_process(
+        self, input_path: str, output_dir: str, infilter: str, page_range: str = ""
+    ) -> None:
+        output_filter = "pdf:{}".format(PDF_FILTER_NAME)
+        if page_range and get_libreoffice_version() < JSON_FILTER_OPTIONS_MIN_VERSION:
+            # INFO - older versions can not be given the page range: export all pages, which
+            # still gives the requested first pages
+            page_range = ""
+        if page_range:
+            output_filter += ":" + json.dumps(
+                {PDF_PAGE_RANGE_OPTION: {"type": "string", "value": page_range}}
+            )
+        process = Popen(
+            [
+                LIBREOFFICE_EXECUTABLE,
+                "--headless",
+                "-infilter={}".format(infilter) if infilter else "",
+                "--convert-to",
+                output_filter,
+                input_path,
+                "--outdir",
+                output_dir,
+                self._get_profile_arg(),
+            ],
+            stdout=DEVNULL,
+            stderr=STDOUT,
+            start_new_session=True,
+        )
+        try:
+            with track_process(process):
+                process.communicate(timeout=LIBREOFFICE_PROCESS_TIMEOUT)
+        except BaseException:
+            # INFO - SG - 2021-04-16
+            # we waited long enough (or we got another exception), give a little time to the process
+            # to exit cleanly
+            self.logger.warning(
+                "The preview generation for {} took too long, try aborting it".format(input_path)
+            )
+            kill_process_group(process, _get_stop_timeout(LIBREOFFICE_PROCESS_TIMEOUT))
+            raise
+
+    def is_alive(self) -> bool:
+        """
+        Health check of the persistent instance: process running and UNO bridge responding.
+        """
+        if self.process is None or self.process.poll() is not None or self._desktop is None:
+            return False
+        try:
+            self._desktop.getComponents()
+        except Exception:
+            return False
+        return True
+
+    def start(self) -> None:
+        self.stop()
+        self.process = Popen(
+            [
+                LIBREOFFICE_EXECUTABLE,
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--norestore",
+                "--nodefault",
+                "--accept=pipe,name={};urp;StarOffice.ComponentContext".format(self.pipe_name),
+                self._get_profile_arg(),
+            ],
+            stdout=DEVNULL,
+            stderr=STDOUT,
+            start_new_session=True,
+        )
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        connection_url = "uno:pipe,name={};urp;StarOffice.ComponentContext".format(self.pipe_name)
+        deadline = time.monotonic() + WORKER_STARTUP_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(connection_url)
+                break
+            except NoConnectException:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise TimeoutExpired(LIBREOFFICE_EXECUTABLE, WORKER_STARTUP_TIMEOUT)
+                time.sleep(0.1)
+        self._desktop = context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", context
+        )
+        self.job_nb = 0
+        self.logger.info(
+            "LibreOffice worker {} started (pid {})".format(self.slot, self.process.pid)
+        )
+
+    def stop(self) -> None:
+        self._desktop = None
+        if self.process is not None:
+            if self.process.poll() is None:
+                kill_process_group(self.process, _get_stop_timeout(LIBREOFFICE_PROCESS_TIMEOUT))
+            self.process = None
+
+    def _convert_with_instance(
+        self, input_path: str, output_filepath: str, infilter: str, page_range: str = ""
+    ) -> None:
+        if self.job_nb >= LIBREOFFICE_WORKER_MAX_JOBS or not self.is_alive():
+            self.start()
+        self.job_nb += 1
+
+        process = typing.cast(Popen, self.process)
+        timed_out = threading.Event()
+
+        def on_hang() -> None:
+            timed_out.set()
+            self.logger.warning(
+                "The preview generation for {} took too long, restarting worker {}".format(
+                    input_path, self.slot
+                )
+            )
+            kill_process_group(process, _get_stop_timeout(LIBREOFFICE_PROCESS_TIMEOUT))
+
+        watchdog = None  # type: typing.Optional[threading.Timer]
+        if LIBREOFFICE_PROCESS_TIMEOUT is not None:
+            watchdog = threading.Timer(LIBREOFFICE_PROCESS_TIMEOUT, on_hang)
+            watchdog.daemon = True
+            watchdog.start()
+
+        document = None
+        try:
+            # INFO - the instance is shared by the requests of all callers, it is not registered
+            # in the process group of the request: cancelling a request does not kill it, the
+            # running job ends (or is stopped by the watchdog) before the worker takes the next one
+            load_properties = [_property_value("Hidden", True)]
+            if infilter:
+                load_properties.append(_property_value("FilterName", infilter))
+            document = self._desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(input_path), "_blank", 0, tuple(load_properties)
+            )
+            if document is None:
+                raise ValueError("LibreOffice is not able to load {}".format(input_path))
+            store_properties = [_property_value("FilterName", _get_pdf_filter_name(document))]
+            if page_range:
+                filter_data = uno.Any(
+                    "[]com.sun.star.beans.PropertyValue",
+                    (_property_value(PDF_PAGE_RANGE_OPTION, page_range),),
+                )
+                store_properties.append(_property_value("FilterData", filter_data))
+            # INFO - uno.invoke is required to give FilterData as a typed sequence
+            uno.invoke(
+                document,
+                "storeToURL",
+                (uno.systemPathToFileUrl(output_filepath), tuple(store_properties)),
+            )
+        except Exception:
+            if timed_out.is_set():
+                self.stop()
+                raise TimeoutExpired(LIBREOFFICE_EXECUTABLE, LIBREOFFICE_PROCESS_TIMEOUT or 0)
+            # INFO - the worker may be in a bad state, restart it for next job
+            self.stop()
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            if document is not None:
+                with contextlib.suppress(Exception):
+                    document.close(True)
+
+
+def _property_value(name: str, value: typing.Any) -> "PropertyValue":
+    property_value = PropertyValue()
+    property_value.Name = name
+    property_value.Value = value
+    return property_value
+
+
+def _get_pdf_filter_name(document: typing.Any) -> str:
+    for service_name, filter_name in PDF_FILTER_BY_DOCUMENT_SERVICE:
+        if document.supportsService(service_name):
+            return filter_name
+    return PDF_FILTER_NAME
+
+
+class LibreofficeWorkerPool(object):
+    """
+    Dispatch conversion jobs to LIBREOFFICE_WORKERS workers.
+    """
+
+    def __init__(
+        self,
+        cache_path: str,
+        worker_nb: int = LIBREOFFICE_WORKERS,
+        persistent: bool = LIBREOFFICE_PERSISTENT_WORKERS,
+    ) -> None:
+        self.cache_path = cache_path
+        self.workers = [
+            LibreofficeWorker(cache_path, slot, persistent) for slot in range(worker_nb)
+        ]
+        self._idle_workers = list(self.workers)
+        self._waiting_nb = 0
+        self._condition = threading.Condition()
+
+    def get_queue_timeout(self, queued_nb: int) -> typing.Optional[float]:
+        """
+        :param queued_nb: number of conversions queued before the request, running ones
+        included
+        :return: max time to wait for a worker, None if there is no limit
+        """
+        if LIBREOFFICE_QUEUE_TIMEOUT > 0:
+            return LIBREOFFICE_QUEUE_TIMEOUT
+        if LIBREOFFICE_PROCESS_TIMEOUT is None:
+            return None
+        # INFO - each worker runs its queued conversions one after the other
+        return LIBREOFFICE_PROCESS_TIMEOUT * (math.ceil(queued_nb / len(self.workers)) + 1)
+
+    @contextlib.contextmanager
+    def _get_worker(self) -> typing.Generator[LibreofficeWorker, None, None]:
+        with self._condition:
+            timeout = self.get_queue_timeout(
+                len(self.workers) - len(self._idle_workers) + self._waiting_nb
+            )
+            self._waiting_nb += 1
+            try:
+                if not self._condition.wait_for(lambda: self._idle_workers, timeout):
+                    raise Timeout(self.cache_path)
+            finally:
+                self._waiting_nb -= 1
+            worker = self._idle_workers.pop(0)
+        try:
+            yield worker
+        finally:
+            with self._condition:
+                self._idle_workers.append(worker)
+                self._condition.notify()
+
+    @contextlib.contextmanager
+    def _lock_slot(
+        self, worker: LibreofficeWorker
+    ) -> typing.Generator[LibreofficeWorker, None, None]:
+        """
+        Lock the profile of a spawned worker. Spawned workers of all processes using the cache
+        folder share the same profiles: the first profile not used by another process is
+        taken, waiting for the profile of the given worker if all of them are used.
+        """
+        for slot_worker in [worker] + [other for other in self.workers if other is not worker]:
+            slot_lock = slot_worker.get_lock(timeout=0)
+            try:
+                slot_lock.acquire()
+            except Timeout:
+                continue
+            try:
+                yield slot_worker
+            finally:
+                slot_lock.release()
+            return
+        with worker.get_lock(self.get_queue_timeout(len(self.workers))):
+            yield worker
+
+    def convert(
+        self,
+        input_path: str,
+        output_dir: str,
+        output_filepath: str,
+        mimetype: str = "",
+        page_range: str = "",
+    ) -> None:
+        """
+        :param page_range: pages to export, eg. "1-3". All pages are exported if empty
+        """
+        infilter = DEFAULT_INFILTER_BY_MIMETYPE.get(mimetype, "")
+        with self._get_worker() as worker:
+            if worker.persistent:
+                # INFO - persistent worker profiles are owned by this process
+                worker.convert(input_path, output_dir, output_filepath, infilter, page_range)
+                return
+            # INFO - jumenzel - 2019-03-12 - Do not allow concurrent use of a LibreOffice
+            # profile to avoid issue, see https://github.com/algoo/preview-generator/issues/77
+            with self._lock_slot(worker) as slot_worker:
+                slot_worker.convert(input_path, output_dir, output_filepath, infilter, page_range)
+
+    def stop(self) -> None:
+        for worker in self.workers:
+            worker.stop()
+
+
+_pools = {}  # type: typing.Dict[str, LibreofficeWorkerPool]
+_pools_lock = threading.Lock()
+
+
+def get_libreoffice_pool(cache_path: str) -> LibreofficeWorkerPool:
+    """
+    Get the worker pool associated to the given cache folder.
+    """
+    with _pools_lock:
+        if cache_path not in _pools:
+            _pools[cache_path] = LibreofficeWorkerPool(cache_path)
+        return _pools[cache_path]
+
+
+@atexit.register
+def stop_libreoffice_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.stop()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers to run external programs used by builders.
+
+Programs are started in their own session (process group) and registered in the
+ProcessGroup of the current context, if any. This allows a caller (eg. the
+AsyncPreviewManager) to kill every process started for a preview when the
+preview request is cancelled.
+"""
+
+import contextlib
+import contextvars
+import logging
+import os
+import signal
+from subprocess import CalledProcessError
+from subprocess import PIPE
+from subprocess import Popen
+import threading
+import typing
+
+from preview_generator.utils import LOGGER_NAME
+
+DEFAULT_STOP_TIMEOUT = 5
+
+
+class ProcessGroup(object):
+    """
+    Set of processes started for one preview request.
+    """
+
+    def __init__(self) -> None:
+        self._processes = set()  # type: typing.Set[Popen]
+        self._lock = threading.Lock()
+        self.killed = False
+
+    def add(self, process: Popen) -> None:
+        with self._lock:
+            self._processes.add(process)
+            killed = self.killed
+        if killed:
+            # INFO - the request has been cancelled while the process was starting
+            kill_process_group(process)
+
+    def discard(self, process: Popen) -> None:
+        with self._lock:
+            self._processes.discard(process)
+
+    def kill(self) -> None:
+        with self._lock:
+            self.killed = True
+            processes = list(self._processes)
+        for process in processes:
+            kill_process_group(process)
+
+
+running_processes = contextvars.ContextVar(
+    "running_processes", default=None
+)  # type: contextvars.ContextVar[typing.Optional[ProcessGroup]]
+
+
+def kill_process_group(
+    process: Popen, stop_timeout: typing.Optional[float] = DEFAULT_STOP_TIMEOUT
+) -> None:
+    """
+    Ask the process group to terminate, then force it to stop if it does not respond in time.
+    The process must have been started in its own session (start_new_session=True).
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=stop_timeout)
+    except ProcessLookupError:
+        pass
+    except Exception:
+        # too slow to exit… let's kill
+        logger.warning("Process {} doesn't respond, force stopping it".format(process.pid))
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGKILL)
+        process.wait(timeout=stop_timeout)
+
+
+@contextlib.contextmanager
+def track_process(process: Popen) -> typing.Generator[Popen, None, None]:
+    """
+    Register the process in the process group of the current context while it runs.
+    """
+    process_group = running_processes.get()
+    if process_group is not None:
+        process_group.add(process)
+    try:
+        yield process
+    finally:
+        if process_group is not None:
+            process_group.discard(process)
+
+
+def check_call(
+    args: typing.Sequence[str], timeout: typing.Optional[float] = None, **kwargs: typing.Any
+) -> int:
+    """
+    Same as subprocess.check_call, but the process runs in its own process group which
+    is killed on timeout or if the process group of the current context is killed.
+    """
+    with Popen(args, start_new_session=True, **kwargs) as process:
+        with track_process(process):
+            try:
+                return_code = process.wait(timeout=timeout)
+            except BaseException:
+                kill_process_group(process)
+                raise
+    if return_code:
+        raise CalledProcessError(return_code, args)
+    return return_code
+
+
+def check_output(
+    args: typing.Sequence[str], timeout: typing.Optional[float] = None, **kwargs: typing.Any
+) -> typing.Any:
+    """
+    Same as subprocess.check_output, with process handling of check_call.
+    """
+    with Popen(args, stdout=PIPE, start_new_session=True, **kwargs) as process:
+        with track_process(process):
+            try:
+                output, _ = process.communicate(timeout=timeout)
+            except BaseException:
+                kill_process_group(process)
+                raise
+    if process.returncode:
+        raise CalledProcessError(process.returncode, args, output=output)
+    return output
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Layout of the beginning of plain text files (txt, xml, source code, …) as monospace lines,
+used to draw jpeg previews of text files without converting them to pdf.
+
+Only the first TEXT_PREVIEW_MAX_BYTES bytes of a file are read. Their encoding is detected
+from the byte order mark, if any, or guessed between utf-8 and cp1252.
+"""
+
+import codecs
+import os
+import re
+import typing
+
+# INFO - set to 0 to build jpeg previews of text files from their conversion to pdf by
+# LibreOffice, eg. to get previews of all pages instead of the first lines only
+TEXT_RASTERIZER_ENABLED = os.getenv("PREVIEW_GENERATOR_TEXT_RASTERIZER", "1") == "1"
+# INFO - number of lines drawn in jpeg previews of text files
+TEXT_PREVIEW_LINE_NB = int(os.getenv("PREVIEW_GENERATOR_TEXT_PREVIEW_LINES", "60"))
+TEXT_PREVIEW_MAX_BYTES = 64 * 1024
+TAB_SIZE = 4
+# INFO - byte order marks, utf-32 ones first as the utf-32-le one starts with the utf-16-le one
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# INFO - max length of an utf-8 sequence truncated by the end of the read bytes
+UTF8_MAX_SEQUENCE_LENGTH = 4
+CONTROL_CHARACTERS_PATTERN = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+
+
+def detect_encoding(data: bytes) -> str:
+    """
+    :param data: first bytes of a text file, possibly truncated in the middle of a character
+    >>> detect_encoding(codecs.BOM_UTF16_LE + "text".encode("utf-16-le"))
+    'utf-16'
+    >>> detect_encoding("é".encode("utf-8"))
+    'utf-8'
+    >>> detect_encoding("ab€".encode("utf-8")[:-1])
+    'utf-8'
+    >>> detect_encoding("café au lait".encode("cp1252"))
+    'cp1252'
+    >>> detect_encoding(b"\\x81")
+    'latin-1'
+    """
+    for byte_order_mark, encoding in BYTE_ORDER_MARKS:
+        if data.startswith(byte_order_mark):
+            return encoding
+    try:
+        data.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as exc:
+        if exc.reason == "unexpected end of data" and exc.start > len(data) - (
+            UTF8_MAX_SEQUENCE_LENGTH
+        ):
+            return "utf-8"
+    try:
+        data.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        # INFO - any byte sequence is valid latin-1
+        return "latin-1"
+
+
+def read_text_head(file_path: str, max_bytes: int = TEXT_PREVIEW_MAX_BYTES) -> str:
+    """
+    :return: text of the first max_bytes bytes of the file
+    """
+    with open(file_path, "rb") as text_file:
+        data = text_file.read(max_bytes)
+    return data.decode(detect_encoding(data), errors="replace")
+
+
+def get_text_lines(text: str, line_nb: int, column_nb: int) -> typing.List[str]:
+    """
+    :return: first line_nb lines of the text, lines longer than column_nb characters being
+    wrapped. Tabs are expanded and control characters are removed.
+    >>> get_text_lines("a\\tb\\n0123456789\\nlast", line_nb=3, column_nb=5)
+    ['a   b', '01234', '56789']
+    >>> get_text_lines("a\\tb\\n0123456789\\nlast", line_nb=10, column_nb=8)
+    ['a   b', '01234567', '89', 'last']
+    """
+    column_nb = max(column_nb, 1)
+    lines = []  # type: typing.List[str]
+    for line in text.splitlines():
+        line = CONTROL_CHARACTERS_PATTERN.sub("", line.expandtabs(TAB_SIZE))
+        lines.append(line[:column_nb])
+        for start in range(column_nb, len(line), column_nb):
+            if len(lines) >= line_nb:
+                break
+            end = start + column_nb
+            lines.append(line[start:end])
+        if len(lines) >= line_nb:
+            break
+    return lines[:line_nb]
@@ -1,12 +1,13 @@
 # -*- coding: utf-8 -*-
 from abc import ABC
+import contextlib
 from datetime import date
 from datetime import datetime
 from json import JSONEncoder
+import os
 import shutil
 import typing
-
-from wand.version import formats as wand_supported_format
+import uuid
 
 from preview_generator.extension import mimetypes_storage
 
@@ -22,6 +23,9 @@ LOCKFILE_EXTENSION = ".lock"
 # this is the default time preview Manager allow waiting for
 # the other preview to be generated.
 LOCK_DEFAULT_TIMEOUT = 20
+# INFO - previews are written to "<name>.<random hex>.tmp<extension>" next to their final path,
+# then renamed. The extension is kept as some programs choose the output format from it.
+TEMPORARY_OUTPUT_MARKER = ".tmp"
 
 
 def get_subclasses_recursively(_class: type, _seen: set = None) -> typing.Generator:
@@ -82,6 +86,26 @@ class ImgDims(object):
         return "{}x{}".format(self.width, self.height)
 
 
+class DocumentMetadata(object):
+    def __init__(
+        self,
+        page_nb: int,
+        page_sizes: typing.Optional[typing.List[typing.Tuple[float, float]]] = None,
+    ) -> None:
+        """
+        :param page_nb: number of pages of the document
+        :param page_sizes: (width, height) of each page, when known by the builder
+        """
+        self.page_nb = page_nb
+        self.page_sizes = page_sizes or []
+
+    def to_dict(self) -> dict:
+        return {"page_nb": self.page_nb, "page_sizes": self.page_sizes}
+
+    def __str__(self) -> str:
+        return "DocumentMetadata:{} pages".format(self.page_nb)
+
+
 class MimetypeMapping(object):
     def __init__(self, mimetype: str, file_extension: str) -> None:
         self.mimetype = mimetype
@@ -151,6 +175,40 @@ def executable_is_available(
     return shutil.which(executable_name) is not None
 
 
+def get_temporary_output_path(file_path: str) -> str:
+    """
+    :return: unique path, in the same folder as file_path, to write a file before renaming
+    it to file_path
+    """
+    root, extension = os.path.splitext(file_path)
+    return "{}.{}{}{}".format(root, uuid.uuid4().hex, TEMPORARY_OUTPUT_MARKER, extension)
+
+
+@contextlib.contextmanager
+def atomic_output_path(file_path: str) -> typing.Generator[str, None, None]:
+    """
+    Write a file atomically: the yielded temporary path is renamed to file_path when the
+    block succeeds, and removed otherwise. Readers of file_path see either no file or the
+    whole file, never a partially written one.
+
+    >>> with atomic_output_path("/tmp/atomic_output_path_test.txt") as tmp_path:
+    ...     with open(tmp_path, "w") as file_handle:
+    ...         _ = file_handle.write("content")
+    ...     os.path.exists("/tmp/atomic_output_path_test.txt")
+    False
+    >>> open("/tmp/atomic_output_path_test.txt").read()
+    'content'
+    """
+    temporary_path = get_temporary_output_path(file_path)
+    try:
+        yield temporary_path
+        os.replace(temporary_path, file_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temporary_path)
+        raise
+
+
 class PreviewGeneratorJsonEncoder(JSONEncoder):
     def default(self, obj: typing.Any) -> str:
         if isinstance(obj, bytes):
@@ -167,6 +225,9 @@ class PreviewGeneratorJsonEncoder(JSONEncoder):
 
 
 def imagemagick_supported_mimes() -> typing.List[str]:
+    # INFO - imported on use: loading ImageMagick is only needed by builders based on it
+    from wand.version import formats as wand_supported_format
+
     all_supported = wand_supported_format("*")
     valid_mime = []  # type: typing.List[str]
     all_imagemagick_mime_supported = []  # type: typing.List[str]
@@ -48,6 +48,7 @@ scribus_require = drawio_require = ["xvfbwrapper"]
 video_require = ["ffmpeg-python"]
 cad3d_require = ["vtk"]
 rawpy_require = ["rawpy"]
+archive_require = ["py7zr"]
 all_require = [cairo_require, scribus_require, video_require, drawio_require]
 
 extras_require = {
@@ -58,6 +59,7 @@ extras_require = {
     "3D": cad3d_require,
     "all": all_require,
     "raw": rawpy_require,
+    "7z": archive_require,
     # specials
     "testing": tests_require,
     "dev": tests_require + devtools_require,
@@ -32,3 +32,30 @@ def test_build_jpeg_preview() -> None:
     with Image.open(dest_path) as jpg:
         assert jpg.height == height
         assert jpg.width in range(288, 290)
+
+
+def test_build_jpeg_preview_sizes() -> None:
+    wand_builder = ImagePreviewBuilderWand()
+    test_orient_path = os.path.join(CURRENT_DIR, "the_img.png")
+    sizes = [ImgDims(width=128, height=64), ImgDims(width=512, height=256)]
+    wand_builder.build_jpeg_preview_sizes(
+        file_path=test_orient_path,
+        preview_names=[(size, "preview_the_img_{}".format(size)) for size in sizes],
+        cache_path=CACHE_DIR,
+        page_id=0,
+        extension=".jpg",
+    )
+    for size in sizes:
+        dest_path = os.path.join(CACHE_DIR, "preview_the_img_{}.jpg".format(size))
+        with Image.open(dest_path) as jpg:
+            assert jpg.height == size.height
+
+
+def test_load_image__shrink_on_load() -> None:
+    wand_builder = ImagePreviewBuilderWand()
+    jpeg_path = os.path.join(CURRENT_DIR, "..", "input", "jpeg", "the_jpeg.jpeg")
+    with wand_builder._load_image(jpeg_path) as full_img:
+        full_width = full_img.width
+    with wand_builder._load_image(jpeg_path, max_dim=8) as reduced_img:
+        # INFO - libjpeg can't scale below 1/8
+        assert full_width / 8 <= reduced_img.width < full_width
@@ -8,11 +8,12 @@ This is unsafe and it should not be used in production.
 To enable this builder, put it in the builder folder.
 """
 
-import sys
+import contextlib
 import typing
 
 from preview_generator.preview.generic_preview import PreviewBuilder
 from preview_generator.utils import MimetypeMapping
+from preview_generator.utils import atomic_output_path
 
 
 class CodeRunnerPreviewBuilder(PreviewBuilder):
@@ -39,12 +40,10 @@ class CodeRunnerPreviewBuilder(PreviewBuilder):
         """
         generate the text preview
         """
-        original_stdout = sys.stdout
-        sys.stdout = open(cache_path + preview_name + extension, "w")
-        with open(file_path, "rb") as f:
-            exec(f.read())
-        sys.stdout.close()
-        sys.stdout = original_stdout
+        with atomic_output_path(cache_path + preview_name + extension) as output_path:
+            with open(output_path, "w") as output, contextlib.redirect_stdout(output):
+                with open(file_path, "rb") as f:
+                    exec(f.read())
 
     def has_text_preview(self) -> bool:
         return True
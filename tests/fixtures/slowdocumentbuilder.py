@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""
+This is a test document builder. Documents are text files "converted" to pdf by copying them
+slowly, conversions are counted. It is used to test concurrent builds of document previews.
+"""
+
+from io import BytesIO
+import shutil
+import time
+import typing
+
+from preview_generator.preview.builder.document_generic import DocumentPreviewBuilder
+from preview_generator.utils import MimetypeMapping
+
+CONVERSION_DURATION = 0.5
+
+
+class SlowDocumentPreviewBuilder(DocumentPreviewBuilder):
+    conversion_nb = 0
+
+    @classmethod
+    def get_label(cls) -> str:
+        return "Slow test documents"
+
+    @classmethod
+    def check_dependencies(cls) -> None:
+        pass
+
+    @classmethod
+    def get_supported_mimetypes(cls) -> typing.List[str]:
+        return ["application/x-preview-generator-test-document"]
+
+    @classmethod
+    def get_mimetypes_mapping(cls) -> typing.List[MimetypeMapping]:
+        return [MimetypeMapping("application/x-preview-generator-test-document", ".slowdoc")]
+
+    def _convert_to_pdf(
+        self,
+        file_content: typing.IO[bytes],
+        input_extension: str,
+        cache_path: str,
+        output_filepath: str,
+        mimetype: str,
+    ) -> BytesIO:
+        SlowDocumentPreviewBuilder.conversion_nb += 1
+        time.sleep(CONVERSION_DURATION)
+        with open(output_filepath, "wb") as output_file:
+            shutil.copyfileobj(file_content, output_file)
+        return BytesIO()
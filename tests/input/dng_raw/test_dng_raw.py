@@ -11,6 +11,7 @@ import pytest
 
 from preview_generator.exception import UnavailablePreviewType
 from preview_generator.manager import PreviewManager
+from preview_generator.utils import ImgDims
 from tests import test_utils
 
 """
@@ -52,6 +53,21 @@ def test_to_jpeg() -> None:
         assert jpeg.width in range(382, 388)
 
 
+@pytest.mark.slow
+def test_to_jpeg__sizes() -> None:
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    # INFO - the largest size can't be built from the embedded preview
+    sizes = [ImgDims(width=512, height=256), ImgDims(width=6000, height=4000)]
+    paths = manager.get_jpeg_preview_sizes(file_path=IMAGE_FILE_PATH, sizes=sizes, force=True)
+
+    with Image.open(paths[0]) as jpeg:
+        assert jpeg.height == 256
+        assert jpeg.width in range(382, 388)
+    with Image.open(paths[1]) as jpeg:
+        assert jpeg.height == 4000
+        assert jpeg.width in range(5990, 6010)
+
+
 @pytest.mark.slow
 def test_get_nb_page() -> None:
     manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
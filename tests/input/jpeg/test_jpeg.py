@@ -12,6 +12,7 @@ import pytest
 
 from preview_generator.exception import UnavailablePreviewType
 from preview_generator.manager import PreviewManager
+from preview_generator.utils import ImgDims
 from tests import test_utils
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -37,6 +38,42 @@ def test_to_jpeg() -> None:
         assert jpeg.width in range(284, 286)
 
 
+def test_to_jpeg__sizes() -> None:
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    sizes = [ImgDims(width=128, height=128), ImgDims(width=512, height=256)]
+    paths = manager.get_jpeg_preview_sizes(file_path=IMAGE_FILE_PATH, sizes=sizes)
+    assert paths == [
+        manager.get_jpeg_preview(file_path=IMAGE_FILE_PATH, width=128, height=128, dry_run=True),
+        manager.get_jpeg_preview(file_path=IMAGE_FILE_PATH, width=512, height=256, dry_run=True),
+    ]
+
+    with Image.open(paths[0]) as jpeg:
+        assert jpeg.height in range(113, 116)
+        assert jpeg.width == 128
+    with Image.open(paths[1]) as jpeg:
+        assert jpeg.height == 256
+        assert jpeg.width in range(284, 286)
+
+
+def test_to_jpeg__from_content() -> None:
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    with open(IMAGE_FILE_PATH, "rb") as image_file:
+        path_to_file = manager.get_jpeg_preview_from_content(
+            image_file.read(), file_ext=".jpeg", height=256, width=512
+        )
+    assert os.path.exists(path_to_file) is True
+    assert re.match(test_utils.CACHE_FILE_PATH_PATTERN__JPEG, path_to_file)
+    with Image.open(path_to_file) as jpeg:
+        assert jpeg.height == 256
+        assert jpeg.width in range(284, 286)
+
+    # INFO - a stream of the same content gives the same preview
+    with open(IMAGE_FILE_PATH, "rb") as image_file:
+        assert path_to_file == manager.get_jpeg_preview_from_content(
+            image_file, file_ext=".jpeg", height=256, width=512, dry_run=True
+        )
+
+
 def test_get_nb_page() -> None:
     manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
     nb_page = manager.get_page_nb(file_path=IMAGE_FILE_PATH)
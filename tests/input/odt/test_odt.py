@@ -119,6 +119,16 @@ def test_to_jpeg_no_size() -> None:
         assert jpeg.width in range(180, 183)
 
 
+def test_to_jpeg__embedded_thumbnail() -> None:
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    path_to_file = manager.get_jpeg_preview(file_path=ODT_FILE_PATH, height=128, width=128)
+    with Image.open(path_to_file) as jpeg:
+        assert jpeg.height == 128
+        assert jpeg.width in range(89, 92)
+    # INFO - built from the thumbnail of the document, without converting it to pdf
+    assert not [name for name in os.listdir(CACHE_DIR) if name.endswith(".pdf")]
+
+
 def test_to_jpeg_no_page() -> None:
     manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
     assert manager.has_jpeg_preview(file_path=ODT_FILE_PATH) is True
@@ -53,3 +53,23 @@ def test_get_nb_page() -> None:
         file_path=IMAGE_FILE_PATH, cache_path=CACHE_DIR, preview_name=preview_name
     )
     assert nb_page == 10
+
+
+def test_to_jpeg__pages() -> None:
+    os.makedirs(CACHE_DIR)
+    builder = VideoPreviewBuilderFFMPEG()
+    preview_names = {
+        page_id: "ogg_theora_big_buck_bunny_trailer_test_ffmpeg_{}".format(page_id)
+        for page_id in (0, 5, 9)
+    }
+    builder.build_jpeg_previews(
+        file_path=IMAGE_FILE_PATH,
+        preview_names=preview_names,
+        cache_path=CACHE_DIR,
+        size=ImgDims(height=256, width=512),
+    )
+    for preview_name in preview_names.values():
+        with Image.open(os.path.join(CACHE_DIR, "{}.jpg".format(preview_name))) as jpeg:
+            assert jpeg.height == 256
+            assert jpeg.width == 461
+    assert len(os.listdir(CACHE_DIR)) == len(preview_names)
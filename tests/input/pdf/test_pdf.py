@@ -124,6 +124,27 @@ def test_algorithm4() -> None:
         assert jpeg.width in range(180, 183)
 
 
+def test_to_jpeg__pages_out_of_document() -> None:
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    with pytest.raises(UnavailablePreviewType):
+        manager.get_jpeg_previews(file_path=PDF_FILE_PATH, pages=[1, 2], force=True)
+    assert not os.path.exists(
+        manager.get_jpeg_preview(file_path=PDF_FILE_PATH, page=1, dry_run=True)
+    )
+    with pytest.raises(UnavailablePreviewType):
+        manager.get_jpeg_previews(file_path=PDF_FILE_PATH, pages=[5], force=True)
+
+
+def test_to_jpeg__pages_without_page_number(monkeypatch: pytest.MonkeyPatch) -> None:
+    def get_page_number(*args: typing.Any, **kwargs: typing.Any) -> int:
+        raise AssertionError("pdfinfo should not run to build previews of existing pages")
+
+    monkeypatch.setattr(PdfPreviewBuilderPopplerUtils, "get_page_number", get_page_number)
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    paths = manager.get_jpeg_previews(file_path=PDF_FILE_PATH, pages=[0, 1], force=True)
+    assert all(os.path.exists(path) for path in paths)
+
+
 def test_get_nb_page() -> None:
     manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
     nb_page = manager.get_page_nb(file_path=PDF_FILE_PATH)
@@ -132,3 +153,35 @@ def test_get_nb_page() -> None:
     assert nb_page == 2
     nb_page = manager.get_page_nb(file_path=PDF_FILE_PATH__A4)
     assert nb_page == 2
+
+
+def test_to_jpeg_previews() -> None:
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    paths = manager.get_jpeg_previews(file_path=PDF_FILE_PATH, height=512, width=321, force=True)
+    assert len(paths) == 2
+    assert paths[0] != paths[1]
+    for path_to_file in paths:
+        assert os.path.exists(path_to_file) is True
+        assert re.match(test_utils.CACHE_FILE_PATH_PATTERN_WITH_PAGE__JPEG, path_to_file)
+        with Image.open(path_to_file) as jpeg:
+            assert jpeg.height in range(453, 455)
+            assert jpeg.width == 321
+
+    assert paths[1] == manager.get_jpeg_preview(
+        file_path=PDF_FILE_PATH, page=1, height=512, width=321
+    )
+    assert manager.get_jpeg_previews(file_path=PDF_FILE_PATH, pages=[1], dry_run=True) == [
+        manager.get_jpeg_preview(file_path=PDF_FILE_PATH, page=1, dry_run=True)
+    ]
+
+
+def test_get_document_metadata() -> None:
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    metadata = manager.get_document_metadata(file_path=PDF_FILE_PATH__A4)
+    assert metadata.page_nb == 2
+    assert len(metadata.page_sizes) == 2
+    width, height = metadata.page_sizes[0]
+    assert round(width) == 595
+    assert round(height) == 842
+    # INFO - second call is served by the cache index
+    assert manager.get_page_nb(file_path=PDF_FILE_PATH__A4) == 2
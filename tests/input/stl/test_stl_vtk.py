@@ -8,6 +8,7 @@ import typing
 from PIL import Image
 import pytest
 
+from preview_generator.preview.builder import cad__vtk
 from preview_generator.preview.builder.cad__vtk import ImagePreviewBuilderVtk
 from preview_generator.utils import ImgDims
 
@@ -56,3 +57,65 @@ def test_get_nb_page() -> None:
     )
     # FIXME must add parameter force=True/False in the API
     assert nb_page == 1
+
+
+@pytest.mark.xfail(sys.version_info[:2] >= (3, 9), reason="vtk support for python 3.9+ broken")
+def test_to_jpeg__views(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cad__vtk, "VTK_VIEW_NB", 2)
+    os.makedirs(CACHE_DIR)
+    builder = ImagePreviewBuilderVtk()
+    builder.update_mimetypes_mapping()
+    assert (
+        builder.get_page_number(
+            file_path=IMAGE_FILE_PATH, cache_path=CACHE_DIR, preview_name="stl_cube_test_vtk"
+        )
+        == 2
+    )
+    builder.build_jpeg_previews(
+        file_path=IMAGE_FILE_PATH,
+        preview_names={0: "stl_cube_test_vtk_0", 1: "stl_cube_test_vtk_1"},
+        cache_path=CACHE_DIR,
+        size=ImgDims(height=256, width=256),
+    )
+    for page_id in range(2):
+        path_to_file = os.path.join(CACHE_DIR, "stl_cube_test_vtk_{}.jpg".format(page_id))
+        with Image.open(path_to_file) as jpeg:
+            assert jpeg.size == (256, 256)
+
+
+@pytest.mark.xfail(sys.version_info[:2] >= (3, 9), reason="vtk support for python 3.9+ broken")
+def test_to_jpeg__simplified_mesh(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cad__vtk, "VTK_MAX_CELLS_BY_PIXEL", 0.0001)
+    os.makedirs(CACHE_DIR)
+    builder = ImagePreviewBuilderVtk()
+    builder.update_mimetypes_mapping()
+    builder.build_jpeg_preview(
+        file_path=IMAGE_FILE_PATH,
+        size=ImgDims(height=256, width=256),
+        page_id=0,
+        cache_path=CACHE_DIR,
+        preview_name="stl_cube_test_vtk",
+    )
+    with Image.open(os.path.join(CACHE_DIR, "stl_cube_test_vtk.jpg")) as jpeg:
+        assert jpeg.size == (256, 256)
+
+
+@pytest.mark.xfail(sys.version_info[:2] >= (3, 9), reason="vtk support for python 3.9+ broken")
+def test_simplify_mesh() -> None:
+    from vtk import vtkSphereSource
+
+    sphere = vtkSphereSource()
+    sphere.SetThetaResolution(500)
+    sphere.SetPhiResolution(500)
+    sphere.Update()
+    polydata = sphere.GetOutput()
+    size = ImgDims(width=100, height=100)
+    max_cell_nb = int(size.width * size.height * cad__vtk.VTK_MAX_CELLS_BY_PIXEL)
+    assert polydata.GetNumberOfCells() > max_cell_nb
+
+    simplified_polydata = cad__vtk.simplify_mesh(polydata, size)
+    assert 0 < simplified_polydata.GetNumberOfPoints() <= max_cell_nb
+    assert simplified_polydata.GetNumberOfCells() < polydata.GetNumberOfCells()
+
+    large_size = ImgDims(width=1000, height=1000)
+    assert cad__vtk.simplify_mesh(polydata, large_size) is polydata
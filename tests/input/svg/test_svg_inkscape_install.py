@@ -1,4 +1,3 @@
-import importlib
 import typing
 import unittest.mock
 
@@ -26,9 +25,12 @@ from preview_generator.preview.builder import image__inkscape as inkscape_builde
 def test_inkscape_installation(
     side_effect: typing.Callable, inkscape_version: str, options: typing.Tuple[str, ...]
 ) -> None:
-    with unittest.mock.patch("subprocess.check_output") as check_output_mock:
+    with unittest.mock.patch.object(
+        inkscape_builder_module, "check_output"
+    ) as check_output_mock, unittest.mock.patch.object(
+        inkscape_builder_module, "_inkscape_version", None
+    ):
         check_output_mock.side_effect = side_effect
-        builder_module = importlib.reload(inkscape_builder_module)
-        builder_class = builder_module.ImagePreviewBuilderInkscape  # type: ignore
+        builder_class = inkscape_builder_module.ImagePreviewBuilderInkscape
         assert inkscape_version in builder_class.dependencies_versions()
-        assert builder_module.INKSCAPE_SVG_TO_PNG_OPTIONS == options  # type: ignore
+        assert inkscape_builder_module.get_inkscape_svg_to_png_options() == options
@@ -5,8 +5,13 @@ import shutil
 import typing
 
 import pytest
+from wand.image import Image
 
 from preview_generator.manager import PreviewManager
+from preview_generator.preview.builder import plain_text
+from preview_generator.preview.builder.plain_text import PlainTextPreviewBuilder
+from preview_generator.preview.builder.plain_text import get_text_page_dims
+from preview_generator.utils import ImgDims
 from preview_generator.utils import executable_is_available
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -32,6 +37,40 @@ def test_text_to_jpeg() -> None:
     assert os.path.getsize(path_to_file) > 0
 
 
+def test_text_to_jpeg__without_pdf() -> None:
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    path_to_file = manager.get_jpeg_preview(file_path=IMAGE_FILE_PATH, width=512, height=512)
+    assert os.path.exists(path_to_file) is True
+    # INFO - the first lines of the text are drawn, without LibreOffice conversion
+    pdf_path = manager.get_pdf_preview(file_path=IMAGE_FILE_PATH, dry_run=True)
+    assert not os.path.exists(pdf_path)
+    with Image(filename=path_to_file) as jpeg:
+        assert jpeg.height == 512
+        assert jpeg.width < 512
+
+
+def test_text_to_jpeg__sizes_of_different_ratios(monkeypatch: pytest.MonkeyPatch) -> None:
+    os.makedirs(CACHE_DIR)
+    drawn_page_dims = []  # type: typing.List[ImgDims]
+
+    def get_page_dims(sizes: typing.Iterable[ImgDims]) -> ImgDims:
+        drawn_page_dims.append(get_text_page_dims(sizes))
+        return drawn_page_dims[-1]
+
+    monkeypatch.setattr(plain_text, "get_text_page_dims", get_page_dims)
+    sizes = [ImgDims(width=1000, height=100), ImgDims(width=256, height=256)]
+    PlainTextPreviewBuilder().build_jpeg_preview_sizes_from_text(
+        IMAGE_FILE_PATH,
+        [(size, "text_{}".format(size)) for size in sizes],
+        CACHE_DIR,
+        extension=".jpeg",
+    )
+    # INFO - the page is not upscaled to the 256x256 preview
+    assert drawn_page_dims[0].height >= 256
+    with Image(filename=os.path.join(CACHE_DIR, "text_256x256.jpeg")) as jpeg:
+        assert jpeg.height == 256
+
+
 def test_to_pdf() -> None:
     manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
     image_file_path = IMAGE_FILE_PATH
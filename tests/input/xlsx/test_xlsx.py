@@ -7,6 +7,7 @@ import typing
 import pytest
 
 from preview_generator.exception import UnavailablePreviewType
+import preview_generator.manager
 from preview_generator.manager import PreviewManager
 from preview_generator.utils import executable_is_available
 
@@ -32,6 +33,24 @@ def test_text_to_jpeg() -> None:
     assert os.path.getsize(path_to_file) > 0
 
 
+def test_to_jpeg__partial_pdf(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(preview_generator.manager, "PARTIAL_PDF_PAGE_NB", 1)
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    full_pdf_path = manager.get_pdf_preview(file_path=XLSX_FILE_PATH, dry_run=True)
+    path_to_file = manager.get_jpeg_preview(file_path=XLSX_FILE_PATH, height=1024)
+    assert os.path.exists(path_to_file) is True
+    # INFO - the first page is built from a pdf of the first page only
+    assert not os.path.exists(full_pdf_path)
+    partial_pdf_path = os.path.join(
+        CACHE_DIR, os.path.basename(full_pdf_path)[: -len(".pdf")] + "-first1pages.pdf"
+    )
+    assert manager.get_page_nb(file_path=partial_pdf_path) == 1
+
+    path_to_file = manager.get_jpeg_preview(file_path=XLSX_FILE_PATH, page=5, height=1024)
+    assert os.path.exists(path_to_file) is True
+    assert os.path.exists(full_pdf_path)
+
+
 def test_to_pdf() -> None:
     manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
     assert manager.has_pdf_preview(file_path=XLSX_FILE_PATH) is True
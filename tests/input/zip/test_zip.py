@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
 
+import io
 import json
 import os
 import shutil
 import typing
+import zipfile
 
+from preview_generator.archive_index import ArchiveInfo
+from preview_generator.archive_index import read_archive_info
 from preview_generator.manager import PreviewManager
+from preview_generator.preview.builder.archive__zip import ARCHIVE_JSON_LAYOUT_TREE
+from preview_generator.preview.builder.archive__zip import archive_info_to_html
+from preview_generator.preview.builder.archive__zip import archive_info_to_text
+from preview_generator.preview.builder.archive__zip import write_archive_info_json
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 CACHE_DIR = "/tmp/preview-generator-tests/cache"
@@ -74,3 +82,55 @@ def test_zip_to_html__no_original_name() -> None:
     assert os.path.exists(path_to_file)
     assert os.path.getsize(path_to_file) > 0
     assert IMAGE_FILE_PATH.replace(".zip", "") not in path_to_file2
+
+
+def test_zip_to_json__from_content() -> None:
+    manager = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    with open(IMAGE_FILE_PATH, "rb") as zip_file:
+        file_content = zip_file.read()
+    path_to_file = manager.get_json_preview_from_content(file_content, file_ext=".zip")
+    assert os.path.exists(path_to_file) is True
+
+    data = json.load(open(path_to_file))
+    assert len(data["files"]) == 4
+
+
+def create_zip(file_nb: int) -> bytes:
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w") as zip_file:
+        for index in range(file_nb):
+            zip_file.writestr("folder/file_{}.txt".format(index), b"content")
+    return stream.getvalue()
+
+
+def get_json_preview_content(info: ArchiveInfo) -> str:
+    output = io.StringIO()
+    write_archive_info_json(info, output)
+    return output.getvalue()
+
+
+def test_write_archive_info__truncated() -> None:
+    info = read_archive_info(io.BytesIO(create_zip(5)), max_files=2)
+
+    data = json.loads(get_json_preview_content(info))
+    assert data["fileNb"] == 5
+    assert len(data["files"]) == 2
+    assert data["truncated"] is True
+    assert "3 more files not listed" in archive_info_to_text(info)
+    assert "3 more files not listed" in archive_info_to_html(info)
+
+
+def test_write_archive_info_json__tree() -> None:
+    info = read_archive_info(io.BytesIO(create_zip(2)))
+    output = io.StringIO()
+    write_archive_info_json(info, output, layout=ARCHIVE_JSON_LAYOUT_TREE)
+
+    data = json.loads(output.getvalue())
+    assert "files" not in data
+    assert data["fileNb"] == 2
+    [folder] = data["tree"]["children"]
+    assert folder["name"] == "folder"
+    assert [file["name"] for file in folder["children"]] == [
+        "folder/file_0.txt",
+        "folder/file_1.txt",
+    ]
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import typing
+import zipfile
+
+import pytest
+
+from preview_generator.archive_index import FileInfo
+from preview_generator.archive_index import UnsupportedArchive
+from preview_generator.archive_index import get_archive_tree
+from preview_generator.archive_index import read_archive_file_info
+from preview_generator.archive_index import read_archive_info
+from preview_generator.archive_index import tarfile_to_infos
+from preview_generator.fingerprint import FingerprintLRUCache
+
+ARCHIVE_DIR = "/tmp/preview-generator-tests/archives"
+MEMBERS = {"folder/a.txt": b"a" * 1000, "folder/b.txt": b"b" * 10}
+
+
+def setup_function(function: typing.Callable) -> None:
+    shutil.rmtree(ARCHIVE_DIR, ignore_errors=True)
+    os.makedirs(ARCHIVE_DIR)
+
+
+def create_tar(file_path: str, mode: str) -> None:
+    with tarfile.open(file_path, mode) as tar_file:
+        for name, data in MEMBERS.items():
+            tarinfo = tarfile.TarInfo(name)
+            tarinfo.size = len(data)
+            tarinfo.mtime = 1600000000
+            tar_file.addfile(tarinfo, io.BytesIO(data))
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz", "w:bz2", "w:xz"])
+def test_read_archive_info__tar(mode: str) -> None:
+    file_path = os.path.join(ARCHIVE_DIR, "archive.tar")
+    create_tar(file_path, mode)
+    with open(file_path, "rb") as stream:
+        info = read_archive_info(stream, file_path)
+    assert [file.name for file in info.files] == list(MEMBERS)
+    assert [file.type for file in info.files] == [FileInfo.FILE, FileInfo.FILE]
+    assert info.size == 1010
+    assert info.size__compressed == os.path.getsize(file_path)
+    assert info.last_modification is not None
+
+
+def test_read_archive_info__zip() -> None:
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in MEMBERS.items():
+            zip_file.writestr(name, data)
+    info = read_archive_info(io.BytesIO(stream.getvalue()))
+    assert [file.name for file in info.files] == list(MEMBERS)
+    assert info.size == 1010
+    assert info.compression_rate > 1
+
+
+def test_read_archive_info__gzip() -> None:
+    file_path = os.path.join(ARCHIVE_DIR, "file.txt.gz")
+    with gzip.open(file_path, "wb") as gzip_file:
+        gzip_file.write(b"a" * 1000)
+    with open(file_path, "rb") as stream:
+        info = read_archive_info(stream, file_path)
+    assert info.file_nb == 1
+    assert info.files[0].name == "file.txt"
+    assert info.files[0].size == 1000
+
+
+def test_read_archive_info__unsupported() -> None:
+    with pytest.raises(UnsupportedArchive):
+        read_archive_info(io.BytesIO(b"not an archive" * 100))
+
+
+def test_archive_info_cache() -> None:
+    file_path = os.path.join(ARCHIVE_DIR, "archive.tar.gz")
+    create_tar(file_path, "w:gz")
+    cache = FingerprintLRUCache(read_archive_file_info)
+    info = cache.get(file_path)
+    assert cache.get(file_path) is info
+
+    os.remove(file_path)
+    create_tar(file_path, "w")
+    os.utime(file_path, ns=(0, 0))
+    assert cache.get(file_path) is not info
+
+
+def test_read_archive_info__max_files() -> None:
+    file_path = os.path.join(ARCHIVE_DIR, "archive.tar")
+    create_tar(file_path, "w")
+    with open(file_path, "rb") as stream:
+        info = read_archive_info(stream, file_path, max_files=1)
+    assert info.file_nb == 2
+    assert [file.name for file in info.files] == ["folder/a.txt"]
+    assert info.truncated is True
+    assert info.size == 1010
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz"])
+def test_tarfile_to_infos__members_not_retained(mode: str) -> None:
+    file_path = os.path.join(ARCHIVE_DIR, "archive.tar")
+    # INFO - a long name needs an extended header before the member header
+    long_name = "folder/" + "x" * 200 + ".txt"
+    with tarfile.open(file_path, mode) as tar_file:
+        for member_id in range(5000):
+            tarinfo = tarfile.TarInfo("folder/{}.txt".format(member_id))
+            tarinfo.size = 1
+            tar_file.addfile(tarinfo, io.BytesIO(b"1"))
+        tarinfo = tarfile.TarInfo(long_name)
+        tarinfo.size = 3
+        tar_file.addfile(tarinfo, io.BytesIO(b"end"))
+
+    with tarfile.open(file_path, mode="r|*") as tar_file:
+        info = tarfile_to_infos(tar_file, max_files=10)
+        assert len(tar_file.members) <= 1
+    assert info.file_nb == 5001
+    assert info.size == 5003
+    assert [file.name for file in info.files[:2]] == ["folder/0.txt", "folder/1.txt"]
+
+
+def test_get_archive_tree() -> None:
+    file_path = os.path.join(ARCHIVE_DIR, "archive.tar")
+    create_tar(file_path, "w")
+    with open(file_path, "rb") as stream:
+        info = read_archive_info(stream, file_path)
+    tree = get_archive_tree(info)
+    folder = tree["children"]["folder"]
+    assert folder["type"] == FileInfo.DIR
+    assert list(folder["children"]) == ["a.txt", "b.txt"]
+    assert folder["children"]["a.txt"] is info.files[0]
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import typing
+
+from preview_generator.async_manager import AsyncPreviewManager
+from tests.fixtures.coderunnerbuilder import CodeRunnerPreviewBuilder
+
+PRINT_CODE = """
+print("ok")
+"""
+
+SLEEP_CODE = """
+from preview_generator.process import check_call
+check_call(["sleep", "30"])
+"""
+
+# INFO - the process ignores SIGTERM, it is only killed after DEFAULT_STOP_TIMEOUT
+SLOW_TO_STOP_CODE = """
+from preview_generator.process import check_call
+check_call(["sh", "-c", "trap '' TERM; sleep 30"])
+"""
+
+
+def _get_manager(cache_path: str, **kwargs: typing.Any) -> AsyncPreviewManager:
+    manager = AsyncPreviewManager(cache_path, **kwargs)
+    manager.manager._factory.register_builder(CodeRunnerPreviewBuilder)
+    return manager
+
+
+def _write_code_file(folder: str, code: str) -> str:
+    code_path = os.path.join(folder, "code.runpy")
+    with open(code_path, "w", encoding="utf8") as code_file:
+        code_file.write(code)
+    return code_path
+
+
+def test_get_text_preview() -> None:
+    cache_path = tempfile.mkdtemp()
+    try:
+        manager = _get_manager(cache_path)
+        code_path = _write_code_file(cache_path, PRINT_CODE)
+
+        async def get_previews() -> typing.List[str]:
+            return await asyncio.gather(*[manager.get_text_preview(code_path) for _ in range(5)])
+
+        preview_paths = asyncio.run(get_previews())
+        assert len(set(preview_paths)) == 1
+        with open(preview_paths[0]) as preview_file:
+            assert preview_file.read() == "ok\n"
+    finally:
+        shutil.rmtree(cache_path)
+
+
+def test_cancel_kills_processes() -> None:
+    cache_path = tempfile.mkdtemp()
+    try:
+        manager = _get_manager(cache_path)
+        code_path = _write_code_file(cache_path, SLEEP_CODE)
+
+        async def cancel_preview() -> None:
+            task = asyncio.ensure_future(manager.get_text_preview(code_path))
+            await asyncio.sleep(1)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        start = time.monotonic()
+        asyncio.run(cancel_preview())
+        # INFO - executor threads are joined at loop shutdown: this only returns quickly
+        # if the sleep process has been killed
+        assert time.monotonic() - start < 20
+    finally:
+        shutil.rmtree(cache_path)
+
+
+def test_cancel_does_not_block_event_loop() -> None:
+    cache_path = tempfile.mkdtemp()
+    try:
+        manager = _get_manager(cache_path)
+        code_path = _write_code_file(cache_path, SLOW_TO_STOP_CODE)
+
+        async def cancel_preview() -> float:
+            task = asyncio.ensure_future(manager.get_text_preview(code_path))
+            await asyncio.sleep(1)
+            task.cancel()
+            max_delay = 0.0
+            while not task.done():
+                start = time.monotonic()
+                await asyncio.sleep(0.1)
+                max_delay = max(max_delay, time.monotonic() - start)
+            return max_delay
+
+        assert asyncio.run(cancel_preview()) < 2
+    finally:
+        shutil.rmtree(cache_path)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tarfile
+
+import pytest
+
+from preview_generator import batch
+from preview_generator.batch import PREVIEW_TYPE_JSON
+from preview_generator.batch import iter_input_files
+from preview_generator.batch import parse_builder_jobs
+from preview_generator.batch import parse_size
+from preview_generator.batch import run_batch
+
+INPUT_DIR = "/tmp/preview-generator-tests/batch-input"
+CACHE_DIR = "/tmp/preview-generator-tests/cache"
+
+
+def setup_function(function: object) -> None:
+    shutil.rmtree(INPUT_DIR, ignore_errors=True)
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    os.makedirs(os.path.join(INPUT_DIR, "sub"))
+    for file_name in ("a.txt", "b.txt", os.path.join("sub", "c.txt")):
+        with open(os.path.join(INPUT_DIR, file_name), "w") as file:
+            file.write(file_name)
+
+
+def test_parse_size() -> None:
+    assert str(parse_size("512x256")) == "512x256"
+    assert str(parse_size("128")) == "128x128"
+
+
+def test_parse_builder_jobs() -> None:
+    assert parse_builder_jobs(["libreoffice=2", "wand=4", "SomeBuilder=1"]) == {
+        "OfficePreviewBuilderLibreoffice": 2,
+        "ImagePreviewBuilderWand": 4,
+        "SomeBuilder": 1,
+    }
+
+
+def test_iter_input_files() -> None:
+    file_list_path = os.path.join(INPUT_DIR, "..", "batch-file-list")
+    with open(file_list_path, "w") as file_list:
+        file_list.write("/tmp/listed_1.pdf\n\n/tmp/listed_2.pdf\n")
+
+    file_paths = list(iter_input_files([INPUT_DIR, "/tmp/direct.pdf"], file_list=file_list_path))
+    assert file_paths == [
+        os.path.join(INPUT_DIR, "a.txt"),
+        os.path.join(INPUT_DIR, "b.txt"),
+        os.path.join(INPUT_DIR, "sub", "c.txt"),
+        "/tmp/direct.pdf",
+        "/tmp/listed_1.pdf",
+        "/tmp/listed_2.pdf",
+    ]
+
+
+def test_run_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    # INFO - small chunks and queues so that classification is interleaved with builds
+    monkeypatch.setattr(batch, "CLASSIFY_CHUNK_SIZE", 2)
+    monkeypatch.setattr(batch, "MAX_QUEUED_FILES_BY_BUILDER", 2)
+    archive_paths = [os.path.join(INPUT_DIR, "archive_{}.tar".format(i)) for i in range(8)]
+    for archive_path in archive_paths:
+        with tarfile.open(archive_path, "w") as archive:
+            archive.add(os.path.join(INPUT_DIR, "a.txt"), "a.txt")
+
+    stats = run_batch(
+        archive_paths,
+        CACHE_DIR,
+        jobs=2,
+        builder_jobs={"ZipPreviewBuilder": 1},
+        preview_types=[PREVIEW_TYPE_JSON],
+    )
+    assert stats.file_nb == 8
+    assert stats.built == 8
+    assert stats.file_nb_by_builder == {"ZipPreviewBuilder": 8}
+
+    stats = run_batch(archive_paths, CACHE_DIR, jobs=2, preview_types=[PREVIEW_TYPE_JSON])
+    assert stats.skipped == 8
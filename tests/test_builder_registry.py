@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import time
+import typing
+
+import pytest
+
+from preview_generator.preview import builder_factory
+from preview_generator.preview.builder.video__ffmpeg import VideoPreviewBuilderFFMPEG
+from preview_generator.preview.builder_factory import PreviewBuilderFactory
+from preview_generator.preview.builder_registry import BUILDER_PACKAGE
+from preview_generator.preview.builder_registry import BuilderEntry
+from preview_generator.preview.builder_registry import read_builder_registry
+from preview_generator.preview.builder_registry import write_builder_registry
+
+CACHE_DIR = "/tmp/preview-generator-tests/cache"
+REGISTRY_PATH = os.path.join(CACHE_DIR, "builders.json")
+MODULES_SIGNATURE = [["archive__zip", 1]]
+ZIP_BUILDER_ENTRY = BuilderEntry(
+    module_name="archive__zip",
+    class_name="ZipPreviewBuilder",
+    weight=100,
+    mimetypes=["application/zip"],
+    mimetypes_mapping=[("application/x-preview-generator-test-zip", ".testzip")],
+)
+
+
+def setup_function(function: typing.Callable) -> None:
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    os.makedirs(CACHE_DIR)
+
+
+def test_builder_registry() -> None:
+    write_builder_registry([ZIP_BUILDER_ENTRY], MODULES_SIGNATURE, REGISTRY_PATH, ttl=60)
+    builder_entries = read_builder_registry(MODULES_SIGNATURE, REGISTRY_PATH, ttl=60)
+    assert builder_entries is not None
+    assert [entry.to_dict() for entry in builder_entries] == [ZIP_BUILDER_ENTRY.to_dict()]
+
+
+def test_builder_registry__invalid() -> None:
+    assert read_builder_registry(MODULES_SIGNATURE, REGISTRY_PATH, ttl=60) is None
+    write_builder_registry([ZIP_BUILDER_ENTRY], MODULES_SIGNATURE, REGISTRY_PATH, ttl=60)
+    # INFO - builder module modified
+    assert read_builder_registry([["archive__zip", 2]], REGISTRY_PATH, ttl=60) is None
+    # INFO - registry expired
+    time.sleep(0.01)
+    assert read_builder_registry(MODULES_SIGNATURE, REGISTRY_PATH, ttl=0.001) is None
+    # INFO - registry disabled
+    assert read_builder_registry(MODULES_SIGNATURE, REGISTRY_PATH, ttl=0) is None
+
+
+def test_factory__load_builders_from_registry(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        builder_factory, "read_builder_registry", lambda modules_signature: [ZIP_BUILDER_ENTRY]
+    )
+    factory = PreviewBuilderFactory()
+    factory.load_builders()
+    assert "application/zip" in factory.get_supported_mimetypes()
+    assert factory.get_file_mimetype("/tmp/archive.testzip") == (
+        "application/x-preview-generator-test-zip"
+    )
+    assert factory.get_builder_class("application/zip").__name__ == "ZipPreviewBuilder"
+    # INFO - builders defined out of the builder package (eg. by other tests) are registered too
+    assert [
+        builder.__name__
+        for builder in factory.builders_classes
+        if builder.__module__.startswith(BUILDER_PACKAGE + ".")
+    ] == ["ZipPreviewBuilder"]
+
+
+def test_factory__builder_instance_reused(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        builder_factory, "read_builder_registry", lambda modules_signature: [ZIP_BUILDER_ENTRY]
+    )
+    factory = PreviewBuilderFactory()
+    factory.load_builders()
+    builder = factory.get_preview_builder("application/zip")
+    assert factory.get_preview_builder("application/zip") is builder
+    assert builder is builder.__class__.get_instance()
+
+
+def test_video_builder_page_nb() -> None:
+    builder = VideoPreviewBuilderFFMPEG(page_nb=3)
+    assert builder.get_page_number("/tmp/video.ogg", "", CACHE_DIR) == 3
+    assert VideoPreviewBuilderFFMPEG().get_page_number("/tmp/video.ogg", "", CACHE_DIR) == 10
+    with pytest.deprecated_call():
+        assert builder.set_page_nb(5) == 5
+    assert builder.get_page_number("/tmp/video.ogg", "", CACHE_DIR) == 5
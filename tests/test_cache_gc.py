@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import time
+import typing
+
+from filelock import FileLock
+
+from preview_generator.cache_gc import EVICTION_POLICY_LFU
+from preview_generator.cache_gc import ORPHAN_FILE_MIN_AGE
+from preview_generator.cache_gc import collect_cache
+from preview_generator.cache_index import CacheIndex
+
+CACHE_DIR = "/tmp/preview-generator-tests/cache"
+HASH_1 = "1" * 32
+HASH_2 = "2" * 32
+
+
+def setup_function(function: typing.Callable) -> None:
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    os.makedirs(CACHE_DIR)
+
+
+def create_file(file_name: str, size: int = 100, age: float = 0) -> str:
+    file_path = os.path.join(CACHE_DIR, file_name)
+    with open(file_path, "wb") as file:
+        file.write(b"x" * size)
+    mtime = time.time() - age
+    os.utime(file_path, (mtime, mtime))
+    return file_path
+
+
+def test_collect_cache__max_size() -> None:
+    old_file = create_file(HASH_1 + "-256x256.jpeg", age=30)
+    recent_file = create_file(HASH_2 + "-256x256.jpeg", age=20)
+    accessed_file = create_file(HASH_1 + "-512x512.jpeg", age=40)
+    CacheIndex(CACHE_DIR).record_access(HASH_1, [accessed_file])
+
+    stats = collect_cache(CACHE_DIR, max_size=200)
+    assert stats.file_nb == 3
+    assert stats.removed_nb == 1
+    assert not os.path.exists(old_file)
+    assert os.path.exists(recent_file)
+    assert os.path.exists(accessed_file)
+    assert len(CacheIndex(CACHE_DIR).get_preview_files()) == 2
+
+
+def test_collect_cache__lfu() -> None:
+    used_file = create_file(HASH_1 + "-256x256.jpeg")
+    unused_file = create_file(HASH_2 + "-256x256.jpeg")
+    cache_index = CacheIndex(CACHE_DIR)
+    cache_index.record_access(HASH_1, [used_file])
+    cache_index.record_access(HASH_1, [used_file])
+    cache_index.record_access(HASH_2, [unused_file])
+
+    collect_cache(CACHE_DIR, max_size=100, policy=EVICTION_POLICY_LFU)
+    assert os.path.exists(used_file)
+    assert not os.path.exists(unused_file)
+
+
+def test_collect_cache__max_age__intermediate_pdf() -> None:
+    # INFO - the intermediate pdf is as valuable as the jpeg previews built from it
+    pdf_file = create_file(HASH_1 + ".pdf", age=7200)
+    jpeg_file = create_file(HASH_1 + "-256x256-page0.jpeg", age=60)
+    old_jpeg_file = create_file(HASH_2 + "-256x256.jpeg", age=7200)
+
+    stats = collect_cache(CACHE_DIR, max_age=3600)
+    assert stats.removed_nb == 1
+    assert os.path.exists(pdf_file)
+    assert os.path.exists(jpeg_file)
+    assert not os.path.exists(old_jpeg_file)
+
+
+def test_collect_cache__max_age__partial_pdf() -> None:
+    # INFO - the pdf of the first pages of a document is valued as the full pdf
+    partial_pdf_file = create_file(HASH_1 + "-first1pages.pdf", age=7200)
+    jpeg_file = create_file(HASH_1 + "-256x256-page0.jpeg", age=60)
+    old_pdf_file = create_file(HASH_2 + "-page2.pdf", age=7200)
+
+    collect_cache(CACHE_DIR, max_age=3600)
+    assert os.path.exists(partial_pdf_file)
+    assert os.path.exists(jpeg_file)
+    assert not os.path.exists(old_pdf_file)
+
+
+def test_collect_cache__orphans() -> None:
+    old_flag = create_file(HASH_1 + ".pdf_flag", age=ORPHAN_FILE_MIN_AGE + 10)
+    recent_flag = create_file(HASH_2 + ".pdf_flag")
+    old_lock = create_file(HASH_1 + ".lock", size=0, age=ORPHAN_FILE_MIN_AGE + 10)
+    old_conversion_lock = create_file(HASH_1 + ".pdf.lock", size=0, age=ORPHAN_FILE_MIN_AGE + 10)
+    old_temporary_file = create_file(HASH_1 + ".pdf.docx", age=ORPHAN_FILE_MIN_AGE + 10)
+    old_temporary_output = create_file(
+        HASH_2 + "-256x256." + "a" * 32 + ".tmp.jpeg", age=ORPHAN_FILE_MIN_AGE + 10
+    )
+
+    stats = collect_cache(CACHE_DIR, dry_run=True)
+    assert stats.orphan_nb == 3
+    assert stats.file_nb == 0
+    assert os.path.exists(old_flag)
+
+    collect_cache(CACHE_DIR)
+    assert not os.path.exists(old_flag)
+    assert os.path.exists(recent_flag)
+    # INFO - lock files are never removed, a process may be waiting for them
+    assert os.path.exists(old_lock)
+    assert os.path.exists(old_conversion_lock)
+    assert not os.path.exists(old_temporary_file)
+    assert not os.path.exists(old_temporary_output)
+
+
+def test_collect_cache__intermediate_pdf_in_use() -> None:
+    pdf_file = create_file(HASH_1 + ".pdf", age=7200)
+    jpeg_file = create_file(HASH_1 + "-256x256-page0.jpeg", age=7200)
+
+    # INFO - jpeg previews are being built from the pdf
+    with FileLock(pdf_file + ".lock"):
+        stats = collect_cache(CACHE_DIR, max_age=3600)
+    assert stats.removed_nb == 1
+    assert stats.locked_nb == 1
+    assert os.path.exists(pdf_file)
+    assert not os.path.exists(jpeg_file)
+    assert os.path.exists(pdf_file + ".lock")
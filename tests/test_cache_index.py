@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+from preview_generator.cache_index import CACHE_INDEX_FILE_NAME
+from preview_generator.cache_index import CacheIndex
+from preview_generator.utils import DocumentMetadata
+
+
+def test_document_metadata() -> None:
+    with tempfile.TemporaryDirectory() as cache_path:
+        cache_index = CacheIndex(cache_path)
+        fingerprint = (1, 2, 3, 4)
+        assert cache_index.get_document_metadata("hash", fingerprint) is None
+
+        cache_index.set_document_metadata(
+            "hash", fingerprint, DocumentMetadata(page_nb=2, page_sizes=[(612, 792), (842, 595)])
+        )
+        assert os.path.exists(os.path.join(cache_path, CACHE_INDEX_FILE_NAME))
+
+        metadata = CacheIndex(cache_path).get_document_metadata("hash", fingerprint)
+        assert metadata
+        assert metadata.page_nb == 2
+        assert metadata.page_sizes == [(612, 792), (842, 595)]
+
+
+def test_document_metadata__file_changed() -> None:
+    with tempfile.TemporaryDirectory() as cache_path:
+        cache_index = CacheIndex(cache_path)
+        cache_index.set_document_metadata("hash", (1, 2, 3, 4), DocumentMetadata(page_nb=2))
+        assert cache_index.get_document_metadata("hash", (1, 2, 3, 5)) is None
+
+
+def test_document_metadata__no_cache_folder() -> None:
+    cache_index = CacheIndex("/tmp/preview-generator-tests/not/existing/folder")
+    cache_index.set_document_metadata("hash", (1, 2, 3, 4), DocumentMetadata(page_nb=2))
+    assert cache_index.get_document_metadata("hash", (1, 2, 3, 4)) is None
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import typing
+import zipfile
+
+import pytest
+
+from preview_generator import embedded_thumbnail
+from preview_generator.embedded_thumbnail import get_embedded_thumbnail
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TMP_DIR = "/tmp/preview-generator-tests/embedded-thumbnail"
+ODT_FILE_PATH = os.path.join(CURRENT_DIR, "input", "odt", "the_odt.odt")
+DOCX_FILE_PATH = os.path.join(CURRENT_DIR, "input", "docx", "the_docx.docx")
+PNG_MAGIC = b"\x89PNG"
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+EPUB2_PACKAGE = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="2.0">
+  <metadata><meta name="cover" content="cover-id"/></metadata>
+  <manifest>
+    <item id="chapter" href="chapter.xhtml" media-type="application/xhtml+xml"/>
+    <item id="cover-id" href="images/cover.png" media-type="image/png"/>
+  </manifest>
+</package>"""
+EPUB3_PACKAGE = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+  <manifest>
+    <item id="c" href="images/cover.png" media-type="image/png" properties="cover-image"/>
+  </manifest>
+</package>"""
+EPUB3_PACKAGE_RELATIVE_HREF = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+  <manifest>
+    <item id="c" href="../images/my%20cover.png" media-type="image/png" properties="cover-image"/>
+  </manifest>
+</package>"""
+
+
+def setup_function(function: typing.Callable) -> None:
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+    os.makedirs(TMP_DIR)
+
+
+def create_epub(package: str, cover_path: str = "OEBPS/images/cover.png") -> str:
+    file_path = os.path.join(TMP_DIR, "book.epub")
+    with zipfile.ZipFile(file_path, "w") as epub:
+        epub.writestr("mimetype", "application/epub+zip")
+        epub.writestr("META-INF/container.xml", CONTAINER_XML)
+        epub.writestr("OEBPS/content.opf", package)
+        epub.writestr(cover_path, PNG_MAGIC + b"cover")
+    return file_path
+
+
+def test_get_embedded_thumbnail__odt() -> None:
+    thumbnail = get_embedded_thumbnail(ODT_FILE_PATH)
+    assert thumbnail and thumbnail.startswith(PNG_MAGIC)
+
+
+def test_get_embedded_thumbnail__none() -> None:
+    assert get_embedded_thumbnail(DOCX_FILE_PATH) is None
+    not_zip_path = os.path.join(TMP_DIR, "file.txt")
+    with open(not_zip_path, "w") as not_zip:
+        not_zip.write("text")
+    assert get_embedded_thumbnail(not_zip_path) is None
+
+
+def test_get_embedded_thumbnail__epub() -> None:
+    assert get_embedded_thumbnail(create_epub(EPUB2_PACKAGE)) == PNG_MAGIC + b"cover"
+    assert get_embedded_thumbnail(create_epub(EPUB3_PACKAGE)) == PNG_MAGIC + b"cover"
+
+
+def test_get_embedded_thumbnail__epub_relative_href() -> None:
+    epub_path = create_epub(EPUB3_PACKAGE_RELATIVE_HREF, cover_path="images/my cover.png")
+    assert get_embedded_thumbnail(epub_path) == PNG_MAGIC + b"cover"
+
+
+def test_get_embedded_thumbnail__too_large(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(embedded_thumbnail, "EMBEDDED_MEMBER_MAX_SIZE", len(PNG_MAGIC))
+    assert get_embedded_thumbnail(ODT_FILE_PATH) is None
+    assert get_embedded_thumbnail(create_epub(EPUB2_PACKAGE)) is None
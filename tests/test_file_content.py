@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+from io import BytesIO
+import os
+import shutil
+import tempfile
+
+from preview_generator.file_content import FileContent
+from preview_generator.fingerprint import compute_content_hash
+
+CONTENT = b"some content " * 1000
+
+
+def test_file_content__bytes() -> None:
+    with tempfile.NamedTemporaryFile() as file:
+        file.write(CONTENT)
+        file.flush()
+        content_hash = compute_content_hash(file.name)
+
+    with FileContent(CONTENT, ".txt") as content:
+        assert content.hash == content_hash
+        assert content.get_head(4) == b"some"
+        assert content.get_data() == CONTENT
+        assert not os.path.exists(content.path)
+        assert content.path.endswith(".txt")
+        path = content.get_path()
+        with open(path, "rb") as file:
+            assert file.read() == CONTENT
+    assert not os.path.exists(path)
+
+
+def test_file_content__stream() -> None:
+    with FileContent(BytesIO(CONTENT)) as content:
+        assert content.get_data() == CONTENT
+        assert not os.path.exists(content.path)
+
+
+def test_file_content__large_stream() -> None:
+    with FileContent(BytesIO(CONTENT), max_memory_size=100) as content:
+        assert os.path.exists(content.path)
+        assert content.get_head(4) == b"some"
+        assert content.get_data() == CONTENT
+    with FileContent(CONTENT) as memory_content:
+        assert content.hash == memory_content.hash
+
+
+def test_file_content__regular_file() -> None:
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(tmp_dir, "file.txt")
+        with open(file_path, "wb") as file:
+            file.write(CONTENT)
+        with open(file_path, "rb") as file:
+            with FileContent(file, ".txt") as content:
+                assert content.hash == compute_content_hash(file_path)
+                # INFO - the file is linked, not copied
+                assert os.path.islink(content.get_path())
+                assert content.get_data() == CONTENT
+        assert os.path.exists(file_path)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_file_content__regular_file_partially_read() -> None:
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(tmp_dir, "file.txt")
+        with open(file_path, "wb") as file:
+            file.write(CONTENT)
+        with open(file_path, "rb") as file:
+            file.seek(5)
+            with FileContent(file, ".txt") as content:
+                # INFO - content is read from the current position of the stream
+                assert content.get_data() == CONTENT[5:]
+                assert not os.path.islink(content.get_path())
+            with FileContent(CONTENT[5:]) as memory_content:
+                assert content.hash == memory_content.hash
+    finally:
+        shutil.rmtree(tmp_dir)
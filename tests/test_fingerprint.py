@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+import pytest
+
+from preview_generator.fingerprint import CACHE_KEY_CONTENT
+from preview_generator.fingerprint import CACHE_KEY_PATH
+from preview_generator.fingerprint import FingerprintLRUCache
+from preview_generator.fingerprint import compute_content_hash
+from preview_generator.fingerprint import get_cache_key
+
+
+def test_path_cache_key() -> None:
+    cache_key = get_cache_key("/tmp/image.jpeg", CACHE_KEY_PATH)
+    assert cache_key == "7f8df7223d8be60a7ac8a9bf7bd1df2a"
+
+
+def test_content_cache_key__same_content() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        first_path = os.path.join(tmp_dir, "first.txt")
+        second_path = os.path.join(tmp_dir, "second.txt")
+        for path in (first_path, second_path):
+            with open(path, "wb") as file_handle:
+                file_handle.write(b"same content")
+
+        first_key = get_cache_key(first_path, CACHE_KEY_CONTENT)
+        assert len(first_key) == 32
+        assert first_key == get_cache_key(second_path, CACHE_KEY_CONTENT)
+
+
+def test_content_cache_key__updated_content() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "file.txt")
+        with open(path, "wb") as file_handle:
+            file_handle.write(b"first content")
+        cache = FingerprintLRUCache(compute_content_hash)
+        first_key = cache.get(path)
+
+        with open(path, "wb") as file_handle:
+            file_handle.write(b"second content, longer")
+        second_key = cache.get(path)
+
+        assert first_key != second_key
+        assert second_key == compute_content_hash(path)
+
+
+def test_content_hash_cache__bounded() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = FingerprintLRUCache(compute_content_hash, max_size=2)
+        for index in range(3):
+            path = os.path.join(tmp_dir, "{}.txt".format(index))
+            with open(path, "wb") as file_handle:
+                file_handle.write(str(index).encode())
+            cache.get(path)
+        assert len(cache._entries) == 2
+
+
+def test_invalid_cache_key_mode() -> None:
+    with pytest.raises(ValueError):
+        get_cache_key("/tmp/image.jpeg", "unknown")
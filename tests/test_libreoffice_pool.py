@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import json
+import tempfile
+import threading
+import typing
+
+import pytest
+
+from preview_generator.preview import libreoffice_pool
+from preview_generator.preview.libreoffice_pool import LibreofficeWorker
+from preview_generator.preview.libreoffice_pool import LibreofficeWorkerPool
+
+
+def test_workers_have_their_own_profile() -> None:
+    pool = LibreofficeWorkerPool("/tmp/cache/", worker_nb=3, persistent=False)
+    profiles = {worker.profile_path for worker in pool.workers}
+    assert len(profiles) == 3
+    lock_files = {worker.get_lock().lock_file for worker in pool.workers}
+    assert len(lock_files) == 3
+
+
+def test_pool_runs_jobs_concurrently(monkeypatch: pytest.MonkeyPatch) -> None:
+    barrier = threading.Barrier(2, timeout=5)
+    used_slots = []  # type: typing.List[int]
+
+    def convert(
+        self: LibreofficeWorker,
+        input_path: str,
+        output_dir: str,
+        output_filepath: str,
+        infilter: str,
+        page_range: str = "",
+    ) -> None:
+        used_slots.append(self.slot)
+        # INFO - both jobs must be running at the same time to pass the barrier
+        barrier.wait()
+
+    monkeypatch.setattr(LibreofficeWorker, "convert", convert)
+    with tempfile.TemporaryDirectory() as cache_path:
+        pool = LibreofficeWorkerPool(cache_path, worker_nb=2, persistent=False)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(pool.convert, "in.odt", cache_path, "out{}.pdf".format(index))
+                for index in range(2)
+            ]
+            for future in futures:
+                future.result()
+
+    assert sorted(used_slots) == [0, 1]
+
+
+def test_get_libreoffice_pool_is_shared_per_cache_folder() -> None:
+    pool = libreoffice_pool.get_libreoffice_pool("/tmp/cache-a/")
+    assert pool is libreoffice_pool.get_libreoffice_pool("/tmp/cache-a/")
+    assert pool is not libreoffice_pool.get_libreoffice_pool("/tmp/cache-b/")
+
+
+def test_worker__page_range(monkeypatch: pytest.MonkeyPatch) -> None:
+    commands = []  # type: typing.List[typing.List[str]]
+
+    class FakePopen(object):
+        def __init__(self, args: typing.List[str], **kwargs: typing.Any) -> None:
+            commands.append(args)
+
+        def communicate(self, timeout: typing.Optional[float] = None) -> None:
+            pass
+
+    monkeypatch.setattr(libreoffice_pool, "Popen", FakePopen)
+    monkeypatch.setattr(libreoffice_pool, "get_libreoffice_version", lambda: (7, 4, 0, 3))
+    worker = LibreofficeWorker("/tmp/cache/", slot=0, persistent=False)
+    worker.convert("in.odt", "/tmp/cache/", "out.pdf", infilter="")
+    worker.convert("in.odt", "/tmp/cache/", "out.pdf", infilter="", page_range="1-3")
+
+    assert "pdf:writer_pdf_Export" in commands[0]
+    output_filter = commands[1][commands[1].index("--convert-to") + 1]
+    filter_name, filter_options = output_filter.split(":", 2)[1:]
+    assert filter_name == "writer_pdf_Export"
+    assert json.loads(filter_options) == {"PageRange": {"type": "string", "value": "1-3"}}
+
+    # INFO - LibreOffice < 7.4 does not support json filter options: all pages are exported
+    monkeypatch.setattr(libreoffice_pool, "get_libreoffice_version", lambda: (7, 3, 7, 2))
+    worker.convert("in.odt", "/tmp/cache/", "out.pdf", infilter="", page_range="1-3")
+    assert "pdf:writer_pdf_Export" in commands[2]
+
+
+def test_pool__slot_locked_by_another_process() -> None:
+    with tempfile.TemporaryDirectory() as cache_path:
+        pool = LibreofficeWorkerPool(cache_path, worker_nb=2, persistent=False)
+        # INFO - a lock of another FileLock instance is seen as taken, like in another process
+        with pool.workers[0].get_lock():
+            with pool._lock_slot(pool.workers[0]) as slot_worker:
+                assert slot_worker is pool.workers[1]
+
+
+def test_pool__queue_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
+    pool = LibreofficeWorkerPool("/tmp/cache/", worker_nb=2, persistent=False)
+    monkeypatch.setattr(libreoffice_pool, "LIBREOFFICE_PROCESS_TIMEOUT", 60)
+    assert pool.get_queue_timeout(0) == 60
+    assert pool.get_queue_timeout(2) == 120
+    assert pool.get_queue_timeout(3) == 180
+    monkeypatch.setattr(libreoffice_pool, "LIBREOFFICE_QUEUE_TIMEOUT", 30)
+    assert pool.get_queue_timeout(3) == 30
+    monkeypatch.setattr(libreoffice_pool, "LIBREOFFICE_QUEUE_TIMEOUT", 0)
+    monkeypatch.setattr(libreoffice_pool, "LIBREOFFICE_PROCESS_TIMEOUT", None)
+    assert pool.get_queue_timeout(3) is None
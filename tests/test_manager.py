@@ -1,10 +1,17 @@
 # -*- coding: utf-8 -*-
 
+from concurrent.futures import ThreadPoolExecutor
 import os
 import shutil
 import typing
 
+import pytest
+
+from preview_generator.exception import UnsupportedMimeType
+from preview_generator.fingerprint import get_file_fingerprint
 from preview_generator.manager import PreviewManager
+from preview_generator.utils import DocumentMetadata
+from tests.fixtures.slowdocumentbuilder import SlowDocumentPreviewBuilder
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 CACHE_DIR = "/tmp/preview-generator-tests/cache"
@@ -93,3 +100,79 @@ def test_dry_run_json() -> None:
 
     preview_path = pm.get_json_preview("/tmp/image.jpeg", dry_run=True)
     assert not os.path.exists(preview_path)
+
+
+def test_invalid_cache_key_mode() -> None:
+    with pytest.raises(ValueError):
+        PreviewManager(cache_folder_path=CACHE_DIR, cache_key_mode="unknown")
+
+
+def test_get_preview_context__content_cache_key() -> None:
+    pm = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True, cache_key_mode="content")
+    first_path = os.path.join(CACHE_DIR, "first.txt")
+    second_path = os.path.join(CACHE_DIR, "second.txt")
+    other_path = os.path.join(CACHE_DIR, "other.txt")
+    for path, content in ((first_path, "same"), (second_path, "same"), (other_path, "other")):
+        with open(path, "w") as file_handle:
+            file_handle.write(content)
+
+    first_hash = pm.get_preview_context(first_path, file_ext=".txt").hash
+    second_hash = pm.get_preview_context(second_path, file_ext=".txt").hash
+    other_hash = pm.get_preview_context(other_path, file_ext=".txt").hash
+    assert first_hash == second_hash
+    assert first_hash != other_hash
+
+
+def test_get_jpeg_preview__cache_hit(monkeypatch: pytest.MonkeyPatch) -> None:
+    pm = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    pm._factory.register_builder(SlowDocumentPreviewBuilder)
+    preview_path = pm.get_jpeg_preview("/tmp/unknown.slowdoc", dry_run=True)
+    with open(preview_path, "wb") as file_handle:
+        file_handle.write(b"jpeg")
+
+    def get_file_mimetype(file_path: str, file_ext: str = "") -> str:
+        raise AssertionError("mimetype must not be detected for cached previews")
+
+    monkeypatch.setattr(pm._factory, "get_file_mimetype", get_file_mimetype)
+    assert pm.get_jpeg_preview("/tmp/unknown.slowdoc") == preview_path
+
+
+def test_dry_run__unsupported_file() -> None:
+    pm = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    with pytest.raises(UnsupportedMimeType):
+        pm.get_jpeg_preview("/tmp/unknown.unsupported-extension", dry_run=True)
+
+
+def test_get_document_metadata__cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    pm = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    document_path = os.path.join(CACHE_DIR, "document.docx")
+    with open(document_path, "w") as document_file:
+        document_file.write("document")
+    pm._cache_index.set_document_metadata(
+        pm.get_preview_context(document_path, "").hash,
+        get_file_fingerprint(document_path),
+        DocumentMetadata(page_nb=3),
+    )
+
+    def get_file_mimetype(file_path: str, file_ext: str = "") -> str:
+        raise AssertionError("mimetype must not be detected for cached metadata")
+
+    monkeypatch.setattr(pm._factory, "get_file_mimetype", get_file_mimetype)
+    assert pm.get_page_nb(document_path) == 3
+
+
+def test_get_pdf_preview__concurrent_requests() -> None:
+    pm = PreviewManager(cache_folder_path=CACHE_DIR, create_folder=True)
+    pm._factory.register_builder(SlowDocumentPreviewBuilder)
+    document_path = os.path.join(CACHE_DIR, "..", "document.slowdoc")
+    with open(document_path, "w") as document_file:
+        document_file.write("%PDF-1.4")
+    SlowDocumentPreviewBuilder.conversion_nb = 0
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        preview_paths = list(executor.map(lambda _: pm.get_pdf_preview(document_path), range(2)))
+
+    # INFO - the second request waits for the conversion of the first one
+    assert preview_paths[0] == preview_paths[1]
+    assert os.path.exists(preview_paths[0])
+    assert SlowDocumentPreviewBuilder.conversion_nb == 1
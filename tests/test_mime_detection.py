@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import typing
+
+import pytest
+
+from preview_generator import mime_detection
+from preview_generator.fingerprint import FingerprintLRUCache
+from preview_generator.mime_detection import get_file_mimetype
+from preview_generator.mime_detection import load_shared_mime_info_globs
+from preview_generator.mime_detection import resolve_ambiguous_mimetype
+from preview_generator.mime_detection import sniff_mimetype
+
+CACHE_DIR = "/tmp/preview-generator-tests/cache"
+
+
+def setup_function(function: typing.Callable) -> None:
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    os.makedirs(CACHE_DIR)
+
+
+def test_sniff_mimetype() -> None:
+    assert sniff_mimetype(b"\xef\xbb\xbf<!-- drawing -->\n<svg></svg>") == "image/svg+xml"
+    assert sniff_mimetype(b"<!DOCTYPE html>\n<html><body></body></html>") == "text/html"
+    assert sniff_mimetype(b"<?xml version='1.0'?><note/>") is None
+    assert sniff_mimetype(b"OggS\x00\x02" + bytes(22) + b"\x01vorbis") == "audio/x-vorbis+ogg"
+
+
+def test_load_shared_mime_info_globs() -> None:
+    globs_path = os.path.join(CACHE_DIR, "globs2")
+    with open(globs_path, "w") as globs_file:
+        globs_file.write(
+            "# comment\n"
+            "50:image/x-adobe-dng:*.dng\n"
+            "50:audio/ogg:*.ogg\n"
+            "50:video/ogg:*.ogg\n"
+            "80:text/html:*.HTML\n"
+            "50:application/x-sharedlib:*.so.[0-9]*\n"
+        )
+    globs = load_shared_mime_info_globs([globs_path])
+    assert globs == {".dng": "image/x-adobe-dng", ".ogg": "audio/ogg", ".html": "text/html"}
+
+
+def test_resolve_ambiguous_mimetype(monkeypatch: pytest.MonkeyPatch) -> None:
+    globs = {
+        ".dng": "image/x-adobe-dng",
+        ".txt": "text/plain",
+        ".xml": "application/xml",
+        ".ogg": "audio/ogg",
+    }
+    monkeypatch.setattr(mime_detection, "_shared_mime_info_globs", globs)
+    assert resolve_ambiguous_mimetype("image/tiff", "photo.DNG", b"II*\x00") == "image/x-adobe-dng"
+    assert resolve_ambiguous_mimetype("text/plain", "notes.txt", b"notes") == "text/plain"
+    # INFO - files without ambiguous extension are sniffed
+    assert resolve_ambiguous_mimetype("application/xml", "image", b"<svg/>") == "image/svg+xml"
+    assert resolve_ambiguous_mimetype("text/plain", "page", b"<html>") == "text/html"
+    ogg_theora_head = b"OggS" + bytes(24) + b"\x80theora"
+    assert resolve_ambiguous_mimetype("audio/ogg", "movie.ogg", ogg_theora_head) == (
+        "video/x-theora+ogg"
+    )
+
+
+def test_resolve_ambiguous_mimetype__extension_first(monkeypatch: pytest.MonkeyPatch) -> None:
+    globs = {".txt": "text/plain", ".xml": "application/xml"}
+    monkeypatch.setattr(mime_detection, "_shared_mime_info_globs", globs)
+    assert resolve_ambiguous_mimetype("text/plain", "page.txt", b"<html>") == "text/plain"
+    assert resolve_ambiguous_mimetype("text/plain", "image.txt", b"<svg/>") == "text/plain"
+    assert resolve_ambiguous_mimetype("application/xml", "page.xml", b"<html>") == (
+        "application/xml"
+    )
+    assert resolve_ambiguous_mimetype("application/xml", "image.xml", b"<svg/>") == (
+        "application/xml"
+    )
+
+
+def test_mimetype_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    file_path = os.path.join(CACHE_DIR, "file.txt")
+    with open(file_path, "w") as file_handle:
+        file_handle.write("text")
+    detected_files = []  # type: typing.List[str]
+
+    def detect_file_mimetype(file_path: str, file_ext: str = "") -> str:
+        detected_files.append(file_path)
+        return "text/plain"
+
+    monkeypatch.setattr(
+        mime_detection,
+        "mimetype_cache",
+        FingerprintLRUCache(detect_file_mimetype, max_size=1),
+    )
+    assert get_file_mimetype(file_path) == "text/plain"
+    assert get_file_mimetype(file_path) == "text/plain"
+    assert len(detected_files) == 1
+
+    os.utime(file_path, ns=(0, 0))
+    get_file_mimetype(file_path)
+    assert len(detected_files) == 2
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import typing
+
+import pytest
+
+from preview_generator.preview.builder.plain_text import TEXT_PAGE_DIMS
+from preview_generator.preview.builder.plain_text import get_text_page_dims
+from preview_generator.text_layout import detect_encoding
+from preview_generator.text_layout import get_text_lines
+from preview_generator.text_layout import read_text_head
+from preview_generator.utils import ImgDims
+
+TMP_DIR = "/tmp/preview-generator-tests/text-layout"
+TEXT = "première ligne\n\tdeuxième ligne\n"
+
+
+def setup_function(function: typing.Callable) -> None:
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+    os.makedirs(TMP_DIR)
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "utf-16", "utf-32", "cp1252"])
+def test_read_text_head__encodings(encoding: str) -> None:
+    file_path = os.path.join(TMP_DIR, "text.txt")
+    with open(file_path, "wb") as text_file:
+        text_file.write(TEXT.encode(encoding))
+    assert read_text_head(file_path) == TEXT
+
+
+def test_read_text_head__truncated() -> None:
+    file_path = os.path.join(TMP_DIR, "text.txt")
+    with open(file_path, "wb") as text_file:
+        text_file.write(("é" * 100).encode("utf-8"))
+    # INFO - the last character is cut by the byte limit
+    assert read_text_head(file_path, max_bytes=51) == "é" * 25 + "�"
+
+
+def test_detect_encoding__binary() -> None:
+    assert detect_encoding(bytes(range(256))) == "latin-1"
+
+
+def test_get_text_lines__control_characters() -> None:
+    assert get_text_lines("a\x00b\x1b[0mc\r\nd", line_nb=10, column_nb=80) == ["ab[0mc", "d"]
+
+
+def test_get_text_lines__line_nb() -> None:
+    text = "\n".join(str(index) for index in range(100))
+    lines = get_text_lines(text, line_nb=10, column_nb=80)
+    assert lines == [str(index) for index in range(10)]
+    assert len(get_text_lines("x" * 1000, line_nb=10, column_nb=80)) == 10
+
+
+def test_get_text_page_dims__sizes_of_different_ratios() -> None:
+    wide_size = ImgDims(width=1000, height=100)
+    square_size = ImgDims(width=256, height=256)
+    tall_size = ImgDims(width=100, height=1000)
+    page_dims = get_text_page_dims([wide_size, square_size, tall_size])
+    assert page_dims.height >= 256
+    assert page_dims.width >= 100
+    assert round(page_dims.width / page_dims.height, 2) == round(
+        TEXT_PAGE_DIMS.width / TEXT_PAGE_DIMS.height, 2
+    )
+    assert str(get_text_page_dims([wide_size, square_size])) == "181x256"
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import os
+import tempfile
 import typing
 
 import pytest
@@ -7,6 +9,7 @@ import pytest
 from preview_generator.exception import BuilderDependencyNotFound
 from preview_generator.utils import CropDims
 from preview_generator.utils import ImgDims
+from preview_generator.utils import atomic_output_path
 from preview_generator.utils import compute_resize_dims
 from preview_generator.utils import executable_is_available
 
@@ -111,3 +114,26 @@ EXECS = (
 def test_executable_is_available(exec: typing.Dict[str, typing.Any]) -> None:
     executable_list = exec.get("test")  # type: typing.Any
     assert executable_is_available(executable_list) == exec.get("result")
+
+
+def test_atomic_output_path() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "preview.jpeg")
+        with atomic_output_path(file_path) as output_path:
+            assert os.path.dirname(output_path) == tmp_dir
+            assert output_path.endswith(".jpeg")
+            with open(output_path, "w") as file_handle:
+                file_handle.write("content")
+            assert not os.path.exists(file_path)
+        assert os.listdir(tmp_dir) == ["preview.jpeg"]
+
+
+def test_atomic_output_path__error() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "preview.jpeg")
+        with pytest.raises(ValueError):
+            with atomic_output_path(file_path) as output_path:
+                with open(output_path, "w") as file_handle:
+                    file_handle.write("partial content")
+                raise ValueError()
+        assert os.listdir(tmp_dir) == []